@@ -1,10 +1,174 @@
-from picamera2 import Picamera2
+import glob
+import threading
+import time
+
+import numpy as np
 
 image_width=320
 image_height=240
 def init_camera():
+    from picamera2 import Picamera2
     picam2=Picamera2()
     config=picam2.create_preview_configuration(main={"size":(image_width,image_height),"format":"RGB888"})
     picam2.configure(config)
     picam2.start()
-    return picam2
\ No newline at end of file
+    return picam2
+
+
+class ImageFolderSource:
+    """
+    用保存的图片代替摄像头，按固定帧率循环回放，接口与Picamera2的capture_array相同
+    """
+
+    def __init__(self, pattern="results/*.jpg", fps=30, size=(image_width, image_height), loop=True):
+        import cv2  # 只有回放用到cv2，导入Camera本身不加载
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise FileNotFoundError(f"没有匹配的图片: {pattern}")
+        # 预先解码，回放时不占用解码时间
+        self.frames = []
+        for path in paths:
+            frame = cv2.imread(path)
+            if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                frame = cv2.resize(frame, tuple(size))
+            self.frames.append(frame)
+        self.period = 1.0 / fps if fps else 0.0
+        self.loop = loop
+        self.index = 0
+        self.next_time = None
+
+    def capture_array(self):
+        if self.index >= len(self.frames):
+            if not self.loop:
+                raise EOFError("回放结束")
+            self.index = 0
+
+        # 按帧率等待到下一帧的时间点
+        if self.period:
+            now = time.monotonic()
+            if self.next_time is None:
+                self.next_time = now
+            elif now < self.next_time:
+                time.sleep(self.next_time - now)
+            self.next_time = max(self.next_time + self.period, time.monotonic() - self.period)
+
+        frame = self.frames[self.index]
+        self.index += 1
+        return frame.copy()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FrameGrabber:
+    """
+    后台线程采集图像，写入预先分配的环形缓冲区，消费者每次只取最新的一帧
+
+    source需要提供capture_array()，默认用init_camera()打开摄像头，
+    也可以传入ImageFolderSource等回放源在没有摄像头的机器上测试
+    """
+
+    def __init__(self, source=None, slots=3):
+        if slots < 3:
+            raise ValueError("slots至少为3：正在写入、最新一帧、消费者持有各占一个")
+        self.source = init_camera() if source is None else source
+        self.slots = slots
+        self.buffers = None
+        self.timestamps = [0.0] * slots
+        self.seqs = [-1] * slots
+
+        self.captured = 0       # 采集到的帧数
+        self.dropped = 0        # 还没被取走就被新帧覆盖的帧数
+        self.errors = 0         # 采集出错次数
+        self.error = None       # 最后一次采集异常
+
+        self._cond = threading.Condition()
+        self._latest = None     # 最新一帧所在的槽
+        self._latest_read = True
+        self._held = None       # 消费者正在使用的槽
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _free_slot(self):
+        for slot in range(self.slots):
+            if slot != self._latest and slot != self._held:
+                return slot
+
+    def _run(self):
+        seq = 0
+        while self._running:
+            try:
+                frame = self.source.capture_array()
+            except EOFError:
+                break
+            except Exception as e:
+                self.errors += 1
+                self.error = e
+                time.sleep(0.01)
+                continue
+            timestamp = time.monotonic()
+
+            # 第一帧或分辨率变化时重新分配缓冲区
+            if self.buffers is None or self.buffers[0].shape != frame.shape or self.buffers[0].dtype != frame.dtype:
+                with self._cond:
+                    self.buffers = [np.empty_like(frame) for _ in range(self.slots)]
+                    self._latest = None
+                    self._latest_read = True
+                    self._held = None
+
+            # 写入一个既不是最新帧、也不被消费者持有的槽，复制时不持锁
+            with self._cond:
+                slot = self._free_slot()
+            np.copyto(self.buffers[slot], frame)
+            self.timestamps[slot] = timestamp
+            self.seqs[slot] = seq
+
+            with self._cond:
+                if not self._latest_read:
+                    self.dropped += 1
+                self._latest = slot
+                self._latest_read = False
+                self.captured += 1
+                self._cond.notify_all()
+            seq += 1
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def read(self, timeout=None):
+        """
+        取最新的一帧，没有新帧时等待
+        :param timeout: 最长等待时间(秒)，None表示一直等
+        :return: (image, timestamp, seq)，超时或采集线程已停止时返回(None, None, None)
+        返回的image在下一次read()之前不会被覆盖
+        """
+        with self._cond:
+            ready = self._cond.wait_for(lambda: not self._latest_read or not self._running, timeout)
+            if not ready or self._latest_read:
+                return None, None, None
+            slot = self._latest
+            self._held = slot
+            self._latest_read = True
+            seq = self.seqs[slot]
+            return self.buffers[slot], self.timestamps[slot], seq
+
+    def stats(self):
+        return {"captured": self.captured, "dropped": self.dropped, "errors": self.errors}
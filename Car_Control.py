@@ -1,77 +1,233 @@
-import smbus
 import math
+import threading
+import time
+
+
+class FakeSMBus():
+    #模拟的SMBus设备，记录所有写操作，没有硬件时用来测试
+    #delay: 每次传输耗时(秒)  fail_every: 每隔多少次传输失败一次，0表示不失败
+    def __init__(self,delay=0.0,fail_every=0):
+        self.delay=delay
+        self.fail_every=fail_every
+        self.transactions=0
+        self.traffic=[]   #(完成时间,寄存器,数据)
+        
+    def _transfer(self,reg,data):
+        self.transactions+=1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_every and self.transactions%self.fail_every==0:
+            raise OSError('fake I2C error')
+        self.traffic.append((time.monotonic(),reg,data))
+        
+    def write_byte_data(self,addr,reg,data):
+        self._transfer(reg,data)
+        
+    def write_byte(self,addr,reg):
+        self._transfer(reg,None)
+        
+    def write_i2c_block_data(self,addr,reg,data):
+        self._transfer(reg,list(data))
+
+
+class BusWriter():
+    #独占I2C总线的写线程
+    #每个通道(电机/各个舵机)只保留最新一条指令，与上次写入相同的指令直接跳过，
+    #单次传输超过deadline记一次超时，出错只计数不打印
+    def __init__(self,device,addr,deadline=0.005):
+        self._device=device
+        self._addr=addr
+        self.deadline=deadline
+        
+        self.submitted=0     #提交的指令数
+        self.written=0       #实际写入总线的次数
+        self.coalesced=0     #还没写就被新指令覆盖的次数
+        self.skipped=0       #与上次写入相同被跳过的次数
+        self.errors=0        #写入出错次数
+        self.overruns=0      #超过deadline的传输次数
+        self.last_error=None
+        self.max_latency=0.0     #提交到写完的最大延迟
+        self.total_latency=0.0
+        
+        self._pending={}     #通道 -> (写法,寄存器,数据,提交时间)
+        self._last_written={}
+        self._busy=False
+        self._running=True
+        self._cond=threading.Condition()
+        self._thread=threading.Thread(target=self._run,name='BusWriter',daemon=True)
+        self._thread.start()
+        
+    def channel(self,reg,data):
+        #0x01(电机)和0x02(停车)控制的是同一对电机，舵机按编号区分
+        if reg in (0x01,0x02):
+            return 'motor'
+        if reg==0x03:
+            return ('servo',data[0])
+        return reg
+        
+    def submit(self,kind,reg,data):
+        key=self.channel(reg,data)
+        with self._cond:
+            if key in self._pending:
+                self.coalesced+=1
+            else:
+                self._cond.notify()
+            self._pending[key]=(kind,reg,data,time.monotonic())
+            self.submitted+=1
+            
+    def flush(self,timeout=1.0):
+        #等待队列中的指令全部写完
+        with self._cond:
+            return self._cond.wait_for(lambda:not self._pending and not self._busy,timeout)
+        
+    def stop(self,timeout=1.0):
+        self.flush(timeout)
+        with self._cond:
+            self._running=False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        
+    def stats(self):
+        return {
+            'submitted':self.submitted,
+            'written':self.written,
+            'coalesced':self.coalesced,
+            'skipped':self.skipped,
+            'errors':self.errors,
+            'overruns':self.overruns,
+            'mean_latency':self.total_latency/self.written if self.written else 0.0,
+            'max_latency':self.max_latency,
+        }
+        
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda:self._pending or not self._running)
+                if not self._pending:
+                    return
+                pending=self._pending
+                self._pending={}
+                self._busy=True
+            for key,(kind,reg,data,submit_time) in pending.items():
+                if self._last_written.get(key)==(reg,data):
+                    self.skipped+=1
+                    continue
+                start=time.monotonic()
+                try:
+                    if kind=='u8':
+                        self._device.write_byte_data(self._addr,reg,data)
+                    else:
+                        self._device.write_i2c_block_data(self._addr,reg,list(data))
+                    self._last_written[key]=(reg,data)
+                except Exception as e:
+                    self.errors+=1
+                    self.last_error=e
+                    #写失败后不能确定设备状态，下次同样的指令也要重写
+                    self._last_written.pop(key,None)
+                end=time.monotonic()
+                if end-start>self.deadline:
+                    self.overruns+=1
+                latency=end-submit_time
+                self.written+=1
+                self.total_latency+=latency
+                if latency>self.max_latency:
+                    self.max_latency=latency
+            with self._cond:
+                self._busy=False
+                self._cond.notify_all()
+
 
 class Car():
     
     def get_i2c_device(self,address,i2c_bus):
+        import smbus
         self._addr=address
         if i2c_bus is None:
             return smbus.SMBus(1)
         else:
             return smbus.SMBus(i2c_bus)
         
-    def __init__(self):
-        self._device=self.get_i2c_device(0x16,1)
+    #async_writes=True时由BusWriter线程独占总线，写函数只提交指令，不阻塞
+    #device可以传入FakeSMBus等替代设备
+    def __init__(self,async_writes=False,device=None,deadline=0.005):
+        if device is None:
+            self._device=self.get_i2c_device(0x16,1)
+        else:
+            self._addr=0x16
+            self._device=device
+        self._writer=BusWriter(self._device,self._addr,deadline) if async_writes else None
+        #最近一次发出的电机指令(左轮速度,右轮速度)，负数表示反转
+        self.last_command=(0,0)
+        #写入出错只计数不打印(控制循环里print很慢)，见error_count和telemetry.TelemetryRing
+        self.errors=0
+        self.last_error=None
         self.Ctrl_Servo(1,158,2,90)
+        
+    def close(self):
+        #写完剩余指令并停止写线程
+        if self._writer:
+            self._writer.stop()
+            
+    def error_count(self):
+        #同步写入和BusWriter线程写入出错的总次数
+        return self.errors+(self._writer.errors if self._writer else 0)
+        
+    def _error(self,e):
+        self.errors+=1
+        self.last_error=e
     
     def write_u8(self,reg,data):
+        if self._writer:
+            self._writer.submit('u8',reg,data)
+            return
         try:
             self._device.write_byte_data(self._addr,reg,data)
-        except:
-            print('write_u8 I2C error')
+        except Exception as e:
+            self._error(e)
     
     def write_reg(self,reg):
         try:
             self._device.write_byte_data(self._addr,reg)
-        except:
-            print('write_u8 I2C error')
+        except Exception as e:
+            self._error(e)
     
     def write_array(self,reg,data):
+        if self._writer:
+            self._writer.submit('array',reg,tuple(data))
+            return
         try:
             self._device.write_i2c_block_data(self._addr,reg,data)
-        except:
-            print('write_array I2C error')
+        except Exception as e:
+            self._error(e)
     
+    #I2C错误在write_*里计数(_error)，下面的函数不再单独捕获
     def Ctrl_Car(self,L_dir,speed1,R_dir,speed2):
-        try:
-            reg=0x01
-            data=[L_dir,speed1,R_dir,speed2]
-            self.write_array(reg,data)
-        except:
-            print('Ctrl_Car I2C error')
+        reg=0x01
+        data=[L_dir,speed1,R_dir,speed2]
+        self.write_array(reg,data)
+        self.last_command=(speed1 if L_dir else -speed1,speed2 if R_dir else -speed2)
     
     def Dir_Car(self,speed1,speed2):
-        try:
-            if speed1<0:
-                L_dir=0
-            else:
-                L_dir=1
-            if speed2<0:
-                R_dir=0
-            else:
-                R_dir=1
-            self.Ctrl_Car(L_dir,int(math.fabs(speed1)),R_dir,int(math.fabs(speed2)))
-        except:
-            print('Dir_Car I2C error')
+        if speed1<0:
+            L_dir=0
+        else:
+            L_dir=1
+        if speed2<0:
+            R_dir=0
+        else:
+            R_dir=1
+        self.Ctrl_Car(L_dir,int(math.fabs(speed1)),R_dir,int(math.fabs(speed2)))
         
     def Car_Run(self,speed1,speed2):
-        try:
-            self.Ctrl(1,speed1,1,speed2)
-        except:
-            print('Car_Run I2C error')
+        self.Ctrl_Car(1,speed1,1,speed2)
         
     def Car_Stop(self):
-        try:
-            reg=0x02
-            self.write_u8(reg,0x00)
-        except:
-            print('Car_Stop I2C error')
+        reg=0x02
+        self.write_u8(reg,0x00)
+        self.last_command=(0,0)
                 
     def Car_Back(self,speed1,speed2):
-        try:
-            self.Ctrl_Car(0,speed1,0,speed2)
-        except:
-            print('Car_Back I2C error')
+        self.Ctrl_Car(0,speed1,0,speed2)
                 
     def Car_Left(self,speed1,speed2):
         self.Ctrl_Car(0,speed1,1,speed2)
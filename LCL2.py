@@ -30,8 +30,6 @@ class LaneCalculator:
         
         # 检测边缘
         edges = self.detect_edges_with_opencv(binary_image)
-        cv2.imshow("Edges", edges)
-        cv2.waitKey(0)
         # 提取车道边缘
         left_edges, right_edges = self.extract_lane_edges(edges)
         
@@ -133,6 +131,91 @@ class LaneCalculator:
         return (valid_columns[0] + valid_columns[-1]) // 2
 
 
+class FastLaneCalculator(LaneCalculator):
+    """
+    向量化的车道中心计算器，用numpy按列归约代替逐像素循环，
+    返回与LaneCalculator.calculate_lane_center相同的LaneResult
+    """
+
+    def __init__(self, width=320, height=240, binary_edges=False):
+        super().__init__(width, height)
+        # 输入为0/255二值图时用相邻像素差分代替Canny，更快但结果不同：
+        # 在78张样例ROI上与Canny有5帧检测状态不同，都检测到的帧中线平均差3px、最大差38px(bench_backends.py)，
+        # 默认关闭
+        self.binary_edges = binary_edges
+
+    def calculate_lane_center(self, binary_image):
+        """
+        从二值化图像计算车道中心位置
+        :param binary_image: 二值化图像 (0=黑色, 255=白色)，numpy数组
+        :return: LaneResult对象
+        """
+        result = LaneResult()
+
+        binary_np = np.asarray(binary_image, dtype=np.uint8)
+        if not binary_np.any():
+            return result
+
+        # 检测边缘并统计每列边缘点数量
+        edges = self.detect_edges(binary_np)
+        edge_counts = self.count_edge_columns(edges)
+
+        # 左右两半边缘最多的列
+        left_peak, right_peak = self.find_edge_peaks(edge_counts)
+        if left_peak < 0 or right_peak < 0:
+            return result
+
+        # 有效列只统计image_width x image_height范围内的边缘点
+        if edges.shape[0] > self.image_height or edges.shape[1] > self.image_width:
+            edge_counts = self.count_edge_columns(edges[:self.image_height, :self.image_width])
+        valid_columns = np.flatnonzero(edge_counts[:self.image_width] > self.min_white_pixels)
+        if valid_columns.size == 0:
+            return result
+
+        # 左右边缘点都在峰值列上，平均值即峰值列
+        result.center_x = (left_peak + right_peak) // 2
+        result.center_y = self.image_height // 2
+        result.left_bound = int(valid_columns[0])
+        result.right_bound = int(valid_columns[-1])
+        result.detected = True
+
+        return result
+
+    def detect_edges(self, binary_np):
+        """根据binary_edges选择差分边缘或Canny边缘"""
+        if self.binary_edges:
+            return self.detect_edges_with_diff(binary_np)
+        return cv2.Canny(binary_np, 50, 150)
+
+    def detect_edges_with_diff(self, binary_np):
+        """二值图的快速边缘：与右侧或下方像素不同的点记为边缘(255)"""
+        diff = np.zeros(binary_np.shape, dtype=bool)
+        np.not_equal(binary_np[:, :-1], binary_np[:, 1:], out=diff[:, :-1])
+        diff[:-1] |= binary_np[:-1] != binary_np[1:]
+        return diff.view(np.uint8) * np.uint8(255)
+
+    def count_edge_columns(self, edges):
+        """每列边缘点(255)的数量"""
+        return np.count_nonzero(edges == 255, axis=0)
+
+    def find_edge_peaks(self, edge_counts):
+        """
+        在左右两半分别找边缘点最多的列(取第一个最大值)
+        :return: (left_peak, right_peak)，某一半没有边缘点时为-1
+        """
+        mid_x = edge_counts.shape[0] // 2
+        left_peak = right_peak = -1
+        if mid_x > 0:
+            x = int(np.argmax(edge_counts[:mid_x]))
+            if edge_counts[x] > 0:
+                left_peak = x
+        if edge_counts.shape[0] > mid_x:
+            x = mid_x + int(np.argmax(edge_counts[mid_x:]))
+            if edge_counts[x] > 0:
+                right_peak = x
+        return left_peak, right_peak
+
+
 def calculate_lane_center(image_data, width, height):
     """
     Python接口函数，计算车道中心
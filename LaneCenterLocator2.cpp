@@ -37,15 +37,30 @@ extern "C" {
          * @details ǺĺʵֻCannyԵĳ
          */
         LaneResult calculateLaneCenter(const vector<vector<int>>& binary_image) {
+            // ǷЧ
+            if (binary_image.empty() || binary_image[0].empty()) {
+                return LaneResult();  // Чؿս
+            }
+
+            // תΪMatMat汾
+            return calculateLaneCenter(vectorToMat(binary_image));
+        }
+
+        /**
+         * @brief ӶֵͼƬ㳵꣨Mat汾
+         * @param binary_mat 8λֵͨͼ񣬿ֱӰװⲿڴ棨ƣ
+         * @return ߼
+         */
+        LaneResult calculateLaneCenter(const Mat& binary_mat) {
             LaneResult result;  // 洢
 
             // һǷЧ
-            if (binary_image.empty() || binary_image[0].empty()) {
+            if (binary_mat.empty()) {
                 return result;  // Чؿս
             }
 
             // ڶʹOpenCV CannyԵȡԵ
-            Mat edges = detectEdgesWithOpenCV(binary_image);  // ʹOpenCVͼԵ
+            Mat edges = detectEdgesWithOpenCV(binary_mat);  // ʹOpenCVͼԵ
 
             // ӱԵȡ߽
             vector<int> left_edges, right_edges;  // 洢ҳԵ
@@ -93,23 +108,30 @@ extern "C" {
 
     private:
         /**
-         * @brief ʹOpenCV CannyԵ㷨
+         * @brief vectorʽͼתΪOpenCV Matʽ
          * @param binary_image Ķֵͼ
-         * @return ԵͼOpenCV Matʽ
-         * @details ʹOpenCVCannyбԵ⣬׼ȷЧ
+         * @return 8λͨͼ
          */
-        Mat detectEdgesWithOpenCV(const vector<vector<int>>& binary_image) {
+        Mat vectorToMat(const vector<vector<int>>& binary_image) {
             int height = binary_image.size();  // ȡͼ߶
             int width = binary_image[0].size();  // ȡͼ
 
-            // vectorתΪOpenCV Matʽ
             Mat binary_mat(height, width, CV_8UC1);  // 8λͨͼ
             for (int y = 0; y < height; ++y) {
                 for (int x = 0; x < width; ++x) {
                     binary_mat.at<uchar>(y, x) = static_cast<uchar>(binary_image[y][x]);  // ֵ
                 }
             }
+            return binary_mat;
+        }
 
+        /**
+         * @brief ʹOpenCV CannyԵ㷨
+         * @param binary_mat Ķֵͼ
+         * @return ԵͼOpenCV Matʽ
+         * @details ʹOpenCVCannyбԵ⣬׼ȷЧ
+         */
+        Mat detectEdgesWithOpenCV(const Mat& binary_mat) {
             // ʹOpenCVCannyԵ
             Mat edges;
             Canny(binary_mat, edges, 50, 150);  // ֵ50ֵ150
@@ -255,4 +277,41 @@ extern "C" {
         }
     }
 
+    /**
+     * @brief Pythonõ㿽ӿڣֱӶȡuint8ͼ񻺳
+     * @param image_data ֵͼָ루uint80255
+     * @param width ͼ
+     * @param height ͼ߶
+     * @param stride ׵ַֽ֮ͼʱwidth
+     * @param result ÷ԤȷĽṹ
+     * @return 1ʾɹ0ʾʧ
+     * @details ͼ񻺳ֱӰװΪcv::Matκθƣ֧numpyƬͼ
+     */
+    int calculate_lane_center_u8(const unsigned char* image_data, int width, int height, int stride,
+        LaneResult* result) {
+        if (result == nullptr) {
+            return 0;
+        }
+        *result = LaneResult();
+
+        // Ч
+        if (image_data == nullptr || width <= 0 || height <= 0 || stride < width) {
+            return 0;  // Чʧ
+        }
+
+        try {
+            // װⲿ
+            Mat binary_mat(height, width, CV_8UC1, const_cast<unsigned char*>(image_data), static_cast<size_t>(stride));
+
+            LaneCalculator calculator(width, height);
+            *result = calculator.calculateLaneCenter(binary_mat);
+            return result->detected ? 1 : 0;
+        }
+        catch (...) {
+            // κ쳣ʧ
+            *result = LaneResult();
+            return 0;
+        }
+    }
+
 }
\ No newline at end of file
@@ -1,3 +1,5 @@
+import time
+
 class IncrementalPID:
     def __init__(self, P, I, D):
         self.Kp = P
@@ -61,4 +63,76 @@ class PositionalPID:
            SampleTime * self.PidOutput) / (SampleTime + InertiaTime)
 
            self.LastSystemOutput = self.SystemOutput
-       
\ No newline at end of file
+
+
+#按真实时间计算的位置式PID
+#PositionalPID每次调用算一步，微分、积分和SetInertiaTime的采样周期都是写死的，与实际的循环周期不符，
+#改变控制频率后同样的参数效果不同。TimedPID用帧的采集时间戳计算误差变化率和积分，
+#用两次调用的实际间隔计算惯性环节；MaxLatency>0时按采集到发出指令的延迟把误差向前预测。
+#默认不预测(MaxLatency=0)：模拟器里0.1秒延迟、30Hz时预测反而让横向误差变大(PID_Ctrl 5.49->5.85cm)，
+#15Hz时有没有预测都可能跑不完一圈，还没有证明预测有用(bench_pid.py --max-latencies 0 0.05比较)。
+#参数按整定时的周期SampleTime换算：按这个周期调用且没有延迟时，P、I、D三项与PositionalPID相同(第一帧不算微分)。
+#积分不再固定限幅在2000/-2500，输出达到OutputLimit且误差会让输出继续增大时停止积分(抗积分饱和)。
+class TimedPID:
+    def __init__(self, P, I, D, SampleTime=1/30, InertiaTime=0.0, OutputLimit=None, MaxLatency=0.0, MaxGap=0.5):
+        self.Kp = P
+        self.Ki = I
+        self.Kd = D
+        self.SampleTime = SampleTime      #整定参数时的采样周期(秒)
+        self.InertiaTime = InertiaTime    #一阶惯性环节的时间常数(秒)，0表示不滤波
+        self.OutputLimit = OutputLimit    #输出限幅，None表示不限
+        self.MaxLatency = MaxLatency      #向前预测的最长时间(秒)，0表示不预测(默认)；还没有证明预测有用，见类前面的说明
+        self.MaxGap = MaxGap              #两帧间隔超过这个时间(秒)时重新开始，不用旧的误差算微分和积分
+        self.Reset()
+
+    def Reset(self):
+        self.SystemOutput = 0.0   #系统输出(滤波、限幅后)
+        self.PidOutput = 0.0      #控制器输出
+        self.Integral = 0.0       #误差积分，单位是SampleTime个周期的误差累加
+        self.ErrorRate = 0.0      #误差变化率(每秒)
+        self.Latency = 0.0        #最近一次采集到计算的延迟(秒)
+        self.Error = 0.0          #最近一次预测后的误差
+        self.LastError = None     #上一帧测得的误差
+        self.LastTimestamp = None #上一帧的采集时间
+        self.LastUpdate = None    #上一次计算的时间
+
+    #Error: 本帧测得的误差(设定值-测量值)  Timestamp: 帧的采集时间(time.monotonic)  Now: 发出指令的时间，默认当前时间
+    #返回滤波、限幅后的输出，同时保存在SystemOutput
+    def Update(self, Error, Timestamp, Now=None):
+        if Now is None:
+            Now = time.monotonic()
+        if self.LastTimestamp is None or Timestamp - self.LastTimestamp > self.MaxGap:
+            #第一帧或中断后重新开始：不算微分(避免突变)，积分按一个SampleTime
+            dt = self.SampleTime
+            self.ErrorRate = 0.0
+        elif Timestamp > self.LastTimestamp:
+            dt = Timestamp - self.LastTimestamp
+            self.ErrorRate = (Error - self.LastError) / dt
+        else:
+            #同一帧再次计算：不积分，变化率不变
+            dt = 0.0
+
+        #按延迟向前预测误差
+        self.Latency = min(max(Now - Timestamp, 0.0), self.MaxLatency)
+        Predicted = Error + self.ErrorRate * self.Latency
+
+        self.PidOutput = self.Kp * Predicted + self.Ki * self.Integral + self.Kd * self.ErrorRate * self.SampleTime
+        Saturated = self.OutputLimit is not None and abs(self.PidOutput) >= self.OutputLimit
+        if not (Saturated and self.Ki * Predicted * self.PidOutput > 0):
+            self.Integral += Predicted * dt / self.SampleTime
+
+        #一阶惯性环节，用两次计算的实际间隔
+        if self.InertiaTime > 0 and self.LastUpdate is not None:
+            Elapsed = max(Now - self.LastUpdate, 0.0)
+            Output = (self.InertiaTime * self.SystemOutput + Elapsed * self.PidOutput) / (Elapsed + self.InertiaTime)
+        else:
+            Output = self.PidOutput
+        if self.OutputLimit is not None:
+            Output = min(max(Output, -self.OutputLimit), self.OutputLimit)
+
+        self.SystemOutput = Output
+        self.Error = Predicted
+        self.LastError = Error
+        self.LastTimestamp = Timestamp
+        self.LastUpdate = Now
+        return Output
@@ -5,20 +5,35 @@ import time
 
 global Z_axis_pid
 Z_axis_pid = PID.PositionalPID(0.6, 0, 1) 
-car=Car_Control.Car()
-def PID_Turn(center_x,camera_width):
+#给出帧时间戳时使用：按真实间隔计算、输出饱和时停止积分，换控制频率不用重新整定
+#惯性时间常数按原来的SetInertiaTime(0.4,0.1)换算：原来每次调用滤波系数是0.1/(0.1+0.4)，30Hz时相当于0.4/3秒
+timed=PID.TimedPID(0.6,0,1,SampleTime=1/30,InertiaTime=0.4/3,OutputLimit=60)
+#小车在第一次使用时创建，也可以事先赋值(例如模拟器里接FakeSMBus的Car)
+car=None
+def get_car():
+    global car
+    if car is None:
+        car=Car_Control.Car()
+    return car
+def PID_Turn(center_x,camera_width,timestamp=None,now=None):
     global Z_axis_pid
+    car=get_car()
     sum1=0
     offsets=camera_width*0.5-center_x
     #转向角PID调节
-    Z_axis_pid.SystemOutput=offsets
-    Z_axis_pid.SetStepSignal(0)
-    Z_axis_pid.SetInertiaTime(0.4,0.1)
-    
-    if Z_axis_pid.SystemOutput>60:#调节最大幅度
-        Z_axis_pid.SystemOutput=60
-    elif Z_axis_pid.SystemOutput<-60:
-        Z_axis_pid.SystemOutput=-60
+    if timestamp is not None:
+        #timestamp: 帧的采集时间(time.monotonic)  now: 发指令的时间，默认当前时间
+        output=timed.Update(-offsets,timestamp,now)
+    else:
+        Z_axis_pid.SystemOutput=offsets
+        Z_axis_pid.SetStepSignal(0)
+        Z_axis_pid.SetInertiaTime(0.4,0.1)
+        
+        if Z_axis_pid.SystemOutput>60:#调节最大幅度
+            Z_axis_pid.SystemOutput=60
+        elif Z_axis_pid.SystemOutput<-60:
+            Z_axis_pid.SystemOutput=-60
+        output=Z_axis_pid.SystemOutput
     
 
     
@@ -28,7 +43,8 @@ def PID_Turn(center_x,camera_width):
             car.Dir_Car(-70,60)
             
         else:
-            car.Dir_Car(60-int(Z_axis_pid.SystemOutput),60+int(Z_axis_pid.SystemOutput))
+            #output与offsets反号：offsets>0时左轮减速、右轮加速，与急转分支同向
+            car.Dir_Car(60+int(output),60-int(output))
         time.sleep(0.001)
             
     elif offsets<-3 and offsets>-500:
@@ -36,11 +52,13 @@ def PID_Turn(center_x,camera_width):
             car.Dir_Car(60,-70)
 
         else:
-            car.Dir_Car(60-int(Z_axis_pid.SystemOutput),60+int(Z_axis_pid.SystemOutput))
+            car.Dir_Car(60+int(output),60-int(output))
         time.sleep(0.001)
         
     elif offsets<-500 or offsets>500:
         car.Car_Stop()
         
     else:
-        car.Car_Run(50,50)    
+        car.Car_Run(50,50)
+    #返回偏移量和限幅后的PID输出，供telemetry记录
+    return offsets,output
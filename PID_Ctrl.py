@@ -4,22 +4,36 @@ import time
 
 #PID赋值
 sport = PID.PositionalPID(0.6,0,1)
+#给出帧时间戳时使用：按真实间隔计算、输出饱和时停止积分，换控制频率不用重新整定
+#惯性时间常数按原来的SetInertiaTime(0.1,0.01)换算：原来每次调用滤波系数是0.01/(0.01+0.1)，30Hz时相当于1/3秒
+timed = PID.TimedPID(0.6,0,1,SampleTime=1/30,InertiaTime=1/3,OutputLimit=30)
 
-#创建小车对象
-car = Car_Control.Car() 
-def PID_Turn(offsets):
+#小车对象在第一次使用时创建，也可以事先赋值(例如模拟器里接FakeSMBus的Car)
+car = None
+def get_car():
+    global car
+    if car is None:
+        car = Car_Control.Car()
+    return car
+def PID_Turn(offsets, timestamp=None, now=None):
     
+    car = get_car()
     #offsets = 159 - center_x
-    sport.SystemOutput = offsets
-    sport.SetStepSignal(0)#这一行运行时，有error(误差) = 0 - sport.SystemOutput，又error与下一行sport.SystemOutput的再赋值有关，当offsets大于0时，条件语句中的sport.SystemOutput＜0
-    sport.SetInertiaTime(0.1,0.01)
+    if timestamp is not None:
+        #timestamp: 帧的采集时间(time.monotonic)  now: 发指令的时间，默认当前时间
+        output = timed.Update(-offsets, timestamp, now)
+    else:
+        sport.SystemOutput = offsets
+        sport.SetStepSignal(0)#这一行运行时，有error(误差) = 0 - sport.SystemOutput，又error与下一行sport.SystemOutput的再赋值有关，当offsets大于0时，条件语句中的sport.SystemOutput＜0
+        sport.SetInertiaTime(0.1,0.01)
 
 
-    if sport.SystemOutput > 30:
-        sport.SystemOutput = 30
-    elif sport.SystemOutput < -30:
-        sport.SystemOutput = -30
-    #如果不限制最大系统输出?
+        if sport.SystemOutput > 30:
+            sport.SystemOutput = 30
+        elif sport.SystemOutput < -30:
+            sport.SystemOutput = -30
+        #如果不限制最大系统输出?
+        output = sport.SystemOutput
 
 
     if offsets > 15:#黑线在中线左边，小车左转。
@@ -29,8 +43,7 @@ def PID_Turn(offsets):
         #当去除偏差较大时小车大幅转弯时，能否消除当时突然停止往相反方向转弯的影响
         
         else:
-            car.Dir_Car(60+int(sport.SystemOutput),60-int(sport.SystemOutput))
-            print('turn left')
+            car.Dir_Car(60+int(output),60-int(output))
         time.sleep(0.001)
 
     elif offsets < -15 and offsets > -161:
@@ -39,8 +52,7 @@ def PID_Turn(offsets):
             car.Dir_Car(70,-70)
         '''
         #else:
-        car.Dir_Car(60+int(sport.SystemOutput),60-int(sport.SystemOutput))
-        print('turn right')
+        car.Dir_Car(60+int(output),60-int(output))
         time.sleep(0.001)
         
     elif offsets < -500:
@@ -48,3 +60,6 @@ def PID_Turn(offsets):
 
     else:
         car.Car_Run(60,60)
+
+    #返回偏移量和限幅后的PID输出，供telemetry记录(原来每帧print，控制循环里太慢)
+    return offsets, output
@@ -0,0 +1,181 @@
+"""
+分条带的车道模型: 曲率和预瞄点
+
+其他检测器都把整个ROI压成一个列直方图，只得到一个center_x，弯道里车道线是斜的、弯的，
+列直方图把不同远近的位置混在一起，只能低速过弯。
+BandLaneDetector把逆透视后的二值图按行分成N个条带，一次向量化计算得到每个条带的左右边界和中点:
+cv2.integral得到行方向的前缀和(积分图)，取条带分界行相减就是每个条带每列的白色像素数，
+每个条带的边界与example.find_lane_center相同(第一个/最后一个有效列)。
+再对左右边界各拟合一条低阶多项式 x = f(y)，在预瞄行(lookahead)上给出中线位置、车道方向和曲率，
+PID_Turn可以用预瞄点的中线代替整个ROI平均的中线。
+
+坐标: y是二值图的行(0在最上面，逆透视图里离小车最远)，x是列。
+    heading   预瞄点处车道相对小车前进方向的角度(弧度)，车道向右偏为正
+    curvature 预瞄点处的曲率(1/像素)，向右弯为正
+
+    detector = BandLaneDetector(bands=8, lookahead=24)
+    model = detector.fit(roi)          # LaneModel或None
+    model.center_x, model.heading, model.curvature
+
+预瞄行越远过弯越早(切弯)，横向误差越大；模拟器里(simulator.py --detector bands)同样的PID参数，
+预瞄行从ROI最下面移到最上面，横向误差均方根从约2.8cm增大到约9.3cm，圈速从50.9s缩短到49.2s。
+耗时预算: 320x240的二值图每帧不超过100us(开发机，bench_bandlane.py检查)，96行的ROI约35-38us。
+"""
+import math
+
+import cv2
+import numpy as np
+
+import image
+
+
+class LaneModel:
+    """
+    BandLaneDetector.fit的结果
+    :param coeffs: (degree+1, 2) 左右边界的多项式系数(高次在前)，x = np.polyval(coeffs[:, i], y)
+    :param lookahead: 预瞄行(限制在检测到的条带范围内之后)
+    :param band_y: 各条带中间行
+    :param band_left, band_right: 各条带的左右边界，没检测到的条带为-1
+    """
+
+    def __init__(self, coeffs, lookahead, band_y, band_left, band_right):
+        self.coeffs = coeffs
+        self.lookahead = lookahead
+        self.band_y = band_y
+        self.band_left = band_left
+        self.band_right = band_right
+
+        # 系数只有几个，用Python浮点数按Horner法同时求值和中线的一、二阶导数，比np.polyval/np.polyder快得多
+        left = right = first = second = 0.0
+        for a, b in coeffs.tolist():
+            second = second * lookahead + 2 * first
+            first = first * lookahead + (left + right) / 2
+            left = left * lookahead + a
+            right = right * lookahead + b
+        self.left_bound = left
+        self.right_bound = right
+        self.center_x = (left + right) / 2
+        # y向下增大、小车向y减小的方向前进，所以前进方向上的斜率是-dx/dy，二阶导数不变号
+        slope = -first
+        self.heading = math.atan(slope)
+        self.curvature = second / (1 + slope * slope) ** 1.5
+
+    @property
+    def detected_bands(self):
+        return int(np.count_nonzero(self.band_left >= 0))
+
+    def center_at(self, y):
+        """第y行的中线位置(可以是数组)"""
+        return np.polyval(self.coeffs.mean(axis=1), y)
+
+
+class BandLaneDetector:
+    """
+    :param bands: 条带数
+    :param degree: 拟合的多项式阶数，检测到的条带不够时自动降阶
+    :param lookahead: 预瞄行(二值图的行号，0是最远的一行)，默认是中间行，与ctype/framepool返回的center_y相同；
+                      远处的条带没检测到时不外推，限制在检测到的条带范围内
+    :param min_fill: 条带里有效列至少的白色像素占条带高度的比例，
+                     96行的ROI整体用的是>6个像素，8个条带时每条带12行，默认>3个像素
+    :param min_bands: 至少检测到多少个条带才拟合，否则返回None
+    :param pool: image.BufferPool，积分图写入池里的缓冲区
+    """
+
+    def __init__(self, bands=8, degree=2, lookahead=None, min_fill=0.25, min_bands=3, pool=None):
+        if bands < min_bands:
+            raise ValueError("bands must be >= min_bands")
+        self.bands = bands
+        self.degree = degree
+        self.lookahead = lookahead
+        self.min_fill = min_fill
+        self.min_bands = max(min_bands, 1)
+        self.pool = image.BufferPool() if pool is None else pool
+        self._layouts = {}
+        self._solvers = {}
+
+    def layout(self, height):
+        """每个高度的条带分界行、中间行和有效列阈值"""
+        if height in self._layouts:
+            return self._layouts[height]
+        edges = np.linspace(0, height, self.bands + 1).round().astype(np.intp)
+        band_y = (edges[:-1] + edges[1:] - 1) / 2
+        # 白色像素是255，直接和列和比较，不用除以255
+        min_sums = (np.diff(edges) * self.min_fill * 255).astype(np.int32)[:, None]
+        layout = (edges, band_y, min_sums)
+        self._layouts[height] = layout
+        return layout
+
+    def solver(self, height, found):
+        """
+        检测到found这些条带时的最小二乘矩阵(伪逆，(degree+1, bands)，没检测到的条带对应的列为0)
+        条带数很少，检测到哪些条带的组合有限，每种组合只算一次
+        """
+        key = (height, found.tobytes())
+        pinv = self._solvers.get(key)
+        if pinv is None:
+            band_y = self.layout(height)[1]
+            degree = min(self.degree, int(np.count_nonzero(found)) - 1)
+            pinv = np.zeros((degree + 1, self.bands))
+            pinv[:, found] = np.linalg.pinv(np.vander(band_y[found], degree + 1))
+            self._solvers[key] = pinv
+        return pinv
+
+    def band_sums(self, binary):
+        """
+        每个条带每列的像素值之和
+        :param binary: 二值图(0/255)，例如image.get_roi或image.preprocess_image的结果
+        :return: (bands, width) int32
+        """
+        height, width = binary.shape
+        edges = self.layout(height)[0]
+        integral = self.pool.get('band_integral', (height + 1, width + 1), np.int32)
+        cv2.integral(binary, integral, cv2.CV_32S)
+        # 积分图的第r行第c列是前r行、前c列之和，相邻两列相减得到每列前r行的和
+        rows = integral[edges]
+        columns = rows[:, 1:] - rows[:, :-1]
+        return columns[1:] - columns[:-1]
+
+    def band_bounds(self, binary):
+        """
+        每个条带的左右边界(第一个/最后一个有效列)
+        :return: (left, right)，没检测到的条带为-1
+        """
+        min_sums = self.layout(binary.shape[0])[2]
+        valid = self.band_sums(binary) > min_sums
+        found = valid.any(axis=1)
+        left = np.where(found, valid.argmax(axis=1), -1)
+        right = np.where(found, valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1), -1)
+        return left, right
+
+    def fit(self, binary):
+        """
+        :param binary: 二值图(0/255)
+        :return: LaneModel，检测到的条带少于min_bands时返回None
+        """
+        height = binary.shape[0]
+        edges, band_y, _ = self.layout(height)
+        left, right = self.band_bounds(binary)
+        found = left >= 0
+        if np.count_nonzero(found) < self.min_bands:
+            return None
+        # 没检测到的条带边界是-1，伪逆里对应的列为0，不影响结果
+        coeffs = self.solver(height, found) @ np.stack([left, right], axis=1)
+        rows = np.flatnonzero(found)
+        lookahead = height // 2 if self.lookahead is None else self.lookahead
+        lookahead = min(max(lookahead, int(edges[rows[0]])), int(edges[rows[-1] + 1]) - 1)
+        return LaneModel(coeffs, lookahead, band_y, left, right)
+
+    def find_lane_center(self, binary):
+        """
+        与example.find_lane_center相同的返回值，但是预瞄行上的位置
+        :return: (left_bound, right_bound, lane_center)，没找到返回None
+        """
+        model = self.fit(binary)
+        if model is None:
+            return None
+        return int(round(model.left_bound)), int(round(model.right_bound)), int(round(model.center_x))
+
+    def detect(self, binary):
+        """runtime用的接口: 预瞄行上的中线位置，没找到返回None"""
+        model = self.fit(binary)
+        return None if model is None else int(round(model.center_x))
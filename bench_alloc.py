@@ -0,0 +1,103 @@
+"""
+稳态帧处理的内存分配检查(tracemalloc)
+
+对每种处理方式先预热(每个分辨率的第一帧会分配缓冲区)，再在tracemalloc下处理--frames帧:
+    numpy       numpy数据缓冲区(np.lib.tracemalloc_domain)在这些帧前后的增量，保留了最后一帧的结果
+    transient   单帧内已分配内存峰值比处理前多出的字节数(包括处理完就释放的临时数组和Python对象)
+    ms          不开tracemalloc时每帧平均耗时
+池化的处理方式(pooled*)要求numpy增量为0、transient不超过--max-transient字节，否则返回1。
+
+用法: python bench_alloc.py [--frames 50] [--max-transient 1024]
+"""
+import argparse
+import glob
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import Camera
+import example
+import image
+from framepool import ColumnCountFinder, FramePipeline
+
+
+def load_frames(pattern="results/*.jpg"):
+    return [cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height))
+            for path in sorted(glob.glob(pattern))]
+
+
+def make_cases():
+    cases = {}
+    preprocessor = image.RoiPreprocessor()
+    cases['alloc'] = lambda frame: example.find_lane_center(preprocessor.process(frame))
+    cases['pooled'] = FramePipeline().process
+    cases['pooled-adaptive'] = FramePipeline(threshold=image.AdaptiveThreshold()).process
+    try:
+        from ctype import LaneDetector
+        detector = LaneDetector()
+    except OSError as e:
+        print(f"跳过C++检测器: {e}")
+    else:
+        pool = image.BufferPool()
+        pooled_preprocessor = image.RoiPreprocessor(pool=pool)
+        cases['pooled-ctype'] = lambda frame: detector.detect(pooled_preprocessor.process(frame))
+    return cases
+
+
+def measure(process, frames, count):
+    """:return: (numpy缓冲区增量字节, numpy缓冲区增量个数, 最大单帧transient字节)"""
+    domain = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(domain)
+        transient = 0
+        result = None
+        for i in range(count):
+            frame = frames[i % len(frames)]
+            result = None
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = process(frame)
+            transient = max(transient, tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot().filter_traces(domain)
+    finally:
+        tracemalloc.stop()
+    growth = after.compare_to(before, 'traceback')
+    del result
+    return sum(s.size_diff for s in growth), sum(s.count_diff for s in growth), transient
+
+
+def timing(process, frames, count):
+    start = time.perf_counter()
+    for i in range(count):
+        process(frames[i % len(frames)])
+    return (time.perf_counter() - start) / count * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="steady-state allocation check")
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=2, help='预热遍数(每遍处理全部图片)')
+    parser.add_argument('--max-transient', type=int, default=1024, help='池化处理单帧允许的临时分配字节数')
+    args = parser.parse_args()
+
+    frames = load_frames()
+    print(f"{'':16s} {'numpy增量':>10s} {'个数':>5s} {'transient':>10s} {'ms':>7s}")
+    failed = False
+    for name, process in make_cases().items():
+        for _ in range(args.warmup):
+            for frame in frames:
+                process(frame)
+        size, count, transient = measure(process, frames, args.frames)
+        ms = timing(process, frames, args.frames * 4)
+        ok = size == 0 and count == 0 and transient <= args.max_transient
+        mark = '' if not name.startswith('pooled') else ('  ok' if ok else '  FAIL')
+        failed |= name.startswith('pooled') and not ok
+        print(f"{name:16s} {size:10d} {count:5d} {transient:10d} {ms:7.3f}{mark}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
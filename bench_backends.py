@@ -0,0 +1,296 @@
+"""
+车道中线检测后端的基准测试和一致性对比
+
+后端: example.find_lane_center、旧/only_Run.AutoLaneFollower.find_lane_center、
+LCL2.LaneCalculator、LCL2.FastLaneCalculator、ctype.LaneDetector(LaneCenterLocator2.so)
+无法加载的后端(缺少.so或依赖)会跳过并在结果中注明原因。
+
+帧集合: results/warped_*.jpg 逆透视+二值化后按96行切出的ROI，加上合成的车道ROI。
+对每个后端统计帧率、单帧耗时分布、每次调用分配的内存(tracemalloc)，
+以及各后端两两之间center_x的差异。结果写入JSON，--compare可以与上一次结果对比找出性能回退。
+
+用法: python bench_backends.py [--repeat 20] [--output bench_backends.json] [--compare old.json]
+"""
+import argparse
+import contextlib
+import glob
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import types
+
+import cv2
+import numpy as np
+
+import image
+
+ROI_HEIGHT = image.ROI_BOTTOM - image.ROI_TOP
+ROI_WIDTH = image.ROI_RIGHT - image.ROI_LEFT
+
+
+def sample_rois(pattern="results/warped_*.jpg"):
+    """样例帧的二值化ROI条带"""
+    rois = []
+    for path in sorted(glob.glob(pattern)):
+        binary = image.preprocess_image(image.inverse_perspective(cv2.imread(path)))
+        for top in range(0, binary.shape[0] - ROI_HEIGHT + 1, ROI_HEIGHT):
+            rois.append((f"{os.path.basename(path)}[{top}]",
+                         np.ascontiguousarray(binary[top:top + ROI_HEIGHT, 0:ROI_WIDTH])))
+    return rois
+
+
+def synthetic_rois(count, seed=0):
+    """合成的二值化ROI：两条车道线(白色)，随机位置、宽度、倾斜，加少量噪点"""
+    rng = np.random.default_rng(seed)
+    rois = []
+    for i in range(count):
+        roi = np.zeros((ROI_HEIGHT, ROI_WIDTH), dtype=np.uint8)
+        center = rng.integers(90, 230)
+        half_width = rng.integers(50, 90)
+        slope = rng.uniform(-0.4, 0.4)
+        line_width = int(rng.integers(6, 16))
+        for x0 in (center - half_width, center + half_width):
+            top = (int(x0 - slope * ROI_HEIGHT / 2), 0)
+            bottom = (int(x0 + slope * ROI_HEIGHT / 2), ROI_HEIGHT - 1)
+            cv2.line(roi, top, bottom, 255, line_width)
+        for _ in range(rng.integers(0, 4)):
+            cv2.circle(roi, (int(rng.integers(0, ROI_WIDTH)), int(rng.integers(0, ROI_HEIGHT))),
+                       int(rng.integers(1, 4)), 255, -1)
+        rois.append((f"synthetic[{i}]", roi))
+    return rois
+
+
+@contextlib.contextmanager
+def fake_hardware_modules():
+    """
+    导入期间用假的smbus/picamera2代替没有安装的硬件模块: 旧/only_Run.py在导入时就
+    import smbus和picamera2，开发机上没有这两个模块。SMBus返回Car_Control.FakeSMBus，
+    Picamera2实例化时报错(基准测试只调用find_lane_center，不打开摄像头)
+    """
+    from Car_Control import FakeSMBus
+
+    class FakePicamera2:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("bench_backends: no camera")
+
+    fakes = {
+        "smbus": types.SimpleNamespace(SMBus=lambda bus=None: FakeSMBus()),
+        "picamera2": types.SimpleNamespace(Picamera2=FakePicamera2),
+    }
+    added = [name for name in fakes if name not in sys.modules and importlib.util.find_spec(name) is None]
+    for name in added:
+        sys.modules[name] = fakes[name]
+    try:
+        yield
+    finally:
+        for name in added:
+            sys.modules.pop(name, None)
+
+
+def load_only_run():
+    """旧/only_Run.py 目录名不是合法的包名，按文件路径加载"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "旧", "only_Run.py")
+    spec = importlib.util.spec_from_file_location("only_Run", path)
+    module = importlib.util.module_from_spec(spec)
+    with fake_hardware_modules():
+        spec.loader.exec_module(module)
+    return module
+
+
+@contextlib.contextmanager
+def no_display():
+    """
+    测试期间屏蔽OpenCV的显示调用: 被测后端(例如旧版LCL2.LaneCalculator)里的
+    cv2.imshow/cv2.waitKey(0)会弹窗等待按键，基准测试就卡住不动
+    """
+    names = ("imshow", "waitKey", "namedWindow", "destroyAllWindows")
+    saved = {name: getattr(cv2, name) for name in names}
+    cv2.imshow = cv2.namedWindow = cv2.destroyAllWindows = lambda *a, **k: None
+    cv2.waitKey = lambda *a, **k: -1
+    try:
+        yield
+    finally:
+        for name, func in saved.items():
+            setattr(cv2, name, func)
+
+
+def make_backends():
+    """返回 ({名称: roi -> center_x或None}, {名称: 跳过原因})"""
+    backends = {}
+    skipped = {}
+
+    try:
+        import example
+
+        def run_example(roi):
+            result = example.find_lane_center(roi)
+            return None if result is None else int(result[2])
+        backends["example"] = run_example
+    except Exception as e:
+        skipped["example"] = repr(e)
+
+    try:
+        only_run = load_only_run()
+        follower = types.SimpleNamespace(roi_start=0, roi_height=ROI_HEIGHT)
+
+        def run_only_run(roi):
+            result = only_run.AutoLaneFollower.find_lane_center(follower, roi)
+            return None if result is None else int(result[0])
+        backends["only_Run"] = run_only_run
+    except Exception as e:
+        skipped["only_Run"] = repr(e)
+
+    import LCL2
+
+    def lcl2_backend(calculator):
+        def run_lcl2(roi):
+            result = calculator.calculate_lane_center(roi)
+            return result.center_x if result.detected else None
+        return run_lcl2
+    backends["LCL2"] = lcl2_backend(LCL2.LaneCalculator(ROI_WIDTH, ROI_HEIGHT))
+    backends["LCL2.fast"] = lcl2_backend(LCL2.FastLaneCalculator(ROI_WIDTH, ROI_HEIGHT))
+    backends["LCL2.fast_diff"] = lcl2_backend(LCL2.FastLaneCalculator(ROI_WIDTH, ROI_HEIGHT, binary_edges=True))
+
+    try:
+        from ctype import LaneDetector
+        detector = LaneDetector()
+
+        def run_ctype(roi):
+            result = detector.detect(roi)
+            return None if result is None else result.center_x
+        backends["ctype"] = run_ctype
+    except Exception as e:
+        skipped["ctype"] = repr(e)
+
+    return backends, skipped
+
+
+def measure(func, rois, repeat):
+    """每帧重复repeat次，返回耗时分布、内存分配和每帧结果"""
+    results = [func(roi) for _, roi in rois]
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, roi in rois:
+            t = time.perf_counter()
+            func(roi)
+            latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    # 单独跑一遍统计内存，tracemalloc会拖慢计时
+    tracemalloc.start()
+    allocated = peak = 0
+    for _, roi in rois:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(roi)
+        current, call_peak = tracemalloc.get_traced_memory()
+        allocated += max(current - before, 0)
+        peak = max(peak, call_peak - before)
+    tracemalloc.stop()
+
+    ms = np.array(latencies) * 1e3
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    return {
+        "fps": len(latencies) / elapsed,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+        "retained_bytes_per_call": allocated / len(rois),
+        "peak_bytes_per_call": int(peak),
+        "detected": sum(r is not None for r in results),
+    }, results
+
+
+def disagreement(a, b):
+    """两个后端结果的差异：检测状态不同的帧数，以及都检测到时center_x的平均/最大差"""
+    status = sum((x is None) != (y is None) for x, y in zip(a, b))
+    diffs = [abs(x - y) for x, y in zip(a, b) if x is not None and y is not None]
+    return {
+        "status_mismatch": status,
+        "both_detected": len(diffs),
+        "mean_abs_diff": float(np.mean(diffs)) if diffs else 0.0,
+        "max_abs_diff": int(max(diffs)) if diffs else 0,
+    }
+
+
+def compare(current, previous, tolerance):
+    """返回帧率下降超过tolerance的后端"""
+    regressions = []
+    for name, stats in current["backends"].items():
+        old = previous.get("backends", {}).get(name)
+        if old and stats["fps"] < old["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: {old['fps']:.0f} -> {stats['fps']:.0f} fps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="lane center backend benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="每帧重复次数")
+    parser.add_argument("--synthetic", type=int, default=50, help="合成帧数量")
+    parser.add_argument("--output", default="bench_backends.json")
+    parser.add_argument("--compare", help="上一次的结果JSON，帧率下降超过--tolerance时返回1")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rois = sample_rois() + synthetic_rois(args.synthetic)
+
+    stats = {}
+    outputs = {}
+    # 后端的加载和测量都在屏蔽显示的范围内
+    with no_display():
+        backends, skipped = make_backends()
+        for name, func in backends.items():
+            # 原版逐像素循环很慢，少跑几遍
+            repeat = 1 if name == "LCL2" else args.repeat
+            stats[name], outputs[name] = measure(func, rois, repeat)
+
+    names = list(outputs)
+    pairs = {f"{a} vs {b}": disagreement(outputs[a], outputs[b])
+             for i, a in enumerate(names) for b in names[i + 1:]}
+
+    report = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "frames": len(rois),
+        "backends": stats,
+        "skipped": skipped,
+        "disagreement": pairs,
+        "center_x": {name: [None if x is None else int(x) for x in out] for name, out in outputs.items()},
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    print(f"帧数 {len(rois)}")
+    print(f"{'backend':16s} {'fps':>9s} {'p50':>8s} {'p99':>8s} {'max':>8s} {'peak B':>8s} {'detected':>8s}")
+    for name, s in stats.items():
+        print(f"{name:16s} {s['fps']:9.0f} {s['p50_ms']:8.3f} {s['p99_ms']:8.3f} {s['max_ms']:8.3f} "
+              f"{s['peak_bytes_per_call']:8d} {s['detected']:8d}")
+    for name, reason in skipped.items():
+        print(f"{name:16s} 跳过: {reason}")
+    print()
+    for pair, d in pairs.items():
+        print(f"{pair:34s} 状态不同 {d['status_mismatch']:3d}  都检测到 {d['both_detected']:3d}  "
+              f"平均差 {d['mean_abs_diff']:6.1f}  最大差 {d['max_abs_diff']:4d}")
+    print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("性能回退:", line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
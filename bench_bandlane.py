@@ -0,0 +1,122 @@
+"""
+bandlane.BandLaneDetector的正确性、曲率精度和耗时
+
+    条带边界   积分图向量化计算的每个条带左右边界，与逐个条带用np.count_nonzero统计的结果相同
+    曲率       合成的抛物线车道(已知曲率和方向)，预瞄行上拟合的中线、方向和曲率的误差
+    耗时       320x240的逆透视二值图和96行ROI的每帧耗时(中位数)，与example.find_lane_center对比，
+               320x240超过--budget-us时返回1
+
+用法: python bench_bandlane.py [--bands 8] [--repeat 200] [--budget-us 100]
+"""
+import argparse
+import glob
+import math
+import time
+
+import cv2
+import numpy as np
+
+import Camera
+import example
+import image
+from bandlane import BandLaneDetector
+from bench_backends import sample_rois, synthetic_rois
+
+
+def reference_bounds(detector, binary):
+    """逐个条带统计列的白色像素数"""
+    edges = detector.layout(binary.shape[0])[0]
+    left, right = [], []
+    for top, bottom in zip(edges[:-1], edges[1:]):
+        counts = np.count_nonzero(binary[top:bottom], axis=0)
+        columns = np.flatnonzero(counts > (bottom - top) * detector.min_fill)
+        left.append(columns[0] if columns.size else -1)
+        right.append(columns[-1] if columns.size else -1)
+    return np.array(left), np.array(right)
+
+
+def curved_lane(curvature, heading, center=160, half_width=70, height=96, width=320, line_width=8):
+    """
+    中线 x(y) 在中间行有给定的方向和曲率的抛物线车道
+    :return: (binary, 中间行的真实中线位置)
+    """
+    y0 = height // 2
+    slope = math.tan(heading)
+    binary = np.zeros((height, width), dtype=np.uint8)
+    ys = np.arange(height)
+    # 前进方向是y减小的方向: dx/ds = -dx/dy
+    xs = center - slope * (ys - y0) + curvature * (1 + slope * slope) ** 1.5 / 2 * (ys - y0) ** 2
+    for offset in (-half_width, half_width):
+        points = np.stack([xs + offset, ys], axis=1).round().astype(np.int32)
+        cv2.polylines(binary, [points], False, 255, line_width)
+    return binary, center
+
+
+def per_frame_us(func, items, repeat):
+    times = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            func(item)
+            times.append(time.perf_counter() - start)
+    return np.median(times) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="row-band lane model accuracy and cost")
+    parser.add_argument('--bands', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--budget-us', type=float, default=100, help='320x240二值图每帧耗时上限(us)')
+    args = parser.parse_args()
+    detector = BandLaneDetector(bands=args.bands)
+    problems = []
+
+    frames = [cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height))
+              for path in sorted(glob.glob('results/*.jpg'))]
+    binaries = [image.preprocess_image(image.inverse_perspective(frame)) for frame in frames]
+    rois = [roi for _, roi in sample_rois() + synthetic_rois(50)]
+
+    mismatches = 0
+    for binary in binaries + rois:
+        left, right = detector.band_bounds(binary)
+        expected_left, expected_right = reference_bounds(detector, binary)
+        mismatches += not (np.array_equal(left, expected_left) and np.array_equal(right, expected_right))
+    print(f"条带边界: {len(binaries) + len(rois)}帧  与逐条带统计不同 {mismatches}")
+    if mismatches:
+        problems.append("条带边界与逐条带统计不一致")
+
+    center_errors, heading_errors, curvature_errors = [], [], []
+    for curvature in (-0.008, -0.004, 0, 0.004, 0.008):
+        for heading in (-0.4, 0, 0.4):
+            binary, center = curved_lane(curvature, heading)
+            model = detector.fit(binary)
+            if model is None:
+                problems.append(f"合成车道没检测到 curvature={curvature} heading={heading}")
+                continue
+            center_errors.append(abs(model.center_x - center))
+            heading_errors.append(abs(model.heading - heading))
+            curvature_errors.append(abs(model.curvature - curvature))
+    if center_errors:
+        print(f"合成抛物线车道 {len(center_errors)}条，预瞄行(中间行)误差最大值: "
+              f"中线 {max(center_errors):.2f} px  方向 {math.degrees(max(heading_errors)):.2f}°  "
+              f"曲率 {max(curvature_errors):.5f} 1/px")
+        if max(center_errors) > 3 or max(heading_errors) > 0.05 or max(curvature_errors) > 0.002:
+            problems.append("合成车道的拟合误差过大")
+
+    binaries = [np.ascontiguousarray(binary) for binary in binaries]
+    roi_copies = [np.ascontiguousarray(image.get_roi(binary)) for binary in binaries]
+    full = per_frame_us(detector.fit, binaries, args.repeat)
+    print(f"耗时(每帧中位数, us)  条带数 {args.bands}:")
+    print(f"  320x240  BandLaneDetector.fit {full:8.1f}   (预算 {args.budget_us:.0f})")
+    print(f"  ROI      BandLaneDetector.fit {per_frame_us(detector.fit, roi_copies, args.repeat):8.1f}"
+          f"   example.find_lane_center {per_frame_us(example.find_lane_center, roi_copies, args.repeat):8.1f}")
+    if full > args.budget_us:
+        problems.append(f"320x240每帧 {full:.1f} us 超过预算 {args.budget_us:.0f} us")
+
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
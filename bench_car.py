@@ -0,0 +1,77 @@
+"""
+电机指令写入基准测试(不需要硬件)：
+用FakeSMBus模拟每次I2C传输的耗时，对比同步写入与BusWriter异步写入时
+控制线程每秒能发出的指令数、总线实际写入次数和指令从发出到写完的延迟
+
+控制循环按--loop-hz的频率发指令，其余时间sleep(相当于图像处理时释放GIL)
+
+用法: python bench_car.py [--bus-ms 0.6] [--loop-hz 500] [--seconds 2] [--repeat-ratio 0.8]
+"""
+import argparse
+import random
+import time
+
+from Car_Control import Car, FakeSMBus
+
+
+def make_commands(count, repeat_ratio, seed=1):
+    """模拟PID_Turn输出的指令序列，大部分与上一条相同"""
+    rng = random.Random(seed)
+    commands = []
+    current = (60, 60)
+    for _ in range(count):
+        if rng.random() >= repeat_ratio:
+            turn = rng.randint(-30, 30)
+            current = (60 - turn, 60 + turn)
+        commands.append(current)
+    return commands
+
+
+def run(car, commands, seconds, loop_hz):
+    period = 1.0 / loop_hz
+    start = time.perf_counter()
+    next_time = start
+    calls = 0
+    call_time = 0.0
+    while time.perf_counter() - start < seconds:
+        speed1, speed2 = commands[calls % len(commands)]
+        t = time.perf_counter()
+        car.Dir_Car(speed1, speed2)
+        call_time += time.perf_counter() - t
+        calls += 1
+        next_time += period
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    return calls / elapsed, call_time / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="motor command writer benchmark")
+    parser.add_argument("--bus-ms", type=float, default=0.6, help="每次I2C传输耗时(ms)")
+    parser.add_argument("--loop-hz", type=float, default=500, help="控制循环发指令的频率")
+    parser.add_argument("--seconds", type=float, default=2)
+    parser.add_argument("--repeat-ratio", type=float, default=0.8, help="与上一条指令相同的比例")
+    args = parser.parse_args()
+    commands = make_commands(10000, args.repeat_ratio)
+
+    device = FakeSMBus(delay=args.bus_ms / 1000)
+    car = Car(device=device)
+    rate, per_call = run(car, commands, args.seconds, args.loop_hz)
+    print(f"同步: {rate:9.0f} 指令/s  每次调用 {per_call * 1e6:8.1f} us  总线写入 {device.transactions}")
+
+    device = FakeSMBus(delay=args.bus_ms / 1000)
+    car = Car(async_writes=True, device=device)
+    rate, per_call = run(car, commands, args.seconds, args.loop_hz)
+    car.close()
+    stats = car._writer.stats()
+    print(f"异步: {rate:9.0f} 指令/s  每次调用 {per_call * 1e6:8.1f} us  总线写入 {device.transactions}")
+    print(f"    合并 {stats['coalesced']}  跳过重复 {stats['skipped']}  错误 {stats['errors']}  "
+          f"超时 {stats['overruns']}")
+    print(f"    提交到写完延迟 平均 {stats['mean_latency'] * 1e3:.3f} ms  最大 {stats['max_latency'] * 1e3:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""
+采集线程基准测试(不需要摄像头)：
+用ImageFolderSource按固定帧率回放results/*.jpg，模拟每帧处理耗时，
+对比串行 capture -> 处理 与 FrameGrabber后台采集时的帧率、帧龄和丢帧数
+
+用法: python bench_grabber.py [--fps 30] [--work-ms 20] [--seconds 3]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import Camera
+
+
+def busy_wait(seconds):
+    """模拟占用CPU的图像处理"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run_serial(args):
+    source = Camera.ImageFolderSource(args.pattern, fps=args.fps)
+    frames = 0
+    start = time.monotonic()
+    while time.monotonic() - start < args.seconds:
+        source.capture_array()
+        busy_wait(args.work_ms / 1000)
+        frames += 1
+    return frames / (time.monotonic() - start)
+
+
+def run_grabber(args):
+    grabber = Camera.FrameGrabber(Camera.ImageFolderSource(args.pattern, fps=args.fps)).start()
+    ages = []
+    last_seq = -1
+    gaps = 0
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < args.seconds:
+            frame, timestamp, seq = grabber.read(timeout=1.0)
+            if frame is None:
+                break
+            ages.append(time.monotonic() - timestamp)
+            if last_seq >= 0 and seq != last_seq + 1:
+                gaps += 1
+            last_seq = seq
+            busy_wait(args.work_ms / 1000)
+    finally:
+        grabber.stop()
+    fps = len(ages) / (time.monotonic() - start)
+    return fps, np.array(ages) * 1e3, grabber.stats(), gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FrameGrabber benchmark")
+    parser.add_argument("--pattern", default="results/*.jpg")
+    parser.add_argument("--fps", type=float, default=30, help="回放帧率")
+    parser.add_argument("--work-ms", type=float, default=20, help="模拟每帧处理耗时")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    serial_fps = run_serial(args)
+    grabber_fps, ages, stats, gaps = run_grabber(args)
+    print(f"串行:        {serial_fps:6.1f} fps")
+    print(f"FrameGrabber: {grabber_fps:6.1f} fps  帧龄 p50 {np.percentile(ages, 50):.2f} ms  "
+          f"max {ages.max():.2f} ms")
+    print(f"采集 {stats['captured']} 帧，丢弃 {stats['dropped']} 帧，序号跳变 {gaps} 次，错误 {stats['errors']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,66 @@
+"""
+逆透视变换基准测试：
+对比每帧调用的image.inverse_perspective与预计算remap表的PerspectiveMapper
+
+用法: python bench_ipm.py [--repeat 200]
+"""
+import argparse
+import glob
+import time
+
+import cv2
+import numpy as np
+
+import image
+
+
+def time_per_call(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="inverse perspective benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="每帧重复次数")
+    args = parser.parse_args()
+
+    frames = [cv2.imread(path) for path in sorted(glob.glob("results/warped_*.jpg"))]
+    if not frames:
+        print("results/ 下没有样例帧")
+        return 1
+    # 样例帧是600x400，同时测一下相机的320x240分辨率
+    camera_size = (320, 240)
+    sets = [("600x400", frames), ("%dx%d" % camera_size, [cv2.resize(f, camera_size) for f in frames])]
+
+    mapper = image.PerspectiveMapper()
+    for name, group in sets:
+        before = after = 0.0
+        max_diff = changed = binary_changed = 0
+        for frame in group:
+            expected = image.inverse_perspective(frame)
+            got = mapper.warp(frame)
+            max_diff = max(max_diff, int(np.abs(expected.astype(np.int16) - got).max()))
+            changed += int(np.count_nonzero(expected != got))
+            binary_changed += int(np.count_nonzero(
+                image.preprocess_image(expected) != image.preprocess_image(got)))
+            before += time_per_call(image.inverse_perspective, frame, args.repeat)
+            after += time_per_call(mapper.warp, frame, args.repeat)
+        n = len(group)
+        pixels = group[0].size * n
+        print(f"{name}: inverse_perspective {before / n * 1e3:.3f} ms  PerspectiveMapper.warp "
+              f"{after / n * 1e3:.3f} ms  ({before / after:.2f}x)")
+        print(f"    最大像素差 {max_diff}，不同像素 {changed}/{pixels}，二值图不同像素 {binary_changed}")
+
+    # 启动时计算映射表的耗时
+    width, height = camera_size
+    start = time.perf_counter()
+    image.PerspectiveMapper().get_maps(width, height)
+    build_time = time.perf_counter() - start
+    print(f"{width}x{height} 映射表: 计算 {build_time * 1e3:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""
+LCL2车道中心计算的基准测试：
+对比原LaneCalculator与FastLaneCalculator在results/warped_*.jpg上的结果和耗时
+
+用法: python bench_lcl2.py [--repeat 200] [--budget-ms 33.3]
+"""
+import argparse
+import glob
+import time
+
+import cv2
+
+import image
+import LCL2
+
+
+def load_binaries(pattern="results/warped_*.jpg"):
+    """读取样例帧并做与test.py相同的处理，返回(名称, 二值图)列表"""
+    binaries = []
+    for path in sorted(glob.glob(pattern)):
+        frame = cv2.imread(path)
+        binary = image.preprocess_image(image.inverse_perspective(frame))
+        binaries.append((path, binary))
+    return binaries
+
+
+def make_cases(binaries):
+    """整幅二值图，以及每隔96行切出的ROI条带"""
+    cases = []
+    for path, binary in binaries:
+        cases.append((f"{path}[full]", binary))
+        for top in range(0, binary.shape[0] - 95, 96):
+            cases.append((f"{path}[{top}:{top + 96}]", binary[top:top + 96, 0:320]))
+    return cases
+
+
+def result_tuple(result):
+    return (result.center_x, result.center_y, result.left_bound, result.right_bound, result.detected)
+
+
+def time_per_call(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LCL2 benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="快速版本每帧重复次数")
+    parser.add_argument("--slow-repeat", type=int, default=1, help="原版本每帧重复次数")
+    parser.add_argument("--budget-ms", type=float, default=1000 / 30, help="每帧时间预算(ms)，默认30fps")
+    parser.add_argument("--pi-factor", type=float, default=8.0, help="树莓派相对本机的估计减速倍数")
+    args = parser.parse_args()
+
+    cases = make_cases(load_binaries())
+    if not cases:
+        print("results/ 下没有样例帧")
+        return 1
+
+    mismatches = 0
+    diff_mismatches = 0
+    slow_total = fast_total = diff_total = 0.0
+    worst_fast = 0.0
+    for name, binary in cases:
+        height, width = binary.shape
+        slow = LCL2.LaneCalculator(width, height)
+        fast = LCL2.FastLaneCalculator(width, height)
+        fast_diff = LCL2.FastLaneCalculator(width, height, binary_edges=True)
+
+        expected = result_tuple(slow.calculate_lane_center(binary))
+        got = result_tuple(fast.calculate_lane_center(binary))
+        got_diff = result_tuple(fast_diff.calculate_lane_center(binary))
+        if got != expected:
+            mismatches += 1
+            print(f"MISMATCH {name}: {expected} != {got}")
+        if got_diff != expected:
+            diff_mismatches += 1
+
+        t_slow = time_per_call(slow.calculate_lane_center, binary, args.slow_repeat)
+        t_fast = time_per_call(fast.calculate_lane_center, binary, args.repeat)
+        t_diff = time_per_call(fast_diff.calculate_lane_center, binary, args.repeat)
+        slow_total += t_slow
+        fast_total += t_fast
+        diff_total += t_diff
+        worst_fast = max(worst_fast, t_fast, t_diff)
+        print(f"{name:40s} slow {t_slow * 1e3:9.2f} ms  fast {t_fast * 1e3:7.3f} ms  "
+              f"diff {t_diff * 1e3:7.3f} ms  {got}")
+
+    n = len(cases)
+    print()
+    print(f"帧数: {n}  结果不一致(Canny): {mismatches}  差分边缘与Canny结果不同: {diff_mismatches}")
+    print(f"平均耗时 slow {slow_total / n * 1e3:.2f} ms  fast {fast_total / n * 1e3:.3f} ms  "
+          f"diff {diff_total / n * 1e3:.3f} ms  加速 {slow_total / fast_total:.0f}x")
+    estimate = worst_fast * args.pi_factor * 1e3
+    print(f"最慢一帧 {worst_fast * 1e3:.3f} ms，按{args.pi_factor:g}倍估计树莓派 {estimate:.2f} ms，"
+          f"预算 {args.budget_ms:.1f} ms: {'OK' if estimate < args.budget_ms else 'OVER'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
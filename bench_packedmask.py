@@ -0,0 +1,87 @@
+"""
+PackedMask与未压缩二值图的对比
+
+用results/*.jpg(缩放到320x240)经image.preprocess_image得到二值图，比较:
+    内存   每帧二值图/ROI的字节数
+    磁盘   原JPEG与save_masks(.npz)每帧的字节数
+    速度   压缩耗时、列计数(popcount vs example.find_lane_center的np.sum/255)、整个中线搜索的耗时
+并检查每帧的find_lane_center结果与example.find_lane_center相同，不同时返回1。
+
+用法: python bench_packedmask.py [--repeat 2000]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import Camera
+import example
+import image
+from packedmask import PackedMask, load_masks, save_masks
+
+
+def per_call_us(func, items, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(items[i % len(items)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="packed vs unpacked binary masks")
+    parser.add_argument('--pattern', default='results/*.jpg')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.pattern))
+    frames = [cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height)) for path in paths]
+    binaries = [image.preprocess_image(frame) for frame in frames]
+    rois = [image.get_roi(binary) for binary in binaries]
+    packed_rois = [PackedMask.from_binary(roi) for roi in rois]
+
+    # 结果必须与未压缩版本一致，解压后与原图相同
+    mismatches = 0
+    for roi, mask in zip(rois, packed_rois):
+        expected = example.find_lane_center(roi)
+        expected = None if expected is None else tuple(int(v) for v in expected)
+        mismatches += mask.find_lane_center() != expected
+        mismatches += not np.array_equal(mask.unpack(), roi)
+        mismatches += not np.array_equal(mask.column_counts(), np.count_nonzero(roi, axis=0))
+        mismatches += not np.array_equal(PackedMask.from_binary(roi, full_scale=True).packed, mask.packed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'masks.npz')
+        save_masks(path, [PackedMask.from_binary(binary) for binary in binaries])
+        disk = os.path.getsize(path)
+        mismatches += not all(np.array_equal(mask.unpack(), binary)
+                              for mask, binary in zip(load_masks(path), binaries))
+    jpeg = sum(os.path.getsize(path) for path in paths)
+
+    n = len(frames)
+    print(f"{n}帧  二值图 {binaries[0].shape}  ROI {rois[0].shape}")
+    print("内存(每帧):")
+    print(f"  二值图  uint8 {binaries[0].nbytes:7d} B   packed {PackedMask.from_binary(binaries[0]).nbytes:6d} B")
+    print(f"  ROI     uint8 {rois[0].nbytes:7d} B   packed {packed_rois[0].nbytes:6d} B")
+    print(f"磁盘(每帧): JPEG {jpeg / n:8.0f} B   packed .npz {disk / n:8.0f} B")
+
+    roi_copies = [np.ascontiguousarray(roi) for roi in rois]
+    print("耗时(每帧, us):")
+    print(f"  压缩ROI  packbits  {per_call_us(PackedMask.from_binary, roi_copies, args.repeat):8.2f}"
+          f"   按位与   {per_call_us(lambda roi: PackedMask.from_binary(roi, True), roi_copies, args.repeat):8.2f}")
+    print(f"  列计数  np.sum/255 {per_call_us(lambda roi: np.sum(roi, axis=0) / 255, roi_copies, args.repeat):8.2f}"
+          f"   popcount {per_call_us(PackedMask.column_counts, packed_rois, args.repeat):8.2f}")
+    print(f"  中线    unpacked   {per_call_us(example.find_lane_center, roi_copies, args.repeat):8.2f}"
+          f"   packed   {per_call_us(PackedMask.find_lane_center, packed_rois, args.repeat):8.2f}")
+    print(f"  有无像素的边界列   {per_call_us(lambda m: m.bounds(), packed_rois, args.repeat):8.2f} (packed, OR归约)")
+    if mismatches:
+        print(f"与未压缩版本不一致 {mismatches} 处")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+"""
+按时间戳计算的PID(PID.TimedPID)与PositionalPID的对比
+
+    等价       30Hz、没有延迟时每步的PidOutput与PositionalPID相同(第一帧不算微分)
+    抗饱和     误差持续很大、输出限幅在±30时，误差反向后输出反向用的周期数:
+               PositionalPID(原样，积分累加到2000)、PositionalPID的积分项也限制在±30以内、TimedPID(饱和时停止积分)
+    闭环       simulator.simulate在不同控制频率和延迟下跑一圈，同一组参数，比较状态、圈速和横向误差；
+               TimedPID按--max-latencies的每个值各跑一次(0表示不预测，PID_Control/PID_Ctrl里用的是0)
+
+有问题时返回1。
+
+用法: python bench_pid.py [--rates 15 30 60] [--latencies 0 0.1] [--max-latencies 0 0.05] [--controller PID_Control]
+"""
+import argparse
+import importlib
+import random
+
+import PID
+import simulator
+
+
+def check_equivalence(steps=500, gains=(0.6, 0.01, 1), rate=30):
+    positional = PID.PositionalPID(*gains)
+    timed = PID.TimedPID(*gains, SampleTime=1 / rate, MaxLatency=0)
+    rng = random.Random(0)
+    worst = 0.0
+    for i in range(steps):
+        error = rng.uniform(-100, 100)
+        if i == 0:
+            positional.LastError = error
+        positional.SystemOutput = -error
+        positional.SetStepSignal(0)
+        timed.Update(error, i / rate, i / rate)
+        worst = max(worst, abs(positional.PidOutput - timed.PidOutput))
+    return worst
+
+
+def recovery_steps(controller, update, saturate=300):
+    """误差保持100若干周期后变成-20，返回输出变成负数用的周期数"""
+    for i in range(saturate):
+        update(controller, 100, i)
+    for i in range(saturate, saturate + 1000):
+        if update(controller, -20, i) < 0:
+            return i - saturate
+    return None
+
+
+def positional_update(controller, error, i, limit=30):
+    controller.SystemOutput = -error
+    controller.SetStepSignal(0)
+    return max(min(controller.PidOutput, limit), -limit)
+
+
+def clamped_update(controller, error, i, limit=30):
+    """积分项Ki*PIDErrADD也限制在输出限幅以内，与TimedPID比较抗饱和时用同样的限幅"""
+    output = positional_update(controller, error, i, limit)
+    bound = limit / controller.Ki
+    controller.PIDErrADD = max(min(controller.PIDErrADD, bound), -bound)
+    return output
+
+
+def timed_update(controller, error, i, rate=30):
+    return controller.Update(error, i / rate, i / rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="timestamp-aware PID vs positional PID")
+    parser.add_argument('--controller', choices=('PID_Control', 'PID_Ctrl'), default='PID_Control')
+    parser.add_argument('--rates', type=float, nargs='+', default=[15, 30, 60])
+    parser.add_argument('--latencies', type=float, nargs='+', default=[0, 0.1])
+    parser.add_argument('--max-latencies', type=float, nargs='+', default=[0, 0.05],
+                        help='TimedPID向前预测的最长时间(s)')
+    parser.add_argument('--detector', default='lcl2')
+    args = parser.parse_args()
+    problems = []
+
+    worst = check_equivalence()
+    print(f"30Hz无延迟 PidOutput最大差 {worst:.2e}")
+    if worst > 1e-9:
+        problems.append("与PositionalPID不等价")
+
+    positional = recovery_steps(PID.PositionalPID(0.6, 0.05, 0), positional_update)
+    clamped = recovery_steps(PID.PositionalPID(0.6, 0.05, 0), clamped_update)
+    timed = recovery_steps(PID.TimedPID(0.6, 0.05, 0, OutputLimit=30), timed_update)
+    print(f"输出限幅±30，饱和300周期后误差反向，输出反向用的周期数: PositionalPID {positional}  "
+          f"积分项限幅的PositionalPID {clamped}  TimedPID {timed}")
+    if timed is None or timed > 1 or (clamped is not None and timed > clamped):
+        problems.append("抗积分饱和无效")
+
+    # simulator.make_steer按模块里timed的设置重新创建TimedPID
+    module = importlib.import_module(args.controller)
+    shipped = module.timed.MaxLatency
+    variants = [('Positional', False, shipped)] + [(f'Timed {m:g}', True, m) for m in args.max_latencies]
+    print(f"闭环 {args.controller}，参数不变，Timed后面是MaxLatency(s):")
+    print(f"{'延迟s':>6s} {'频率Hz':>6s} {'PID':>12s} {'状态':>10s} {'圈速s':>8s} {'误差rms cm':>10s}")
+    try:
+        for latency in args.latencies:
+            for rate in args.rates:
+                for name, timed, max_latency in variants:
+                    module.timed.MaxLatency = max_latency
+                    result = simulator.simulate(args.controller, args.detector, rate=rate, timed=timed,
+                                                latency=latency)
+                    lap = result['lap_times'][0] if result['lap_times'] else float('nan')
+                    print(f"{latency:6.3f} {rate:6.0f} {name:>12s} "
+                          f"{result['status']:>10s} {lap:8.2f} {result['error_rms_cm']:10.2f}")
+                    if timed and latency == 0 and max_latency == shipped and result['status'] != 'ok':
+                        problems.append(f"{rate}Hz TimedPID没跑完一圈")
+    finally:
+        module.timed.MaxLatency = shipped
+
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""
+单进程循环与多进程流水线(pipeline.ProcessPipeline)的吞吐量对比
+
+用results/*.jpg回放代替摄像头，小车用FakeSMBus，不需要硬件。
+两种方式运行相同的阶段: ImageFolderSource -> RoiPreprocessor -> LCL2.FastLaneCalculator -> 转向，
+回放源不限速(--fps 0)时测的是最大吞吐量；多进程的收益取决于CPU核数，单核机器上只会更慢。
+
+用法: python bench_pipeline.py [--seconds 5] [--fps 0] [--detector lcl2|lcl2_diff|ctype]
+"""
+import argparse
+import functools
+import os
+import time
+
+import numpy as np
+
+import pipeline
+from Car_Control import Car, FakeSMBus
+
+
+def make_steer(car):
+    def steer(center_x):
+        turn = int(np.clip((160 - center_x) * 0.5, -30, 30))
+        car.Dir_Car(60 - turn, 60 + turn)
+    return steer
+
+
+def run_single(source_factory, detector_factory, seconds):
+    """单进程: 每次循环依次执行所有阶段"""
+    source = source_factory()
+    preprocessor = pipeline.default_preprocessor()
+    detect = detector_factory()
+    car = Car(device=FakeSMBus())
+    steer = make_steer(car)
+    latencies = []
+    frames = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        frame = source.capture_array()
+        timestamp = time.monotonic()
+        center_x = detect(preprocessor.process(frame))
+        if center_x is None:
+            car.Car_Stop()
+        else:
+            steer(center_x)
+        latencies.append(time.monotonic() - timestamp)
+        frames += 1
+    return frames / seconds, latencies, {}
+
+
+def run_multi(source_factory, detector_factory, seconds):
+    """多进程: 主进程只取检测结果并转向"""
+    car = Car(device=FakeSMBus())
+    steer = make_steer(car)
+    pipe = pipeline.ProcessPipeline(source_factory, detector_factory).start()
+    latencies = []
+    # 等子进程启动并出第一个结果后再计时
+    pipe.read(timeout=10)
+    start_received = pipe.received
+    start = time.monotonic()
+    end = start + seconds
+    try:
+        while time.monotonic() < end:
+            center_x, timestamp, seq = pipe.read(timeout=0.5)
+            if center_x is None:
+                continue
+            if center_x < 0:
+                car.Car_Stop()
+            else:
+                steer(center_x)
+            latencies.append(time.monotonic() - timestamp)
+        elapsed = time.monotonic() - start
+    finally:
+        pipe.stop()
+    return (pipe.received - start_received) / elapsed, latencies, pipe.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="single vs multi process pipeline throughput")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=0, help="回放帧率，0表示不限速")
+    parser.add_argument("--detector", choices=("lcl2", "lcl2_diff", "ctype"), default="lcl2")
+    args = parser.parse_args()
+
+    source_factory = functools.partial(pipeline.replay_source, fps=args.fps)
+    detector_factory = {
+        "lcl2": pipeline.lcl2_detector,
+        "lcl2_diff": functools.partial(pipeline.lcl2_detector, binary_edges=True),
+        "ctype": pipeline.ctype_detector,
+    }[args.detector]
+
+    print(f"CPU核数 {os.cpu_count()}  回放帧率 {args.fps or '不限速'}  检测 {args.detector}")
+    results = {}
+    for name, run in (("single", run_single), ("multi", run_multi)):
+        fps, latencies, stats = run(source_factory, detector_factory, args.seconds)
+        ms = np.array(latencies) * 1e3 if latencies else np.zeros(1)
+        results[name] = fps
+        print(f"{name:8s} {fps:8.1f} fps  采集->转向 p50 {np.percentile(ms, 50):6.2f} ms  "
+              f"p99 {np.percentile(ms, 99):6.2f} ms  {stats}")
+    print(f"多进程/单进程吞吐量 {results['multi'] / results['single']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""
+预处理基准测试：
+对比final.py原来的 逆透视(整幅RGB) -> 灰度/模糊/阈值(整幅) -> 裁剪ROI
+与融合的image.RoiPreprocessor(先灰度、只算ROI需要的像素)
+
+用法: python bench_preprocess.py [--repeat 300]
+"""
+import argparse
+import glob
+import time
+
+import cv2
+import numpy as np
+
+import image
+
+
+def time_per_call(func, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="preprocess benchmark")
+    parser.add_argument("--repeat", type=int, default=300, help="每帧重复次数")
+    args = parser.parse_args()
+
+    frames = [cv2.imread(path) for path in sorted(glob.glob("results/warped_*.jpg"))]
+    if not frames:
+        print("results/ 下没有样例帧")
+        return 1
+    sets = [("600x400", frames), ("320x240", [cv2.resize(f, (320, 240)) for f in frames])]
+
+    mapper = image.PerspectiveMapper()
+    fused = image.RoiPreprocessor(mapper)
+    exact = image.RoiPreprocessor(mapper, gray_first=False)
+
+    def old_chain(frame):
+        return image.get_roi(image.preprocess_image(image.inverse_perspective(frame)))
+
+    def mapper_chain(frame):
+        return image.get_roi(image.preprocess_image(mapper.warp(frame)))
+
+    failed = False
+    for name, group in sets:
+        times = {"inverse_perspective chain": 0.0, "mapper chain": 0.0,
+                 "fused gray_first": 0.0, "fused exact": 0.0}
+        flipped = exact_flipped = 0
+        for frame in group:
+            reference = mapper_chain(frame)
+            flipped += int(np.count_nonzero(fused.process(frame) != reference))
+            exact_flipped += int(np.count_nonzero(exact.process(frame) != reference))
+            times["inverse_perspective chain"] += time_per_call(old_chain, frame, args.repeat)
+            times["mapper chain"] += time_per_call(mapper_chain, frame, args.repeat)
+            times["fused gray_first"] += time_per_call(fused.process, frame, args.repeat)
+            times["fused exact"] += time_per_call(exact.process, frame, args.repeat)
+
+        n = len(group)
+        base = times["inverse_perspective chain"]
+        print(f"{name}:")
+        for stage, total in times.items():
+            print(f"    {stage:26s} {total / n * 1e3:7.3f} ms  ({base / total:.1f}x)")
+        pixels = reference.size * n
+        print(f"    与mapper chain不同的ROI像素: gray_first {flipped}/{pixels} "
+              f"({flipped / pixels:.4%})，exact {exact_flipped}")
+        failed |= exact_flipped != 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
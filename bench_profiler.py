@@ -0,0 +1,130 @@
+"""
+采样分析器(profiler.SamplingProfiler)的开销和结果
+
+用results/*.jpg做一个与控制循环相似的负载(逆透视、预处理、中线检测)，比较每次循环的耗时:
+    没有分析器 / 注册了信号但没在采样 / 正在采样(默认5ms间隔)
+以及每次采样本身的耗时(采样线程占用GIL的时间)。
+循环中用os.kill给自己发SIGUSR1/SIGUSR2开关采样，检查采样期间循环没有停顿(最长间隔)，
+结果文件里有image.inverse_perspective等热点函数。有问题时返回1。
+
+用法: python bench_profiler.py [--seconds 2] [--interval 0.005] [--rounds 5]
+"""
+import argparse
+import glob
+import os
+import signal
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import Camera
+import example
+import image
+from profiler import SamplingProfiler
+
+
+def workload(frames):
+    index = 0
+
+    def step():
+        nonlocal index
+        frame = frames[index % len(frames)]
+        index += 1
+        roi = image.get_roi(image.preprocess_image(image.inverse_perspective(frame)))
+        return example.find_lane_center(roi)
+    return step
+
+
+def run_for(step, seconds):
+    """返回每次循环耗时(秒)"""
+    times = []
+    end = time.perf_counter() + seconds
+    while True:
+        start = time.perf_counter()
+        if start >= end:
+            break
+        step()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def describe(name, times):
+    us = times * 1e6
+    print(f"  {name:16s} {len(us):6d}次  p50 {np.median(us):8.1f} us  p99 {np.percentile(us, 99):8.1f} us"
+          f"  max {us.max():8.1f} us")
+    return np.median(us)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sampling profiler overhead")
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--interval', type=float, default=0.005)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    problems = []
+
+    frames = [cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height))
+              for path in sorted(glob.glob('results/*.jpg'))]
+    step = workload(frames)
+    run_for(step, 0.2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 三种状态轮流运行若干轮，减少机器负载变化的影响
+        profiler = SamplingProfiler(interval=args.interval, output_dir=tmp)
+        baseline, idle, sampling = [], [], []
+        samples = 0
+        for _ in range(args.rounds):
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+            signal.signal(signal.SIGUSR2, signal.SIG_DFL)
+            baseline.append(run_for(step, args.seconds / args.rounds))
+            profiler.install()
+            idle.append(run_for(step, args.seconds / args.rounds))
+            os.kill(os.getpid(), signal.SIGUSR1)
+            sampling.append(run_for(step, args.seconds / args.rounds))
+            os.kill(os.getpid(), signal.SIGUSR2)
+            # 信号处理函数不等结果写完，循环继续；这里等采样线程退出再检查文件
+            profiler._thread.join()
+            samples += profiler.samples
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR2, signal.SIG_DFL)
+
+        print("每次循环耗时:")
+        base = describe("没有分析器", np.concatenate(baseline))
+        idle = describe("注册信号未采样", np.concatenate(idle))
+        sampling = np.concatenate(sampling)
+        active = describe("正在采样", sampling)
+        print(f"采样 {samples}次 (期望约{args.seconds / args.interval:.0f})  "
+              f"开销 未采样 {idle / base - 1:+.1%}  采样中 {active / base - 1:+.1%} (循环耗时的差别主要是机器负载的波动)")
+        # 直接开销: 采样线程每次取栈占用GIL的时间
+        start = time.perf_counter()
+        for _ in range(1000):
+            profiler.sample()
+        sample_us = (time.perf_counter() - start) / 1000 * 1e6
+        print(f"每次采样 {sample_us:.1f} us，占CPU {sample_us * 1e-6 / args.interval:.2%}")
+
+        if profiler.last_paths is None:
+            problems.append("没有写出结果")
+        else:
+            folded, summary = profiler.last_paths
+            with open(summary) as f:
+                text = f.read()
+            print(f"最后一轮 {os.path.basename(summary)}:")
+            print(text)
+            with open(folded) as f:
+                lines = f.read().splitlines()
+            if 'image.inverse_perspective' not in text:
+                problems.append("热点函数里没有image.inverse_perspective")
+            if not all(line.rpartition(' ')[2].isdigit() for line in lines):
+                problems.append("折叠栈格式不正确")
+        if sampling.max() > max(0.05, 20 * np.median(sampling)):
+            problems.append(f"采样期间循环停顿 {sampling.max() * 1e3:.1f} ms")
+
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
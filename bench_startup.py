@@ -0,0 +1,145 @@
+"""
+启动时间基准测试(不需要硬件)
+
+1. 导入开销: 在新的解释器里分别导入各模块，记录耗时，检查是否加载了cv2/smbus/picamera2、是否创建了Car
+2. 硬件初始化: 用替代设备(打开有延迟的FakeSMBus小车、启动和出第一帧都有延迟的摄像头)对比
+   原来的顺序初始化(导入时创建一个Car -> 启动摄像头 -> 固定等待2秒 -> 主程序再创建一个Car)
+   和hardware.HardwareContext的并行初始化
+3. 从启动解释器到小车就绪的估计时间 = 解释器启动 + 导入final + 并行初始化，超过--max-ready-ms时返回1
+
+用法: python bench_startup.py [--camera-open-ms 300] [--first-frame-ms 100] [--i2c-open-ms 50] [--max-ready-ms 1000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from Car_Control import Car, FakeSMBus
+from hardware import HardwareContext
+
+# 导入后不应加载的模块(硬件相关和cv2)
+HEAVY = ('cv2', 'smbus', 'picamera2')
+CHEAP_MODULES = ('Car_Control', 'PID', 'PID_Control', 'PID_Ctrl', 'Camera', 'hardware', 'runtime')
+MAIN_MODULES = ('final', 'example')
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as m
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1e3, 'loaded': [n for n in {heavy!r} if n in sys.modules],
+                  'car': getattr(m, 'car', None) is not None}}))
+"""
+
+
+def probe_import(module):
+    """在新的解释器里导入module"""
+    out = subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module=module, heavy=HEAVY)],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def interpreter_startup(repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class StandInCamera:
+    """替代Picamera2: 打开耗时open_delay，start后first_frame_delay出第一帧，之后按fps出帧"""
+
+    def __init__(self, open_delay=0.3, first_frame_delay=0.1, fps=30, size=(320, 240)):
+        time.sleep(open_delay)
+        self.first_frame_delay = first_frame_delay
+        self.period = 1.0 / fps
+        self.frame = np.zeros((size[1], size[0], 3), np.uint8)
+        self.next_time = time.monotonic() + first_frame_delay
+
+    def capture_array(self):
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time + self.period, time.monotonic())
+        return self.frame.copy()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_factories(args):
+    def car_factory():
+        time.sleep(args.i2c_open_ms / 1e3)
+        return Car(device=FakeSMBus(delay=args.bus_ms / 1e3))
+
+    def camera_factory():
+        return StandInCamera(args.camera_open_ms / 1e3, args.first_frame_ms / 1e3)
+
+    return car_factory, camera_factory
+
+
+def sequential_startup(car_factory, camera_factory, warmup):
+    """原来的顺序: 导入PID_Control时创建Car，启动摄像头后固定等待，主程序再创建Car"""
+    start = time.monotonic()
+    car_factory()
+    camera = camera_factory()
+    time.sleep(warmup)
+    camera.capture_array()
+    car_factory()
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="startup time with stand-in devices")
+    parser.add_argument('--camera-open-ms', type=float, default=300, help='摄像头打开并启动的耗时')
+    parser.add_argument('--first-frame-ms', type=float, default=100, help='启动后到第一帧的时间')
+    parser.add_argument('--i2c-open-ms', type=float, default=50, help='打开I2C总线的耗时')
+    parser.add_argument('--bus-ms', type=float, default=0.6, help='每次I2C传输耗时')
+    parser.add_argument('--legacy-warmup', type=float, default=2.0, help='原来启动摄像头后固定等待的秒数')
+    parser.add_argument('--max-ready-ms', type=float, default=1000)
+    args = parser.parse_args()
+
+    print("导入(新解释器):")
+    side_effects = False
+    for module in CHEAP_MODULES + MAIN_MODULES:
+        result = probe_import(module)
+        note = f"加载了 {', '.join(result['loaded'])}" if result['loaded'] else ''
+        if result['car']:
+            note += ' 导入时创建了Car'
+        if module in CHEAP_MODULES and (result['loaded'] or result['car']):
+            side_effects = True
+        print(f"  {module:12s} {result['ms']:7.1f} ms  {note}")
+        if module == 'final':
+            import_ms = result['ms']
+    startup_ms = interpreter_startup() * 1e3
+
+    car_factory, camera_factory = make_factories(args)
+    sequential_ms = sequential_startup(car_factory, camera_factory, args.legacy_warmup) * 1e3
+    hw = HardwareContext(car_factory, camera_factory).start().wait()
+    hw.close()
+    timings = {k: v * 1e3 for k, v in hw.timings.items()}
+
+    print("硬件初始化(替代设备):")
+    print(f"  顺序(两个Car，固定等待{args.legacy_warmup:g}秒) {sequential_ms:7.1f} ms")
+    print(f"  HardwareContext            {timings['ready']:7.1f} ms  "
+          f"(小车 {timings['car']:.1f}  摄像头打开 {timings['camera_open']:.1f}  "
+          f"第一帧 {timings['first_frame']:.1f}  预热完成 {timings['camera']:.1f})")
+    ready_ms = startup_ms + import_ms + timings['ready']
+    print(f"启动到就绪: 解释器 {startup_ms:.1f} + 导入final {import_ms:.1f} + 初始化 {timings['ready']:.1f} "
+          f"= {ready_ms:.1f} ms (上限 {args.max_ready_ms:g} ms)")
+    if side_effects:
+        print("有模块导入时加载了硬件库/cv2或创建了Car")
+        return 1
+    return 0 if ready_ms <= args.max_ready_ms else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+"""
+遥测记录(telemetry.TelemetryRing)与控制循环里print的对比
+
+    单条耗时   TelemetryRing.log 与 print一行同样内容(输出到/dev/null和StringIO，终端只会更慢)
+    写盘       按控制频率log时后台线程能否跟上(dropped为0)，缓冲区很小时丢弃计数是否正确
+    闭环       LaneFollowerRuntime接FakeSMBus(定期I2C失败)跑若干周期，检查记录条数、状态和错误码
+    读回       read_telemetry/to_csv的结果与写入的记录相同
+
+有问题时返回1。
+
+用法: python bench_telemetry.py [--repeat 100000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import telemetry as tlm
+from Car_Control import Car, FakeSMBus
+from runtime import LaneFollowerRuntime
+
+
+def per_call_us(func, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def print_line(i):
+    print(f"seq {i} | 偏移: {i % 160:4d} | PID: {0.6 * i:8.2f} | 左轮: {30:3d} | 右轮: {20:3d} | ok")
+
+
+def check_flush(path, count, rate, capacity):
+    """按rate(Hz)写count条记录，返回(stats, 读回的记录)"""
+    ring = tlm.TelemetryRing(path, capacity=capacity, flush_interval=0.05).start()
+    for i in range(count):
+        ring.log(time.monotonic(), i, float(i), 0.5 * i, i % 100, -(i % 100), tlm.STATUS_OK, 0)
+        if rate:
+            time.sleep(1.0 / rate)
+    ring.stop()
+    return ring.stats(), tlm.read_telemetry(path)
+
+
+def check_runtime(path, cycles):
+    """每4次I2C传输失败一次，每5帧丢一帧，每3帧检测不到车道"""
+    car = Car(device=FakeSMBus(fail_every=4))
+    ring = tlm.TelemetryRing(path).start()
+    frame = np.zeros((1, 1), dtype=np.uint8)
+    state = {'seq': 0}
+
+    def read_frame():
+        state['seq'] += 1
+        if state['seq'] % 5 == 0:
+            return None, None, None
+        return frame, time.monotonic(), state['seq']
+
+    def detect(roi):
+        return None if state['seq'] % 3 == 0 else 100 + state['seq']
+
+    def steer(center_x):
+        car.Car_Run(30, 30)
+        return center_x - 160, 0.6 * (center_x - 160)
+
+    runtime = LaneFollowerRuntime(read_frame, lambda f: f, detect, steer, car, rate=200, on_miss='stop',
+                                  telemetry=ring)
+    runtime.run(max_cycles=cycles)
+    ring.stop()
+    return car, tlm.read_telemetry(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="telemetry ring vs print")
+    parser.add_argument('--repeat', type=int, default=100000)
+    args = parser.parse_args()
+    problems = []
+
+    ring = tlm.TelemetryRing(capacity=4096)
+    log_us = per_call_us(lambda i: ring.log(0.0, i, 1.0, 2.0, 30, 20, tlm.STATUS_OK, 0), args.repeat)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        devnull_us = per_call_us(print_line, args.repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stringio_us = per_call_us(print_line, args.repeat)
+    if not np.array_equal(ring.records()['seq'], np.arange(args.repeat - 4096, args.repeat)):
+        problems.append("内存缓冲区没有保留最近的记录")
+    print("单条耗时(us):")
+    print(f"  TelemetryRing.log   {log_us:8.2f}")
+    print(f"  print -> /dev/null  {devnull_us:8.2f}")
+    print(f"  print -> StringIO   {stringio_us:8.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'run.tlm')
+
+        stats, records = check_flush(path, 300, 100, 64)
+        print(f"写盘 100Hz x 300条 (capacity 64): {stats}")
+        if stats['dropped'] or len(records) != 300 or not np.array_equal(records['seq'], np.arange(300)):
+            problems.append("写盘跟不上或记录不完整")
+
+        stats, records = check_flush(path, 1000, 0, 64)
+        print(f"不间断写入1000条 (capacity 64):   {stats}")
+        if stats['flushed'] + stats['dropped'] != 1000 or len(records) != stats['flushed']:
+            problems.append("丢弃计数不正确")
+        if np.any(np.diff(records['seq']) <= 0):
+            problems.append("记录顺序不正确")
+
+        car, records = check_runtime(path, 60)
+        counts = {name: int(np.sum(records['status'] == status)) for status, name in tlm.STATUS_NAMES.items()}
+        i2c = int(np.sum(records['error'] & tlm.ERROR_I2C != 0))
+        print(f"闭环60周期: {len(records)}条 {counts} I2C错误周期 {i2c} (Car.error_count {car.error_count()})")
+        ok = records['status'] == tlm.STATUS_OK
+        # 周期超时取决于机器负载，只检查总数
+        if len(records) != 60 or counts['no_frame'] != 12 or counts['ok'] + counts['lost'] + counts['late'] != 48:
+            problems.append("闭环记录条数或状态不正确")
+        if car.error_count() and not i2c:
+            problems.append("I2C错误没有记录")
+        if not np.allclose(records['pid_output'][ok], 0.6 * records['offset'][ok]):
+            problems.append("偏移量和PID输出不正确")
+
+        csv_path = os.path.join(tmp, 'run.csv')
+        rows = tlm.to_csv(path, csv_path)
+        with open(csv_path) as f:
+            lines = f.read().splitlines()
+        if rows != len(records) or len(lines) != rows + 1 or lines[0].split(',') != list(tlm.TELEMETRY_DTYPE.names):
+            problems.append("CSV与记录不一致")
+        print(f"CSV: {rows}行  {os.path.getsize(path)} B二进制 / {os.path.getsize(csv_path)} B CSV")
+
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
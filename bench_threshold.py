@@ -0,0 +1,103 @@
+"""
+固定阈值、每帧Otsu和image.AdaptiveThreshold(分摊的Otsu)的对比
+
+用results/*.jpg缩放到320x240，按帧序号改变亮度(缓慢变化，中途突然变暗)模拟光照变化，
+统计每帧耗时、阈值计算本身的耗时，以及与每帧全图Otsu相比的阈值差和像素差异比例。
+
+用法: python bench_threshold.py [--frames 600] [--interval 30]
+"""
+import argparse
+import glob
+import time
+
+import cv2
+import numpy as np
+
+import Camera
+import image
+
+
+def make_frames(count, pattern="results/*.jpg"):
+    base = [cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height))
+            for path in sorted(glob.glob(pattern))]
+    frames = []
+    for i in range(count):
+        gain = 1.0 + 0.3 * np.sin(i / 60)
+        if count // 2 <= i < count // 2 + count // 6:
+            gain *= 0.5
+        # 每张图保持20帧，模拟连续的画面
+        frames.append(cv2.convertScaleAbs(base[i // 20 % len(base)], alpha=gain))
+    return frames
+
+
+def otsu_binary(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    threshold, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binary, threshold
+
+
+def summarize(ms):
+    ms = np.array(ms)
+    return f"mean {ms.mean():7.3f}  p99 {np.percentile(ms, 99):7.3f}  max {ms.max():7.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fixed vs Otsu vs amortized adaptive threshold")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--interval", type=int, default=30, help="AdaptiveThreshold每隔多少帧重新估计")
+    parser.add_argument("--fixed", type=int, default=90)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames)
+    reference = [otsu_binary(frame) for frame in frames]
+
+    # 每帧总耗时
+    timings = {"fixed": [], "otsu": [], "adaptive": []}
+    adaptive = image.AdaptiveThreshold(interval=args.interval)
+    results = {"fixed": [], "adaptive": []}
+    for frame in frames:
+        t = time.perf_counter()
+        results["fixed"].append(image.preprocess_image(frame, args.fixed))
+        timings["fixed"].append((time.perf_counter() - t) * 1e3)
+
+        t = time.perf_counter()
+        otsu_binary(frame)
+        timings["otsu"].append((time.perf_counter() - t) * 1e3)
+
+        t = time.perf_counter()
+        results["adaptive"].append(image.preprocess_image(frame, adaptive))
+        timings["adaptive"].append((time.perf_counter() - t) * 1e3)
+
+    # 只计阈值计算本身(输入为已模糊的灰度图)
+    blurred = [cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), (5, 5), 0) for frame in frames]
+    estimator = image.AdaptiveThreshold(interval=args.interval)
+    update_ms = []
+    thresholds = []
+    otsu_ms = []
+    for gray in blurred:
+        t = time.perf_counter()
+        thresholds.append(estimator.update(gray))
+        update_ms.append((time.perf_counter() - t) * 1e3)
+        t = time.perf_counter()
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        otsu_ms.append((time.perf_counter() - t) * 1e3)
+
+    otsu_thresholds = np.array([t for _, t in reference])
+    print(f"帧数 {len(frames)}  重新估计 {estimator.estimates} 次")
+    print("每帧预处理(灰度+模糊+阈值):")
+    for name, ms in timings.items():
+        print(f"  {name:9s} {summarize(ms)}")
+    print("阈值计算本身:")
+    print(f"  otsu      {summarize(otsu_ms)}  (含二值化)")
+    print(f"  adaptive  {summarize(update_ms)}")
+    print("与每帧Otsu相比:")
+    for name, threshold in (("fixed", np.full(len(frames), args.fixed)), ("adaptive", np.array(thresholds))):
+        diff = np.abs(threshold - otsu_thresholds)
+        pixels = np.mean([np.count_nonzero(b != r) / b.size for b, (r, _) in zip(results[name], reference)])
+        print(f"  {name:9s} 阈值差 平均 {diff.mean():5.1f} 最大 {diff.max():5.0f}  像素不同 {pixels:6.2%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
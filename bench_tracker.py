@@ -0,0 +1,82 @@
+"""
+逐帧全图搜索与tracker.LaneTracker的对比
+
+合成一段车道左右缓慢摆动的ROI序列，部分帧在ROI左右边缘加入杂点(深色污渍)，
+统计两种方法的中线误差、帧间跳变和单帧耗时。
+
+用法: python bench_tracker.py [--frames 600] [--blob-rate 0.2]
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import image
+from example import find_lane_center
+from tracker import LaneTracker
+
+ROI_HEIGHT = image.ROI_BOTTOM - image.ROI_TOP
+ROI_WIDTH = image.ROI_RIGHT - image.ROI_LEFT
+
+
+def make_sequence(frames, blob_rate, seed=0):
+    """返回(roi列表, 真实中线列表)"""
+    rng = np.random.default_rng(seed)
+    rois = []
+    centers = []
+    for i in range(frames):
+        roi = np.zeros((ROI_HEIGHT, ROI_WIDTH), dtype=np.uint8)
+        center = int(160 + 50 * np.sin(i / 40))
+        half_width = 70
+        for x in (center - half_width, center + half_width):
+            cv2.rectangle(roi, (x - 5, 0), (x + 5, ROI_HEIGHT - 1), 255, -1)
+        if rng.random() < blob_rate:
+            # 车道外的污渍
+            x = int(rng.integers(0, 30)) if rng.random() < 0.5 else int(rng.integers(ROI_WIDTH - 30, ROI_WIDTH))
+            y = int(rng.integers(20, ROI_HEIGHT - 20))
+            cv2.circle(roi, (x, y), int(rng.integers(6, 12)), 255, -1)
+        rois.append(roi)
+        centers.append(center)
+    return rois, np.array(centers)
+
+
+def evaluate(func, rois, centers):
+    results = []
+    start = time.perf_counter()
+    for roi in rois:
+        results.append(func(roi))
+    elapsed = time.perf_counter() - start
+    found = np.array([r is not None for r in results])
+    got = np.array([r[2] if r is not None else -1 for r in results], dtype=float)
+    error = np.abs(got[found] - centers[found])
+    jumps = np.abs(np.diff(got[found])) if found.sum() > 1 else np.zeros(1)
+    return {
+        'us_per_frame': elapsed / len(rois) * 1e6,
+        'found': int(found.sum()),
+        'mean_error': float(error.mean()) if error.size else 0.0,
+        'bad_frames': int((error > 20).sum()),
+        'max_jump': float(jumps.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="full scan vs windowed lane tracker")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--blob-rate", type=float, default=0.2, help="有杂点的帧的比例")
+    args = parser.parse_args()
+
+    rois, centers = make_sequence(args.frames, args.blob_rate)
+    tracker = LaneTracker()
+
+    print(f"帧数 {args.frames}  杂点比例 {args.blob_rate}  全图搜索: example.find_lane_center")
+    for label, func in (("full scan", find_lane_center), ("tracker", tracker.update)):
+        s = evaluate(func, rois, centers)
+        print(f"{label:10s} {s['us_per_frame']:7.1f} us/帧  找到 {s['found']:4d}  平均误差 {s['mean_error']:5.1f}  "
+              f"误差>20的帧 {s['bad_frames']:4d}  最大跳变 {s['max_jump']:5.0f}")
+    print(tracker.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
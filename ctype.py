@@ -3,45 +3,128 @@ import os
 import numpy as np
 from typing import Tuple, Optional
 
+# 编译: g++ -O2 -shared -fPIC LaneCenterLocator2.cpp -o LaneCenterLocator2.so $(pkg-config --cflags --libs opencv4)
+LIB_PATH = os.path.join(os.path.dirname(__file__), 'LaneCenterLocator2.so')
+
+
+class LaneResult(ctypes.Structure):
+    """与LaneCenterLocator2.cpp中的LaneResult结构体布局一致"""
+    _fields_ = [
+        ('center_x', ctypes.c_int),
+        ('center_y', ctypes.c_int),
+        ('left_bound', ctypes.c_int),
+        ('right_bound', ctypes.c_int),
+        ('detected', ctypes.c_bool),
+    ]
+
+
+class LaneDetector:
+    """
+
+    持有加载好的C++车道检测库，每帧直接传入uint8图像的指针和行步长，
+    C++端把缓冲区包装成cv::Mat，不做复制，结果写入预先分配的LaneResult
+
+    没有重新编译过的旧库只导出calculate_lane_center(int32图像，结果只有center_x/center_y)，
+    这时退回旧接口: 每帧复制到复用的int32缓冲区，left_bound/right_bound为-1
+
+    """
+
+    def __init__(self, lib_path: str = LIB_PATH):
+        # 只加载一次共享库并设置函数签名
+        self.lib = ctypes.CDLL(lib_path)
+        self.legacy = not hasattr(self.lib, 'calculate_lane_center_u8')
+        if self.legacy:
+            self.lib.calculate_lane_center.argtypes = [
+                ctypes.POINTER(ctypes.c_int),  # image_data
+                ctypes.c_int,                  # width
+                ctypes.c_int,                  # height
+                ctypes.POINTER(ctypes.c_int)   # result
+            ]
+            self.lib.calculate_lane_center.restype = ctypes.c_int
+            self._legacy_image = None
+            self._legacy_result = (ctypes.c_int * 2)(-1, -1)
+        else:
+            self.lib.calculate_lane_center_u8.argtypes = [
+                ctypes.c_void_p,               # image_data
+                ctypes.c_int,                  # width
+                ctypes.c_int,                  # height
+                ctypes.c_int,                  # stride
+                ctypes.POINTER(LaneResult)     # result
+            ]
+            self.lib.calculate_lane_center_u8.restype = ctypes.c_int
+
+        # 结果结构体复用，每次调用覆盖
+        self.result = LaneResult()
+        self._result_ref = ctypes.byref(self.result)
+
+    def detect(self, binary_image: np.ndarray) -> Optional[LaneResult]:
+        """
+        检测车道中心
+        :param binary_image: 二值化ROI (uint8, 0/255)，可以是image.get_roi返回的切片视图
+        :return: 成功时返回self.result(下次调用会被覆盖)，失败返回None
+        """
+        if self.legacy:
+            return self._detect_legacy(binary_image)
+
+        # 行内像素连续、行步长非负时直接传指针，否则才复制一次
+        if (binary_image.dtype != np.uint8 or binary_image.ndim != 2
+                or binary_image.strides[1] != 1 or binary_image.strides[0] < binary_image.shape[1]):
+            binary_image = np.ascontiguousarray(binary_image, dtype=np.uint8)
+
+        height, width = binary_image.shape
+        success = self.lib.calculate_lane_center_u8(
+            binary_image.ctypes.data, width, height, binary_image.strides[0], self._result_ref)
+
+        return self.result if success else None
+
+    def _detect_legacy(self, binary_image: np.ndarray) -> Optional[LaneResult]:
+        """旧接口: 图像转成连续的int32数组(缓冲区按尺寸复用)"""
+        if self._legacy_image is None or self._legacy_image.shape != binary_image.shape:
+            self._legacy_image = np.empty(binary_image.shape, dtype=np.int32)
+        np.copyto(self._legacy_image, binary_image, casting='unsafe')
+
+        height, width = binary_image.shape
+        success = self.lib.calculate_lane_center(
+            self._legacy_image.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), width, height, self._legacy_result)
+
+        self.result.center_x, self.result.center_y = self._legacy_result
+        self.result.left_bound = self.result.right_bound = -1
+        self.result.detected = bool(success)
+        return self.result if success else None
+
+    def detect_lane_center(self, binary_image: np.ndarray) -> Tuple[Optional[int], Optional[int]]:
+        """与detect_lane_center函数相同的返回值约定"""
+        result = self.detect(binary_image)
+        if result is None:
+            return 1000, None
+        return result.center_x, result.center_y
+
+
+_detector = None
+_load_error = None
+
+
 def detect_lane_center(binary_image: np.ndarray) -> Tuple[Optional[int], Optional[int]]:
     """
-    
+
     使用ctypes调用C++车道检测程序
-    
+    共享库加载失败时只打印一次，之后每帧直接返回(None, None)，不再重试
+
     """
+    global _detector, _load_error
+    if _detector is None:
+        if _load_error is not None:
+            return None, None
+        # 第一次调用时加载C++共享库，之后复用
+        try:
+            _detector = LaneDetector()
+        except Exception as e:
+            _load_error = e
+            print(f"车道检测库加载失败: {e}")
+            return None, None
     try:
-        # 加载编译好的C++共享库
-        lib_path = os.path.join(os.path.dirname(__file__), 'LaneCenterLocator2.so')
-        lane_lib = ctypes.CDLL(lib_path)
-        
-        # 设置函数参数和返回类型
-        lane_lib.calculate_lane_center.argtypes = [
-            ctypes.POINTER(ctypes.c_int),  # image_data
-            ctypes.c_int,                  # width
-            ctypes.c_int,                  # height
-            ctypes.POINTER(ctypes.c_int)   # result
-        ]
-        lane_lib.calculate_lane_center.restype = ctypes.c_int
-        
-        # 准备输入数据
-        height, width = binary_image.shape
-        flat_image = binary_image.flatten().astype(np.int32)
-        image_ptr = flat_image.ctypes.data_as(ctypes.POINTER(ctypes.c_int))
-        
-        # 准备结果数组
-        result_array = (ctypes.c_int * 2)(-1, -1)
-        result_ptr = ctypes.cast(result_array, ctypes.POINTER(ctypes.c_int))
-        
-        # 调用C++函数
-        success = lane_lib.calculate_lane_center(image_ptr, width, height, result_ptr)
-        
-        if success:
-            center_x = result_array[0]
-            center_y = result_array[1]
-            return center_x, center_y
-        else:
-            return 1000, None
-            
+        return _detector.detect_lane_center(binary_image)
+
     except Exception as e:
         print(f"车道检测错误: {e}")
         return None, None
@@ -1,18 +1,28 @@
 import PID_Ctrl
-import Camera
-from Car_Control import Car
-import cv2
-import time
+import argparse
+import signal
 import numpy as np
 import image
+from hardware import HardwareContext
+from latency import StageTimers
+from profiler import SamplingProfiler
+from bandlane import BandLaneDetector
+from runtime import LaneFollowerRuntime
+from telemetry import TelemetryRing
+from tracker import LaneTracker
+from viewer import DebugViewer
 #from test import inverse_perspective_mapping
 
+#控制循环频率(Hz)
+RATE=30
+
 
 def find_lane_center(roi):
     
     """查找车道中线"""
-    column_sums = np.sum(roi, axis=0) / 255
-    nonzero_indices = np.where(column_sums > 6)[0]
+    #每列白色像素数(整数)，不再生成float64的列和
+    column_counts = np.count_nonzero(roi, axis=0)
+    nonzero_indices = np.flatnonzero(column_counts > 6)
         
     if len(nonzero_indices) == 0:
         return None
@@ -28,50 +38,111 @@ def find_lane_center(roi):
 
 def cleanup():
     
-    #清理资源
-    car.Car_Stop()
-    picam2.stop()
-    picam2.close()
-    cv2.destroyAllWindows()
+    #清理资源(停车由runtime完成)
+    viewer.stop()
+    hw.close()
+    if telemetry:
+        telemetry.stop()
+        print(telemetry.stats())
+    if profiler.stop(wait=True):
+        print("采样结果",profiler.last_paths)
     
     print("资源清理完成")
 
 
-#开启摄像头
-picam2=Camera.init_camera()
-
-#初始化小车
-car=Car()
-
-while 1:
-    
-    #获取图像
-    frame=picam2.capture_array()
-    cv2.imshow('camera',frame)
+def preprocess(frame):
     
     #图像处理
     #birdseye_view=image.inverse_perspective(frame)
     #cv2.imshow('birdseye_view',birdseye_view)
-    binary=image.preprocess_image(frame,100)
+    binary=image.preprocess_image(frame,threshold)
     roi=image.get_roi(binary)
-    cv2.imshow('binary',binary)
-    
-    #中线检测
-    result=find_lane_center(roi)
+    return roi
+
+
+def detect(roi):
     
+    #中线检测，没检测到返回None
+    #在上一帧边界附近搜索，跟丢时退回与find_lane_center相同的全图搜索
+    #--bands时按条带拟合车道，用预瞄行上的中线
+    global last_result
+    result=bands.find_lane_center(roi) if bands else tracker.update(roi)
+    last_result=result
     if not result:
-        car.Car_Stop()
-        
-    if result:
-        left_x,right_x,lane_center=result
-        offsets = 159 - lane_center
-        #转向调节
-        PID_Ctrl.PID_Turn(offsets)  
+        return None
+    left_x,right_x,lane_center=result
+    return lane_center
+
+
+def steer(lane_center,timestamp=None):
+    
+    offsets = 159 - lane_center
+    #转向调节，返回(偏移量,PID输出)写入遥测；给出帧的采集时间时按真实间隔计算PID
+    return PID_Ctrl.PID_Turn(offsets,timestamp)
+
+
+def on_cycle(frame,timestamp,seq,roi,center_x):
+    
+    #调试画面交给显示线程，不开启时直接返回
+    if center_x is None:
+        viewer.submit(frame,roi)
+    else:
+        left_x,right_x,lane_center=last_result
+        viewer.submit(frame,roi,(lane_center,left_x,right_x),lane_center-159)
+    return viewer.key()==ord('q')
+
+
+if __name__ == "__main__":
+    
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--timing',action='store_true',help='统计各阶段耗时，Ctrl+\\打印，退出时打印')
+    parser.add_argument('--timing-csv',help='退出时把各阶段耗时写入CSV')
+    parser.add_argument('--adaptive',action='store_true',help='按光照自动调整二值化阈值(每隔若干帧或画面变化时重新估计)')
+    parser.add_argument('--display',action='store_true',help='显示调试画面(后台线程，限制帧率，不拖慢控制循环)')
+    parser.add_argument('--bands',type=int,default=0,help='把ROI分成N个条带拟合车道(bandlane.py)，按预瞄行上的中线转向，0表示不用')
+    parser.add_argument('--lookahead',type=int,help='--bands的预瞄行(ROI的行号，0最远)，默认中间行')
+    parser.add_argument('--timed-pid',action='store_true',help='PID按帧的采集时间计算(真实间隔、抗积分饱和)，改控制频率不用重新整定')
+    parser.add_argument('--profile-dir',default='profiles',help='kill -USR1开始采样分析、kill -USR2停止，结果(折叠栈和热点函数)写到这个目录')
+    parser.add_argument('--telemetry',help='每个周期的状态、偏移量、PID输出和电机指令写入二进制文件(python telemetry.py <文件> 转CSV)')
+    args=parser.parse_args()
+    if args.bands and args.bands<3:
+        parser.error('--bands至少是3(拟合需要至少3个检测到的条带)，0表示不用')
+    
+    #小车(I2C、舵机归位)和摄像头(启动、等前几帧)在后台同时初始化
+    hw=HardwareContext().start()
+    
+    last_result=None
+    threshold=image.AdaptiveThreshold() if args.adaptive else 100
+    tracker=LaneTracker()
+    bands=BandLaneDetector(args.bands,lookahead=args.lookahead) if args.bands else None
+    viewer=DebugViewer(enabled=args.display).start()
+    #循环里不print，记录写进环形缓冲区，后台线程写盘
+    telemetry=TelemetryRing(args.telemetry).start() if args.telemetry else None
+    
+    #摄像头由后台线程采集，循环里只取最新一帧
+    hw.wait()
+    print("硬件就绪 %.0f ms"%(hw.timings['ready']*1e3))
+    #PID_Ctrl和主程序共用同一个Car
+    car=PID_Ctrl.car=hw.car
     
-    if cv2.waitKey(1)&0xFF==ord('q'):
-        break
-    time.sleep(0.001)
+    #各阶段耗时统计，不开启时没有任何开销
+    timers=StageTimers(enabled=args.timing or bool(args.timing_csv))
+    timers.patch(hw.camera,'capture_array')
+    timers.patch(image,'preprocess_image')
+    timers.patch(image,'get_roi')
+    timers.patch(PID_Ctrl,'PID_Turn')
+    timers.instrument_car(car)
+    if timers.enabled:
+        signal.signal(signal.SIGQUIT,lambda signum,stack:print(timers.report()))
+    #采样分析器平时只注册信号，收到SIGUSR1才启动采样线程，循环和电机不停
+    profiler=SamplingProfiler(output_dir=args.profile_dir).install()
     
-#释放
-cleanup()
-car.Car_Stop()
+    #固定频率运行 采集 -> 预处理 -> 检测 -> 转向，没检测到车道或周期超时时停车
+    runtime=LaneFollowerRuntime(lambda:hw.grabber.read(timeout=0.5),preprocess,detect,steer,car,rate=RATE,
+                                on_miss='stop',on_cycle=on_cycle,cleanup=[cleanup],timers=timers,
+                                telemetry=telemetry,steer_timestamp=args.timed_pid)
+    print(runtime.run())
+    if timers.enabled:
+        print(timers.report())
+        if args.timing_csv:
+            timers.to_csv(args.timing_csv)
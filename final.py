@@ -1,43 +1,141 @@
 import PID_Control
 import Camera
-from Car_Control import Car
-import cv2
-import time
+import argparse
+import functools
+import signal
 import image
+import pipeline
+from bandlane import BandLaneDetector
 from ctype import detect_lane_center
+from hardware import HardwareContext
+from latency import StageTimers
+from profiler import SamplingProfiler
+from recorder import FrameRecorder
+from runtime import LaneFollowerRuntime
+from telemetry import TelemetryRing
+from viewer import DebugViewer
+
+#控制循环频率(Hz)
+RATE=30
 
 def cleanup():
-    #清理资源
-    car.Car_Stop()
-    picam2.stop()
-    cv2.destroyAllWindows()
+    #清理资源(停车由runtime完成)
+    viewer.stop()
+    hw.close()
+    if telemetry:
+        telemetry.stop()
+        print(telemetry.stats())
+    if profiler.stop(wait=True):
+        print("采样结果",profiler.last_paths)
+    if frame_recorder:
+        frame_recorder.close()
     print("资源清理完成")
 
-#开启摄像头
-picam2=Camera.init_camera()
-
-#初始化小车
-car=Car()
+def read_frame():
+    #获取最新一帧，超时返回None
+    return hw.grabber.read(timeout=0.5)
 
-while 1:
-    
-    #获取图像
-    frame = picam2.capture_array()
-    
-    #图像处理
-    birdseye_view = image.inverse_perspective(frame)
-    binary = image.preprocess_image(birdseye_view)
-    roi = image.get_roi(binary)
-    
-    #中线检测
-    
+def detect(roi):
+    #中线检测，没检测到返回None
     center_x,center_y=detect_lane_center(roi)
+    if center_y is None:
+        return None
+    return center_x
+
+def detect_bands(roi):
+    #按条带拟合车道，返回预瞄行上的中线，没检测到返回None
+    return bands.detect(roi)
+
+def steer(center_x,timestamp=None):
+    #转向调节，返回(偏移量,PID输出)写入遥测；给出帧的采集时间时按真实间隔计算PID
+    return PID_Control.PID_Turn(center_x,320,timestamp)
+
+def on_cycle(frame,timestamp,seq,roi,center_x):
+    #录制(后台线程写盘，不阻塞)
+    if frame_recorder:
+        frame_recorder.record(frame,timestamp,center_x,hw.car.last_command,seq)
+    #调试画面交给显示线程，不开启时直接返回；C++检测器只返回中线，不画边界
+    if center_x is None:
+        viewer.submit(frame,roi)
+    else:
+        viewer.submit(frame,roi,(center_x,None,None),center_x-Camera.image_width//2)
+    return viewer.key()==ord('q')
+
+if __name__=="__main__":
     
-    #转向调节
-    PID_Control.PID_Turn(center_x,320)
-    
-    if cv2.waitKey(1) and 0xFF==ord('q'):
-        break
-    time.sleep(0.001)
-#释放
-cleanup()
+    #python final.py --record <目录> 录制原始帧、中线位置和电机指令，供离线回放(replay.py)
+    parser=argparse.ArgumentParser()
+    parser.add_argument('--record',help='录制目录')
+    parser.add_argument('--timing',action='store_true',help='统计各阶段耗时，Ctrl+\\打印，退出时打印')
+    parser.add_argument('--timing-csv',help='退出时把各阶段耗时写入CSV')
+    parser.add_argument('--adaptive',action='store_true',help='按光照自动调整二值化阈值(每隔若干帧或画面变化时重新估计)')
+    parser.add_argument('--processes',action='store_true',help='采集、检测、控制分成多个进程(共享内存传递图像)')
+    parser.add_argument('--display',action='store_true',help='显示调试画面(后台线程，限制帧率，不拖慢控制循环)')
+    parser.add_argument('--telemetry',help='每个周期的状态、偏移量、PID输出和电机指令写入二进制文件(python telemetry.py <文件> 转CSV)')
+    parser.add_argument('--timed-pid',action='store_true',help='PID按帧的采集时间计算(真实间隔、抗积分饱和)，改控制频率不用重新整定')
+    parser.add_argument('--bands',type=int,default=0,help='把ROI分成N个条带拟合车道(bandlane.py)，按预瞄行上的中线转向，0表示不用')
+    parser.add_argument('--lookahead',type=int,help='--bands的预瞄行(ROI的行号，0最远)，默认中间行')
+    parser.add_argument('--profile-dir',default='profiles',help='kill -USR1开始采样分析、kill -USR2停止，结果(折叠栈和热点函数)写到这个目录')
+    args=parser.parse_args()
+    if args.processes and (args.record or args.display):
+        parser.error('--processes模式下帧不经过主进程，不能录制或显示')
+    if args.bands and args.processes:
+        parser.error('--bands在主进程里检测，不能与--processes同时使用')
+    if args.bands and args.bands<3:
+        parser.error('--bands至少是3(拟合需要至少3个检测到的条带)，0表示不用')
+    bands=BandLaneDetector(args.bands,lookahead=args.lookahead) if args.bands else None
+    #循环里不print，记录写进环形缓冲区，后台线程写盘
+    telemetry=TelemetryRing(args.telemetry).start() if args.telemetry else None
+    frame_recorder=FrameRecorder(args.record) if args.record else None
+    viewer=DebugViewer(enabled=args.display).start()
+
+    #小车(I2C、舵机归位)和摄像头(启动、等前几帧)在后台同时初始化，主线程继续计算映射表
+    #多进程模式下摄像头在采集进程里打开，这里只初始化小车
+    hw=HardwareContext(camera_factory=None if args.processes else Camera.init_camera).start()
+    if args.processes:
+        #采集+逆透视、中线检测各占一个进程，主进程只负责转向和I2C
+        pipe=pipeline.ProcessPipeline(pipeline.camera_source,pipeline.ctype_detector,
+                                      functools.partial(pipeline.default_preprocessor,args.adaptive)).start()
+    else:
+        #逆透视映射表在启动时计算，不用等到第一帧
+        mapper=image.PerspectiveMapper()
+        mapper.get_maps(Camera.image_width,Camera.image_height)
+        #中间图像写入预先分配的缓冲区，稳态下每帧不分配新数组(roi在下一帧被覆盖，viewer会自己复制)
+        preprocessor=image.RoiPreprocessor(mapper,threshold=image.AdaptiveThreshold() if args.adaptive else 90,
+                                           pool=image.BufferPool())
+    hw.wait()
+    print("硬件就绪 %.0f ms"%(hw.timings['ready']*1e3))
+    #PID_Control和主程序共用同一个Car
+    car=PID_Control.car=hw.car
+
+    #各阶段耗时统计，不开启时没有任何开销
+    timers=StageTimers(enabled=args.timing or bool(args.timing_csv))
+    if not args.processes:
+        timers.patch(hw.camera,'capture_array')
+    timers.patch(PID_Control,'PID_Turn')
+    timers.instrument_car(car)
+    if timers.enabled:
+        signal.signal(signal.SIGQUIT,lambda signum,stack:print(timers.report()))
+    #采样分析器平时只注册信号，收到SIGUSR1才启动采样线程，循环和电机不停
+    profiler=SamplingProfiler(output_dir=args.profile_dir).install()
+
+    #固定频率运行 采集 -> 预处理 -> 检测 -> 转向，周期超时时停车
+    if args.processes:
+        runtime=pipeline.make_runtime(pipe,steer,car,rate=RATE,on_miss='stop',timers=timers,telemetry=telemetry,
+                                       steer_timestamp=args.timed_pid)
+    else:
+        runtime=LaneFollowerRuntime(read_frame,preprocessor.process,detect_bands if bands else detect,steer,car,rate=RATE,
+                                    on_miss='stop',on_cycle=on_cycle,cleanup=[cleanup],timers=timers,
+                                    telemetry=telemetry,steer_timestamp=args.timed_pid)
+    print(runtime.run())
+    if args.processes:
+        print(pipe.stats())
+        #多进程模式不调用cleanup
+        if telemetry:
+            telemetry.stop()
+        if profiler.stop(wait=True):
+            print("采样结果",profiler.last_paths)
+    if timers.enabled:
+        print(timers.report())
+        if args.timing_csv:
+            timers.to_csv(args.timing_csv)
@@ -0,0 +1,89 @@
+"""
+稳态下不分配内存的帧处理
+
+image.RoiPreprocessor(pool=BufferPool())把灰度、逆透视、模糊、二值化都写进按分辨率预先分配的缓冲区，
+ColumnCountFinder用cv2.reduce把每列白色像素数(int32)写进同一个池里的缓冲区，
+代替example.find_lane_center里np.sum(roi, axis=0) / 255产生的float64数组和np.where的下标数组。
+第一帧之后处理一帧不再分配新的numpy数组，bench_alloc.py用tracemalloc检查。
+
+返回的ROI和列计数是池里缓冲区的视图，下一帧会被覆盖，需要保留时自己复制。
+
+    frames = FramePipeline(mapper)
+    result = frames.process(frame)     # (left_bound, right_bound, lane_center)或None
+"""
+import cv2
+import numpy as np
+
+import image
+
+
+class ColumnCountFinder:
+    """
+    与example.find_lane_center相同的全图搜索，中间数组都来自BufferPool
+    :param min_pixels: 有效列至少的白色像素数(>min_pixels)
+    :param pool: image.BufferPool，默认新建一个
+    """
+
+    def __init__(self, min_pixels=6, pool=None):
+        self.min_pixels = min_pixels
+        self.pool = image.BufferPool() if pool is None else pool
+
+    def column_counts(self, roi):
+        """
+        每列白色(255)像素数
+        :param roi: 二值化ROI (0/255)
+        :return: int32数组，池里缓冲区的视图
+        """
+        sums = self.pool.get('column_sums', (1, roi.shape[1]), np.int32)
+        cv2.reduce(roi, 0, cv2.REDUCE_SUM, dst=sums, dtype=cv2.CV_32S)
+        counts = sums[0]
+        np.floor_divide(counts, 255, out=counts)
+        return counts
+
+    def find_lane_center(self, roi):
+        """
+        :param roi: 二值化ROI (0/255)
+        :return: (left_bound, right_bound, lane_center)，没找到返回None
+        """
+        counts = self.column_counts(roi)
+        valid = self.pool.get('valid_columns', counts.shape, np.bool_)
+        np.greater(counts, self.min_pixels, out=valid)
+        # argmax得到第一个有效列，反向视图的argmax得到最后一个，不生成下标数组
+        left_bound = int(valid.argmax())
+        if not valid[left_bound]:
+            return None
+        right_bound = valid.shape[0] - 1 - int(valid[::-1].argmax())
+        return left_bound, right_bound, (left_bound + right_bound) // 2
+
+    def detect_lane_center(self, roi):
+        """
+        与ctype.detect_lane_center相同的接口
+        :return: (center_x, center_y)，没找到返回(1000, None)，PID_Turn收到后停车
+        """
+        result = self.find_lane_center(roi)
+        if result is None:
+            return 1000, None
+        return result[2], roi.shape[0] // 2
+
+
+class FramePipeline:
+    """
+    预处理和中线检测共用一个BufferPool
+    :param mapper: image.PerspectiveMapper，默认用标定的透视矩阵
+    :param threshold: 固定阈值或image.AdaptiveThreshold
+    :param min_pixels: 见ColumnCountFinder
+    """
+
+    def __init__(self, mapper=None, threshold=90, min_pixels=6):
+        self.pool = image.BufferPool()
+        self.preprocessor = image.RoiPreprocessor(mapper, threshold=threshold, pool=self.pool)
+        self.finder = ColumnCountFinder(min_pixels, self.pool)
+        self.roi = None     # 最近一帧的ROI(池里缓冲区的视图)
+
+    def process(self, frame):
+        """
+        :param frame: RGB图像
+        :return: (left_bound, right_bound, lane_center)，没找到返回None
+        """
+        self.roi = self.preprocessor.process(frame)
+        return self.finder.find_lane_center(self.roi)
@@ -0,0 +1,117 @@
+"""
+小车和摄像头的统一初始化
+
+原来导入PID_Control/PID_Ctrl时就创建一个Car(打开I2C并转动舵机)，主程序又创建一个，
+旧/only_Run.py启动摄像头后固定等待2秒。HardwareContext只创建一个Car和一个摄像头，
+I2C打开、舵机归位和摄像头启动、预热(等到前几帧)在两个线程里同时进行，
+start()之后主线程可以继续加载映射表等，wait()时才等待硬件就绪。
+各步骤耗时记录在timings里，用替代设备测量启动时间见bench_startup.py。
+
+    hw = HardwareContext().start()
+    ... 加载映射表、创建预处理器 ...
+    hw.wait()
+    PID_Control.car = hw.car       # 控制模块和主程序共用同一个Car
+    ... hw.grabber.read() ...
+    hw.close()
+"""
+import threading
+import time
+
+import Camera
+import Car_Control
+
+
+class HardwareContext:
+    """
+    :param car_factory: 无参数，返回Car对象，默认Car_Control.Car(async_writes=async_writes)
+    :param camera_factory: 无参数，返回提供capture_array()的摄像头，默认Camera.init_camera；
+                           None表示不打开摄像头(例如多进程模式下摄像头在子进程里)
+    :param warmup_frames: 摄像头启动后等到的帧数，到了之后才认为就绪(自动曝光需要几帧稳定)
+    :param warmup_timeout: 等待预热帧的最长时间(秒)，超时抛出TimeoutError
+    :param async_writes: 默认car_factory创建Car时是否用BusWriter线程写总线
+    :param slots: Camera.FrameGrabber的缓冲区数
+    """
+
+    def __init__(self, car_factory=None, camera_factory=Camera.init_camera, warmup_frames=3, warmup_timeout=2.0,
+                 async_writes=False, slots=3):
+        self.car_factory = car_factory or (lambda: Car_Control.Car(async_writes=async_writes))
+        self.camera_factory = camera_factory
+        self.warmup_frames = warmup_frames
+        self.warmup_timeout = warmup_timeout
+        self.slots = slots
+
+        self.car = None
+        self.camera = None
+        self.grabber = None
+        self.timings = {}       # 步骤 -> 耗时(秒)
+        self._errors = []
+        self._threads = []
+        self._start_time = None
+
+    def __enter__(self):
+        return self.start().wait()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        """在后台线程里同时初始化小车和摄像头，立即返回"""
+        self._start_time = time.monotonic()
+        self._threads = [threading.Thread(target=self._guard, args=(self._open_car,), name='HardwareCar', daemon=True)]
+        if self.camera_factory is not None:
+            self._threads.append(threading.Thread(target=self._guard, args=(self._open_camera,),
+                                                  name='HardwareCamera', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def wait(self):
+        """等待初始化完成，有一步失败时释放已打开的设备并抛出该异常"""
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.timings['ready'] = time.monotonic() - self._start_time
+        if self._errors:
+            self.close()
+            raise self._errors[0]
+        return self
+
+    def _guard(self, func):
+        try:
+            func()
+        except Exception as e:
+            self._errors.append(e)
+
+    def _open_car(self):
+        start = time.monotonic()
+        self.car = self.car_factory()
+        self.timings['car'] = time.monotonic() - start
+
+    def _open_camera(self):
+        start = time.monotonic()
+        self.camera = self.camera_factory()
+        self.timings['camera_open'] = time.monotonic() - start
+        self.grabber = Camera.FrameGrabber(self.camera, self.slots).start()
+
+        # 等到预热帧代替固定等待
+        deadline = start + self.timings['camera_open'] + self.warmup_timeout
+        for i in range(self.warmup_frames):
+            frame, _, _ = self.grabber.read(timeout=max(deadline - time.monotonic(), 0))
+            if frame is None:
+                raise TimeoutError(f"摄像头预热超时: {self.warmup_timeout}秒内只收到{i}帧")
+            if i == 0:
+                self.timings['first_frame'] = time.monotonic() - start
+        self.timings['camera'] = time.monotonic() - start
+
+    def close(self):
+        """停止采集、关闭摄像头，写完小车剩余指令(停车由runtime完成)"""
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+        if self.camera is not None:
+            self.camera.stop()
+            if hasattr(self.camera, 'close'):
+                self.camera.close()
+            self.camera = None
+        if self.car is not None and hasattr(self.car, 'close'):
+            self.car.close()
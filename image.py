@@ -1,6 +1,37 @@
 import cv2
 import numpy as np
 
+# Source and destination points for the perspective transformation (calibrated on 600x400 images)
+SRC_POINTS = np.float32([
+    (600 * 6.25 / 16.5, 400),
+    (600 * 9.4 / 16.5, 400),
+    (600 * 6.5 / 16.5, 0),
+    (600 * 8.6 / 16.5, 0),
+])
+DST_POINTS = np.float32([
+    (220, 350),
+    (380, 350),
+    (220, 0),
+    (380, 0),
+])
+
+# Region of the bird's-eye view used for lane detection
+ROI_TOP = 0
+ROI_BOTTOM = 96
+ROI_LEFT = 0
+ROI_RIGHT = 320
+
+
+def get_perspective_matrix():
+    """
+    Computes the perspective transformation matrix from SRC_POINTS to DST_POINTS.
+
+    Returns:
+    numpy.ndarray: The 3x3 perspective transformation matrix.
+    """
+    return cv2.getPerspectiveTransform(SRC_POINTS, DST_POINTS)
+
+
 def inverse_perspective(image):
     """
     Applies inverse perspective mapping to the input image to obtain a bird's-eye view.
@@ -11,22 +42,8 @@ def inverse_perspective(image):
     Returns:
     numpy.ndarray: The transformed bird's-eye view image.
     """
-    # Define source and destination points for perspective transformation
-    srcPt1 = (600 * 6.25 / 16.5, 400)
-    srcPt2 = (600 * 9.4 / 16.5, 400)
-    srcPt3 = (600 * 6.5 / 16.5, 0)
-    srcPt4 = (600 * 8.6 / 16.5, 0)
-
-    dstPts1 = (220, 350)
-    dstPts2 = (380, 350)
-    dstPts3 = (220, 0)
-    dstPts4 = (380, 0)
-
-    srcPts = np.float32([srcPt1, srcPt2, srcPt3, srcPt4])
-    dstPts = np.float32([dstPts1, dstPts2, dstPts3, dstPts4])
-    
     # Compute the perspective transformation matrix
-    M = cv2.getPerspectiveTransform(srcPts, dstPts)
+    M = get_perspective_matrix()
 
     # Get the dimensions of the input image
     img_size = (image.shape[1], image.shape[0])
@@ -35,19 +52,332 @@ def inverse_perspective(image):
     birdseye_view = cv2.warpPerspective(image, M, img_size, flags=cv2.INTER_LINEAR)
     
     return birdseye_view
+
+
+class PerspectiveMapper:
+    """
+    Precomputed inverse perspective mapping.
+
+    The mapping is computed once per resolution and stored as fixed-point
+    cv2.remap maps (CV_16SC2). If a camera matrix and distortion coefficients
+    are given, lens undistortion is folded into the same maps, so a frame
+    goes from raw camera image to bird's-eye view in a single remap.
+    """
+
+    def __init__(self, matrix=None, camera_matrix=None, dist_coeffs=None):
+        self.matrix = get_perspective_matrix() if matrix is None else np.asarray(matrix, dtype=np.float64)
+        self.camera_matrix = None if camera_matrix is None else np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = None if dist_coeffs is None else np.asarray(dist_coeffs, dtype=np.float64)
+        self._maps = {}
+
+    def get_maps(self, width, height):
+        """Returns the (map1, map2) pair for the given resolution, building it on first use."""
+        key = (width, height)
+        if key not in self._maps:
+            self._maps[key] = self.build_maps(width, height)
+        return self._maps[key]
+
+    def build_maps(self, width, height):
+        """
+        Builds the remap tables for a width x height image.
+
+        Returns:
+        tuple: (map1, map2) in CV_16SC2 / CV_16UC1 fixed-point format.
+        """
+        # Every output pixel looks up its position in the (undistorted) input image
+        xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+        dst_pts = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+        src_pts = cv2.perspectiveTransform(dst_pts, np.linalg.inv(self.matrix))
+
+        if self.camera_matrix is not None:
+            # Project the undistorted pixel positions back into the raw, distorted image
+            fx, fy = self.camera_matrix[0, 0], self.camera_matrix[1, 1]
+            cx, cy = self.camera_matrix[0, 2], self.camera_matrix[1, 2]
+            normalized = np.empty((src_pts.shape[0], 3), dtype=np.float64)
+            normalized[:, 0] = (src_pts[:, 0, 0] - cx) / fx
+            normalized[:, 1] = (src_pts[:, 0, 1] - cy) / fy
+            normalized[:, 2] = 1.0
+            dist_coeffs = np.zeros(5) if self.dist_coeffs is None else self.dist_coeffs
+            src_pts, _ = cv2.projectPoints(normalized, np.zeros(3), np.zeros(3), self.camera_matrix, dist_coeffs)
+
+        map_x = src_pts[:, 0, 0].reshape(height, width).astype(np.float32)
+        map_y = src_pts[:, 0, 1].reshape(height, width).astype(np.float32)
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def warp(self, image, dst=None):
+        """
+        Applies the precomputed mapping to the input image.
+
+        Parameters:
+        image (numpy.ndarray): The input image.
+        dst (numpy.ndarray): Optional output buffer.
+
+        Returns:
+        numpy.ndarray: The transformed bird's-eye view image.
+        """
+        map1, map2 = self.get_maps(image.shape[1], image.shape[0])
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, dst=dst)
     
 
-def preprocess_image(image):
+class BufferPool:
+    """
+    Preallocated intermediate buffers.
+
+    get() returns the same array for the same name, shape and dtype on
+    every call, so stages that write into pool buffers (dst=/out=) allocate
+    only on their first frame at each resolution.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        Returns the buffer for name, allocating it on first use.
+
+        Parameters:
+        name (str): The stage the buffer belongs to.
+        shape (tuple): The buffer shape.
+        dtype: The buffer dtype.
+
+        Returns:
+        numpy.ndarray: An uninitialized buffer, reused on later calls.
+        """
+        key = (name, shape, dtype)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty(shape, dtype)
+            self.allocations += 1
+        return buffer
+
+    def nbytes(self):
+        """Total size of all buffers in the pool."""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+def preprocess_image(image,threshold=90):
     
+    #threshold可以是固定值，也可以是AdaptiveThreshold
     gray=cv2.cvtColor(image,cv2.COLOR_RGB2GRAY)
     blurred=cv2.GaussianBlur(gray,(5,5),0)
-    _,binary=cv2.threshold(blurred,90,255,cv2.THRESH_BINARY_INV)
+    if isinstance(threshold,AdaptiveThreshold):
+        threshold=threshold.update(blurred)
+    _,binary=cv2.threshold(blurred,threshold,255,cv2.THRESH_BINARY_INV)
     
     return binary
+
+
+class AdaptiveThreshold:
+    """
+    Amortized Otsu threshold.
+
+    The threshold is Otsu's threshold of every step-th pixel in both
+    directions, estimated only every interval frames or when a much sparser
+    16-bin histogram (every drift_step-th pixel) drifts by more than drift
+    (L1 distance of the normalized histograms) from the last estimate.
+    Between estimates the previous threshold is reused, so the per-frame
+    cost is one tiny histogram plus, occasionally, Otsu on the subsample.
+    """
+
+    def __init__(self, interval=30, step=4, drift=0.25, drift_step=8, offset=0, low=20, high=200, initial=90):
+        self.interval = interval
+        self.step = step
+        self.drift = drift
+        self.drift_step = drift_step
+        self.offset = offset
+        self.low = low
+        self.high = high
+        self.threshold = initial
+        self.frames = 0
+        self.estimates = 0
+        self._reference = None
+        self._age = interval
+        # Samples, histograms and the Otsu output are reused between frames
+        self._pool = BufferPool()
+
+    def signature(self, gray):
+        """Normalized 16-bin histogram (float32, 16x1) of a sparse pixel sample."""
+        view = gray[::self.drift_step, ::self.drift_step]
+        sample = self._pool.get("signature_sample", view.shape)
+        # Copy first: a ufunc on the strided view would allocate an iteration buffer
+        np.copyto(sample, view)
+        np.right_shift(sample, 4, out=sample)
+        out = self._pool.get("signature", (16, 1), np.float32)
+        cv2.calcHist([sample], [0], None, [16], [0, 16], hist=out)
+        np.multiply(out, 1.0 / max(sample.size, 1), out=out)
+        return out
+
+    def estimate(self, gray):
+        """Recomputes the threshold from the subsampled image."""
+        view = gray[::self.step, ::self.step]
+        sample = self._pool.get("estimate_sample", view.shape)
+        np.copyto(sample, view)
+        otsu, _ = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU,
+                                dst=self._pool.get("estimate_binary", view.shape))
+        self.threshold = int(min(max(otsu + self.offset, self.low), self.high))
+        self.estimates += 1
+        self._age = 0
+
+    def update(self, gray):
+        """
+        Returns the threshold for this frame, re-estimating it when due.
+
+        Parameters:
+        gray (numpy.ndarray): The gray (blurred) image about to be thresholded.
+
+        Returns:
+        int: The threshold.
+        """
+        self.frames += 1
+        self._age += 1
+        signature = self.signature(gray)
+        if (self._age >= self.interval or self._reference is None
+                or cv2.norm(signature, self._reference, cv2.NORM_L1) > self.drift):
+            self.estimate(gray)
+            if self._reference is None:
+                self._reference = np.empty_like(signature)
+            np.copyto(self._reference, signature)
+        return self.threshold
     
     
 def get_roi(image):
     
-    roi = image[0:96,0:320]
+    roi = image[ROI_TOP:ROI_BOTTOM,ROI_LEFT:ROI_RIGHT]
     
     return roi
+
+
+class RoiPreprocessor:
+    """
+    Fused preprocessing stage.
+
+    Produces the same binary ROI as
+    get_roi(preprocess_image(PerspectiveMapper.warp(frame))), but converts to
+    gray before warping and only touches the pixels the ROI needs: the
+    source region the ROI samples from is converted to gray, only the ROI
+    rows (plus the blur margin) are warped, and blur and threshold run on
+    that crop.
+
+    Converting to gray before interpolating rounds slightly differently, so
+    a few pixels right at the threshold can flip (under 0.01% of the ROI
+    on the sample frames). gray_first=False warps the RGB crop instead and
+    is bit-identical to the full chain.
+
+    The threshold may be a fixed value or an AdaptiveThreshold, which is
+    then estimated from the blurred ROI crop.
+
+    With a BufferPool every intermediate (gray crop, warped crop, blur,
+    binary) is written into a buffer preallocated for the frame size, so
+    after the first frame process() allocates no arrays. The returned ROI
+    is then a view of a pool buffer and is overwritten by the next call.
+    """
+
+    # Half the 5x5 Gaussian kernel: rows/columns outside the ROI the blur reads
+    BLUR_MARGIN = 2
+
+    def __init__(self, mapper=None, threshold=90, gray_first=True, pool=None):
+        self.mapper = PerspectiveMapper() if mapper is None else mapper
+        self.threshold = threshold
+        self.gray_first = gray_first
+        self.pool = pool
+        self._plans = {}
+
+    def get_plan(self, width, height):
+        """
+        Returns (source_slice, map1, map2, roi_slice) for a width x height frame.
+
+        source_slice is the region of the input frame the ROI samples from,
+        map1/map2 are the remap tables for the ROI rows relative to that
+        region, and roi_slice crops the blur margin off the result.
+        """
+        key = (width, height)
+        if key in self._plans:
+            return self._plans[key]
+
+        top, bottom = ROI_TOP, min(ROI_BOTTOM, height)
+        left, right = ROI_LEFT, min(ROI_RIGHT, width)
+        out_top = max(top - self.BLUR_MARGIN, 0)
+        out_bottom = min(bottom + self.BLUR_MARGIN, height)
+        out_left = max(left - self.BLUR_MARGIN, 0)
+        out_right = min(right + self.BLUR_MARGIN, width)
+
+        map1, map2 = self.mapper.get_maps(width, height)
+        map1 = map1[out_top:out_bottom, out_left:out_right].astype(np.int32)
+        map2 = np.ascontiguousarray(map2[out_top:out_bottom, out_left:out_right])
+
+        # Bounding box of every source pixel a bilinear sample reads; a box
+        # that reaches the frame edge keeps the constant-border behaviour
+        x0 = int(np.clip(map1[..., 0].min(), 0, width - 1))
+        x1 = int(np.clip(map1[..., 0].max() + 1, 0, width - 1))
+        y0 = int(np.clip(map1[..., 1].min(), 0, height - 1))
+        y1 = int(np.clip(map1[..., 1].max() + 1, 0, height - 1))
+        map1[..., 0] -= x0
+        map1[..., 1] -= y0
+        map1 = np.clip(map1, -32768, 32767).astype(np.int16)
+
+        plan = (
+            (slice(y0, y1 + 1), slice(x0, x1 + 1)),
+            map1,
+            map2,
+            (slice(top - out_top, bottom - out_top), slice(left - out_left, right - out_left)),
+        )
+        self._plans[key] = plan
+        return plan
+
+    def process(self, frame):
+        """
+        Runs the fused stage on a camera frame.
+
+        Parameters:
+        frame (numpy.ndarray): The RGB (or already gray) input frame.
+
+        Returns:
+        numpy.ndarray: The binary ROI (0 or 255, white = dark lane pixels).
+        """
+        source_slice, map1, map2, roi_slice = self.get_plan(frame.shape[1], frame.shape[0])
+        source = frame[source_slice]
+        buffer = self.buffer
+        out_shape = map2.shape
+
+        if frame.ndim == 2:
+            warped = cv2.remap(source, map1, map2, cv2.INTER_LINEAR, dst=buffer("warped", out_shape))
+        elif self.gray_first:
+            gray = cv2.cvtColor(source, cv2.COLOR_RGB2GRAY, dst=buffer("gray", source.shape[:2]))
+            warped = cv2.remap(gray, map1, map2, cv2.INTER_LINEAR, dst=buffer("warped", out_shape))
+        else:
+            warped_rgb = cv2.remap(source, map1, map2, cv2.INTER_LINEAR, dst=buffer("warped_rgb", out_shape + (3,)))
+            warped = cv2.cvtColor(warped_rgb, cv2.COLOR_RGB2GRAY, dst=buffer("warped", out_shape))
+
+        blurred = cv2.GaussianBlur(warped, (5, 5), 0, dst=buffer("blurred", out_shape))
+        threshold = self.threshold
+        if isinstance(threshold, AdaptiveThreshold):
+            threshold = threshold.update(blurred)
+        _, binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY_INV, dst=buffer("binary", out_shape))
+
+        return binary[roi_slice]
+
+    def buffer(self, name, shape):
+        """A uint8 pool buffer, or None (let OpenCV allocate) without a pool."""
+        if self.pool is None:
+            return None
+        return self.pool.get(name, shape)
+
+
+_default_preprocessor = None
+
+
+def preprocess(frame):
+    """
+    Fused warp + preprocess + ROI stage using a shared default RoiPreprocessor.
+
+    Parameters:
+    frame (numpy.ndarray): The RGB input frame.
+
+    Returns:
+    numpy.ndarray: The binary ROI.
+    """
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        _default_preprocessor = RoiPreprocessor()
+    return _default_preprocessor.process(frame)
@@ -0,0 +1,174 @@
+"""
+各处理阶段的耗时统计
+
+StageTimers.wrap/patch给函数套上计时，每个阶段的样本存在固定大小的环形缓冲区里，
+按需计算p50/p95/p99/max，可以打印或导出CSV。
+关闭时wrap直接返回原函数、patch什么都不做，运行时没有额外开销。
+
+    timers = StageTimers()
+    timers.patch(image, 'preprocess_image')          # 替换模块里的函数
+    read = timers.wrap('capture', grabber.read)      # 包装单个函数
+    timers.instrument_car(car)                       # I2C写入耗时和 采集->电机写入 的端到端延迟
+    print(timers.report())
+"""
+import csv
+import functools
+import time
+
+import numpy as np
+
+# 写这些寄存器时算作电机指令写出，用于端到端延迟
+MOTOR_REGS = (0x01, 0x02)
+
+
+class LatencyStats:
+    """保存最近window个样本(秒)的环形缓冲区"""
+
+    def __init__(self, window=1024):
+        self.samples = np.zeros(window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        """返回毫秒为单位的统计，max是全部样本的最大值，分位数只统计最近window个"""
+        n = min(self.count, len(self.samples))
+        if not n:
+            return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        ms = self.samples[:n] * 1e3
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        return {
+            'count': self.count,
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': self.max * 1e3,
+        }
+
+
+class TimedDevice:
+    """包装SMBus设备，统计每次写入耗时，并在电机指令写出时记录端到端延迟"""
+
+    def __init__(self, device, timers):
+        self._device = device
+        self._timers = timers
+
+    def _timed(self, func, reg, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            end = time.perf_counter()
+            self._timers.add('i2c_write', end - start)
+            if reg in MOTOR_REGS:
+                self._timers.motor_written()
+
+    def write_byte_data(self, addr, reg, data):
+        return self._timed(self._device.write_byte_data, reg, addr, reg, data)
+
+    def write_byte(self, addr, reg):
+        return self._timed(self._device.write_byte, reg, addr, reg)
+
+    def write_i2c_block_data(self, addr, reg, data):
+        return self._timed(self._device.write_i2c_block_data, reg, addr, reg, data)
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+
+class StageTimers:
+    """
+    :param enabled: False时wrap/patch/instrument_car都不做任何事
+    :param window: 每个阶段保留的样本数
+    """
+
+    def __init__(self, enabled=True, window=1024):
+        self.enabled = enabled
+        self.window = window
+        self.stats = {}
+        self._patched = []
+        self._frame_timestamp = None
+
+    def get(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats(self.window)
+        return stats
+
+    def add(self, name, seconds):
+        self.get(name).add(seconds)
+
+    def wrap(self, name, func):
+        """返回计时版本的func，关闭时返回func本身"""
+        if not self.enabled:
+            return func
+        stats = self.get(name)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add(perf_counter() - start)
+        return timed
+
+    def patch(self, obj, attr, name=None):
+        """把obj.attr替换为计时版本(模块函数或实例方法)，unpatch_all()恢复"""
+        if not self.enabled:
+            return
+        original = getattr(obj, attr)
+        self._patched.append((obj, attr, original, attr in vars(obj)))
+        setattr(obj, attr, self.wrap(name or attr, original))
+
+    def unpatch_all(self):
+        for obj, attr, original, own in reversed(self._patched):
+            if own:
+                setattr(obj, attr, original)
+            else:
+                delattr(obj, attr)
+        self._patched = []
+
+    def instrument_car(self, car):
+        """统计car的每次I2C写入(同步或BusWriter线程中)"""
+        if not self.enabled:
+            return
+        device = TimedDevice(car._device, self)
+        car._device = device
+        if getattr(car, '_writer', None) is not None:
+            car._writer._device = device
+
+    def mark_frame(self, timestamp):
+        """记录当前处理的帧的采集时间(time.monotonic())，下一次电机写入时计算端到端延迟"""
+        self._frame_timestamp = timestamp
+
+    def motor_written(self):
+        timestamp = self._frame_timestamp
+        if timestamp is not None:
+            self._frame_timestamp = None
+            self.add('frame_to_motor', time.monotonic() - timestamp)
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def report(self):
+        lines = [f"{'stage':16s} {'count':>8s} {'mean':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}  (ms)"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:16s} {s['count']:8d} {s['mean_ms']:8.3f} {s['p50_ms']:8.3f} "
+                         f"{s['p95_ms']:8.3f} {s['p99_ms']:8.3f} {s['max_ms']:8.3f}")
+        return "\n".join(lines)
+
+    def to_csv(self, path):
+        fields = ['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for name, s in self.summary().items():
+                writer.writerow(dict(stage=name, **s))
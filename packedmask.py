@@ -0,0 +1,143 @@
+"""
+按位压缩的二值图
+
+二值ROI是0/255的uint8数组，每个像素占一个字节。PackedMask用np.packbits按列方向(axis=0)把8行压进一个字节，
+大小是原来的1/8，录制、进程间传递或保留历史帧时更省内存。
+每列的白色像素数是该列各字节的popcount之和，第一个/最后一个有效列也在压缩后的数据上计算，不需要解压。
+
+磁盘格式(.npz，np.savez_compressed):
+    packed   (帧数, ceil(height/8), width) uint8，每帧的压缩数据
+    height   原始行数
+
+用法:
+    mask = PackedMask.from_binary(image.get_roi(image.preprocess_image(frame)), full_scale=True)
+    mask.find_lane_center()            # 与example.find_lane_center相同
+    python packedmask.py results/*.jpg -o results_masks.npz    # 把保存的图片转换成压缩二值图
+"""
+import argparse
+import glob
+
+import numpy as np
+
+# numpy 2.0之前没有np.bitwise_count，用查表代替
+if hasattr(np, 'bitwise_count'):
+    popcount = np.bitwise_count
+else:
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(x):
+        return _POPCOUNT[x]
+
+# 每组8行中各行对应的位，与np.packbits的顺序相同(第一行是最高位)
+_BIT_WEIGHTS = np.array([128, 64, 32, 16, 8, 4, 2, 1], dtype=np.uint8).reshape(1, 8, 1)
+
+
+class PackedMask:
+    """
+    :param packed: (ceil(height/8), width) uint8，np.packbits(binary, axis=0)的结果
+    :param height: 原始行数
+    """
+
+    def __init__(self, packed, height):
+        self.packed = packed
+        self.height = height
+
+    @classmethod
+    def from_binary(cls, binary, full_scale=False):
+        """
+        :param binary: 二值图(0/非0)，例如image.preprocess_image或image.get_roi的结果
+        :param full_scale: binary只有0和255时为True，行数是8的倍数时用按位与加求和代替np.packbits，
+                           结果相同，快约8倍(np.packbits沿axis=0压缩很慢)
+        """
+        height = binary.shape[0]
+        if full_scale and height % 8 == 0 and binary.dtype == np.uint8:
+            groups = binary.reshape(height // 8, 8, binary.shape[1])
+            return cls(np.bitwise_and(groups, _BIT_WEIGHTS).sum(axis=1, dtype=np.uint8), height)
+        return cls(np.packbits(binary, axis=0), height)
+
+    @property
+    def shape(self):
+        return self.height, self.packed.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def unpack(self):
+        """还原成0/255的uint8二值图"""
+        bits = np.unpackbits(self.packed, axis=0, count=self.height)
+        return bits * np.uint8(255)
+
+    def column_counts(self):
+        """每列白色像素数"""
+        return popcount(self.packed).sum(axis=0, dtype=np.int32)
+
+    def any_columns(self):
+        """每列是否有白色像素"""
+        return np.bitwise_or.reduce(self.packed, axis=0) != 0
+
+    def bounds(self, min_pixels=0):
+        """
+        第一个和最后一个白色像素数大于min_pixels的列
+        :return: (first, last)，没有时返回None
+        """
+        valid = self.any_columns() if min_pixels == 0 else self.column_counts() > min_pixels
+        first = int(valid.argmax())
+        if not valid[first]:
+            return None
+        return first, valid.shape[0] - 1 - int(valid[::-1].argmax())
+
+    def find_lane_center(self, min_pixels=6):
+        """
+        与example.find_lane_center相同的全图搜索
+        :return: (left_bound, right_bound, lane_center)，没找到返回None
+        """
+        bounds = self.bounds(min_pixels)
+        if bounds is None:
+            return None
+        left_bound, right_bound = bounds
+        return left_bound, right_bound, (left_bound + right_bound) // 2
+
+
+def save_masks(path, masks):
+    """把同样大小的一组PackedMask写入一个.npz文件"""
+    heights = {mask.height for mask in masks}
+    if len(heights) != 1:
+        raise ValueError("所有mask的大小必须相同")
+    np.savez_compressed(path, packed=np.stack([mask.packed for mask in masks]), height=heights.pop())
+
+
+def load_masks(path):
+    """读取save_masks写入的文件，返回PackedMask列表(共用一个数组)"""
+    with np.load(path) as data:
+        packed = data['packed']
+        height = int(data['height'])
+    return [PackedMask(packed[i], height) for i in range(packed.shape[0])]
+
+
+def main():
+    import cv2
+
+    import Camera
+    import image
+
+    parser = argparse.ArgumentParser(description="convert saved images to packed binary masks")
+    parser.add_argument('images', nargs='*', default=['results/*.jpg'], help='图片或通配符')
+    parser.add_argument('-o', '--output', required=True, help='输出.npz')
+    parser.add_argument('--threshold', type=int, default=90)
+    parser.add_argument('--roi', action='store_true', help='只保存image.get_roi范围')
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.images for path in glob.glob(pattern))
+    masks = []
+    for path in paths:
+        frame = cv2.resize(cv2.imread(path), (Camera.image_width, Camera.image_height))
+        binary = image.preprocess_image(frame, args.threshold)
+        masks.append(PackedMask.from_binary(image.get_roi(binary) if args.roi else binary, full_scale=True))
+    save_masks(args.output, masks)
+    print(f"{len(masks)}帧 -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,333 @@
+"""
+PID参数离线扫描(闭环)
+
+用pidbank.PositionalPIDBank/IncrementalPIDBank一次计算所有Kp/Ki/Kd/惯性时间组合，
+每个组合接一辆车道坐标系下的小车模型闭环跑完整条道路，按横向误差排序。
+小车模型与simulator.py相同(差速驱动运动学、电机一阶滞后、摄像头看到ROI中间行的车道中线)，
+但不渲染图像、不跑检测器: 偏移量由横向误差、航向误差和道路曲率算出，加上检测噪声后取整到像素。
+转向与PID_Control.PID_Turn(或PID_Ctrl.PID_Turn)相同: 死区、急转分支、限幅。
+
+开始前做两个检查:
+    用当前参数把模型里的偏移量序列交给真实的PID_Turn，每一步的电机指令与数组版本相同
+    用标量PID.PositionalPID/IncrementalPID逐步计算几组参数，与数组版本结果完全相同
+
+道路(曲率随行驶距离的变化):
+    默认                              simulator.Track(直道+半圆弯道的跑道)，跑--laps圈
+    录制目录(recorder.FrameRecorder)  由录制的左右轮指令估计每一段的转弯曲率(假设录制时小车沿车道行驶)
+
+指标:
+    error       横向误差的均方根(cm)；出界、看不到车道或超时没跑完的组合为inf
+    smoothness  相邻两步转向量(左右轮指令差的一半)变化的均方根
+    score       error + smooth_weight * smoothness，越小越好
+排在前面、惯性时间与当前相同的组合可以用 simulator.py --gains 在完整的图像链路上确认。
+
+用法: python pid_sweep.py [录制目录] [--profile PID_Control] [--top 20]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+import PID
+import pidbank
+
+# PID_Turn中的常量: 默认参数、惯性时间、采样时间、输出限幅；offsets = center - center_x
+PROFILES = {
+    'PID_Control': dict(gains=(0.6, 0, 1), inertia=0.4, sample=0.1, limit=60, center=160),
+    'PID_Ctrl': dict(gains=(0.6, 0, 1), inertia=0.1, sample=0.01, limit=30, center=159),
+}
+
+# 与simulator.DiffDriveModel、simulator.SimCamera的默认值相同
+SPEED_SCALE = 0.5      # 每单位速度指令对应的轮速(cm/s)
+WHEEL_BASE = 14        # 左右轮距(cm)
+TAU = 0.1              # 电机时间常数(s)
+PX_PER_CM = 4          # 俯视图分辨率
+LOOKAHEAD_CM = 10 + (240 - 48) / 4    # ROI中间行在车前的距离(cm)
+LANE_WIDTH = 40
+
+
+def pid_control_commands(offsets, turn):
+    """PID_Control.PID_Turn的左右轮指令，turn是int(output)"""
+    mid = (offsets > 3) & (offsets < 500) | (offsets < -3) & (offsets > -500)
+    stop = (offsets < -500) | (offsets > 500)
+    left = np.select([mid & (offsets > 120), mid & (offsets < -120), mid, stop], [-70, 60, 60 + turn, 0], 50)
+    right = np.select([mid & (offsets > 120), mid & (offsets < -120), mid, stop], [60, -70, 60 - turn, 0], 50)
+    return left, right
+
+
+def pid_ctrl_commands(offsets, turn):
+    """PID_Ctrl.PID_Turn的左右轮指令(负方向的急转分支在原代码里注释掉了)"""
+    sharp = offsets > 140
+    mid = (offsets > 15) | (offsets < -15) & (offsets > -161)
+    stop = (offsets < -500) & ~mid
+    left = np.select([sharp, mid, stop], [-70, 60 + turn, 0], 60)
+    right = np.select([sharp, mid, stop], [70, 60 - turn, 0], 60)
+    return left, right
+
+
+COMMANDS = {'PID_Control': pid_control_commands, 'PID_Ctrl': pid_ctrl_commands}
+
+
+def track_road(laps=1, spacing=0.5):
+    """simulator.Track的曲率，返回(每spacing厘米的曲率, spacing, 总距离)"""
+    from simulator import Track
+    track = Track(spacing=spacing)
+    curvature = np.diff(np.unwrap(np.append(track.heading, track.heading[0]))) / np.diff(track.arc)
+    return curvature, spacing, track.length * laps
+
+
+def recording_road(path, spacing=0.5):
+    """
+    由录制的左右轮指令估计道路曲率: 小车沿车道行驶时，车道曲率约等于小车的角速度/线速度
+    :return: (每spacing厘米的曲率, spacing, 总距离)
+    """
+    from recorder import Recording
+    records = Recording(path).all_records()
+    left = records['left_speed'][:-1] * SPEED_SCALE
+    right = records['right_speed'][:-1] * SPEED_SCALE
+    v = (left + right) / 2
+    moving = v > 0
+    distance = np.cumsum(np.where(moving, v * np.diff(records['timestamp']), 0))
+    curvature = np.where(moving, (right - left) / WHEEL_BASE / np.where(moving, v, 1), 0)
+    if distance.size == 0 or distance[-1] <= spacing:
+        raise ValueError(f"{path}: 录制里没有向前行驶的记录")
+    s = np.arange(0, distance[-1], spacing)
+    index = np.minimum(np.searchsorted(distance, s, side='right'), len(curvature) - 1)
+    return curvature[index], spacing, float(distance[-1])
+
+
+def make_grid(kp, ki, kd, inertia):
+    """所有组合展平成一维数组"""
+    grids = np.meshgrid(kp, ki, kd, inertia, indexing='ij')
+    return [g.ravel() for g in grids]
+
+
+def scalar_trace(offsets, kp, ki, kd, inertia, sample, limit, pid_class=PID.PositionalPID):
+    """与PID_Turn相同的标量计算，返回每步限幅后的SystemOutput"""
+    pid = pid_class(kp, ki, kd)
+    outputs = np.empty(len(offsets))
+    for i, offset in enumerate(offsets):
+        pid.SystemOutput = offset
+        pid.SetStepSignal(0)
+        pid.SetInertiaTime(inertia, sample)
+        if pid.SystemOutput > limit:
+            pid.SystemOutput = limit
+        elif pid.SystemOutput < -limit:
+            pid.SystemOutput = -limit
+        outputs[i] = pid.SystemOutput
+    return outputs
+
+
+def pid_turn_commands(profile, offsets, gains):
+    """把偏移量序列交给真实的PID_Turn(新的PID状态，接FakeSMBus的Car)，返回每一步的电机指令"""
+    from Car_Control import Car, FakeSMBus
+    car = Car(device=FakeSMBus())
+    if profile == 'PID_Control':
+        import PID_Control as module
+        module.Z_axis_pid = PID.PositionalPID(*gains)
+        center = PROFILES[profile]['center']
+
+        def turn(offset):
+            module.PID_Turn(center - offset, 2 * center)
+    else:
+        import PID_Ctrl as module
+        module.sport = PID.PositionalPID(*gains)
+        turn = module.PID_Turn
+    module.car = car
+    commands = []
+    for offset in offsets:
+        turn(int(offset))
+        commands.append(car.last_command)
+    return np.array(commands, dtype=np.float64).reshape(-1, 2)
+
+
+def sweep(road, kp, ki, kd, inertia, profile, rate=30, noise=2.0, smooth_weight=0.05, max_time=None,
+          bank_class=pidbank.PositionalPIDBank, check=None, seed=0):
+    """
+    所有组合同时闭环跑完道路
+    :param road: (每spacing厘米的曲率, spacing, 总距离)
+    :param noise: 检测噪声的标准差(像素)，每一步所有组合用同一个噪声
+    :param check: 需要记录偏移量、PID输出和电机指令的组合下标，用于与标量版本和PID_Turn对比
+    :return: (指标字典, {下标: (偏移量, 输出, 指令)})
+    """
+    curvature, spacing, distance = road
+    settings = PROFILES[profile]
+    commands = COMMANDS[profile]
+    limit = settings['limit']
+    bank = bank_class(kp, ki, kd)
+    n = bank.Kp.shape[0]
+    dt = 1.0 / rate
+    substeps = 4
+    h = dt / substeps
+    alpha = h / (TAU + h)
+    # 名义速度(直行指令60)的1.5倍时间内没跑完算超时
+    max_time = distance / (60 * SPEED_SCALE) * 1.5 if max_time is None else max_time
+    rng = np.random.default_rng(seed)
+
+    y = np.zeros(n)           # 横向误差(cm)，车道中线左侧为正
+    psi = np.zeros(n)         # 相对车道方向的航向角，向左为正
+    s = np.zeros(n)           # 行驶距离
+    left = np.zeros(n)
+    right = np.zeros(n)
+    active = np.ones(n, dtype=bool)
+    failed = np.zeros(n, dtype=bool)
+    finish = np.full(n, np.nan)
+    error_sum = np.zeros(n)
+    smooth_sum = np.zeros(n)
+    saturated = np.zeros(n)
+    steps = np.zeros(n)
+    last_steer = None
+    checked = {i: ([], [], []) for i in (check or ())}
+
+    for step in range(int(math.ceil(max_time * rate))):
+        # 摄像头: 车前LOOKAHEAD_CM处车道中线的横向位置(小车坐标系，左侧为正)
+        k = curvature[(s / spacing).astype(np.intp) % len(curvature)]
+        lateral = -LOOKAHEAD_CM * np.sin(psi) + (k * LOOKAHEAD_CM ** 2 / 2 - y) * np.cos(psi)
+        offsets = np.round(lateral * PX_PER_CM + rng.normal(0, noise) if noise else lateral * PX_PER_CM)
+        # 车道中线跑出画面时检测不到，与出界一样算失败
+        failed |= active & ((np.abs(y) > LANE_WIDTH / 2) | (np.abs(offsets) >= settings['center']))
+        active &= ~failed
+
+        bank.SystemOutput = offsets
+        bank.SetStepSignal(0)
+        bank.SetInertiaTime(settings['inertia'] if inertia is None else inertia, settings['sample'])
+        # PID_Turn里的限幅只作用于本次输出，LastSystemOutput保留限幅前的值
+        output = np.clip(bank.SystemOutput, -limit, limit)
+        bank.SystemOutput = output
+        turn = np.trunc(output)
+        command_left, command_right = commands(offsets, turn)
+        for i, (trace_offsets, trace_output, trace_commands) in checked.items():
+            if active[i]:
+                trace_offsets.append(offsets[i])
+                trace_output.append(output[i])
+                trace_commands.append((command_left[i], command_right[i]))
+
+        steer = (command_left - command_right) / 2
+        error_sum += np.where(active, y * y, 0)
+        saturated += active & (np.abs(output) >= limit)
+        if last_steer is not None:
+            smooth_sum += np.where(active, (steer - last_steer) ** 2, 0)
+        last_steer = steer
+        steps += active
+
+        # 差速驱动运动学(车道坐标系)，与simulator.DiffDriveModel.step相同的分步积分
+        target_left = command_left * SPEED_SCALE
+        target_right = command_right * SPEED_SCALE
+        for _ in range(substeps):
+            left += alpha * (target_left - left)
+            right += alpha * (target_right - right)
+            v = (left + right) / 2
+            k = curvature[(s / spacing).astype(np.intp) % len(curvature)]
+            y += v * np.sin(psi) * h
+            psi += ((right - left) / WHEEL_BASE - v * np.cos(psi) * k) * h
+            s += v * np.cos(psi) * h
+
+        done = active & (s >= distance)
+        finish[done] = (step + 1) * dt
+        active &= ~done
+        if not active.any():
+            break
+
+    error = np.sqrt(error_sum / np.maximum(steps, 1))
+    ok = ~failed & ~np.isnan(finish)
+    error = np.where(ok, error, np.inf)
+    smoothness = np.sqrt(smooth_sum / np.maximum(steps - 1, 1))
+    traces = {i: tuple(np.array(x, dtype=np.float64) for x in trace) for i, trace in checked.items()}
+    return {
+        'error': error,
+        'smoothness': smoothness,
+        'saturated': saturated / np.maximum(steps, 1),
+        'time': finish,
+        'score': error + smooth_weight * smoothness,
+    }, traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vectorized closed-loop PID gain sweep")
+    parser.add_argument('recording', nargs='?', help='录制目录，不给时用模拟器的赛道')
+    parser.add_argument('--laps', type=int, default=1, help='模拟器赛道跑几圈')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='PID_Control')
+    parser.add_argument('--incremental', action='store_true', help='扫描IncrementalPID')
+    parser.add_argument('--kp', type=float, nargs='+', default=list(np.round(np.linspace(0, 2, 21), 3)))
+    parser.add_argument('--ki', type=float, nargs='+', default=[0, 0.001, 0.005, 0.01])
+    parser.add_argument('--kd', type=float, nargs='+', default=list(np.round(np.linspace(0, 2, 11), 3)))
+    parser.add_argument('--inertia', type=float, nargs='+', default=[0.01, 0.05, 0.1, 0.2, 0.4, 0.8])
+    parser.add_argument('--rate', type=float, default=30, help='控制频率(Hz)')
+    parser.add_argument('--noise', type=float, default=2.0, help='检测噪声的标准差(像素)')
+    parser.add_argument('--smooth-weight', type=float, default=0.05)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--verify', type=int, default=5, help='与标量版本逐步对比的组合数')
+    parser.add_argument('--output', help='全部结果写入CSV')
+    args = parser.parse_args()
+
+    road = recording_road(args.recording) if args.recording else track_road(args.laps)
+    profile = PROFILES[args.profile]
+
+    # 把当前使用的参数也放进网格，方便对比
+    default_kp, default_ki, default_kd = profile['gains']
+    kp = sorted(set(args.kp) | {default_kp})
+    ki = sorted(set(args.ki) | {default_ki})
+    kd = sorted(set(args.kd) | {default_kd})
+    inertia = sorted(set(args.inertia) | {profile['inertia']})
+    grid_kp, grid_ki, grid_kd, grid_inertia = make_grid(kp, ki, kd, inertia)
+    n = len(grid_kp)
+    current = int(np.flatnonzero((grid_kp == default_kp) & (grid_ki == default_ki) &
+                                 (grid_kd == default_kd) & (grid_inertia == profile['inertia']))[0])
+
+    rng = np.random.default_rng(0)
+    check = [current] + [int(i) for i in rng.choice(n, min(args.verify, n), replace=False)]
+    pid_class, bank_class = ((PID.IncrementalPID, pidbank.IncrementalPIDBank) if args.incremental
+                             else (PID.PositionalPID, pidbank.PositionalPIDBank))
+
+    print(f"道路 {road[2]:.0f} cm  参数组合 {n}  profile {args.profile}  {pid_class.__name__}  {args.rate:.0f} Hz")
+    start = time.perf_counter()
+    metrics, traces = sweep(road, grid_kp, grid_ki, grid_kd, grid_inertia, args.profile, args.rate, args.noise,
+                            args.smooth_weight, bank_class=bank_class, check=check)
+    elapsed = time.perf_counter() - start
+
+    # 当前参数: 同样的偏移量序列交给真实的PID_Turn，电机指令应该每一步都相同
+    if not args.incremental:
+        offsets, _, commands = traces[current]
+        expected = pid_turn_commands(args.profile, offsets, profile['gains'])
+        if not np.array_equal(expected, commands):
+            step = int(np.flatnonzero(np.any(expected != commands, axis=1))[0])
+            print(f"与{args.profile}.PID_Turn的电机指令不一致: 第{step}步 偏移量 {offsets[step]:.0f} "
+                  f"PID_Turn {tuple(expected[step])} 扫描 {tuple(commands[step])}")
+            return 1
+
+    # 与标量版本逐步对比，同时估计标量版本扫描全部组合的时间
+    start = time.perf_counter()
+    for i, (offsets, outputs, _) in traces.items():
+        expected = scalar_trace(offsets, grid_kp[i], grid_ki[i], grid_kd[i], grid_inertia[i], profile['sample'],
+                                profile['limit'], pid_class)
+        if not np.array_equal(expected, outputs):
+            print(f"与标量版本不一致: 组合{i} 最大差 {np.max(np.abs(expected - outputs))}")
+            return 1
+    scalar_each = (time.perf_counter() - start) / len(traces)
+    print(f"数组版本 {elapsed:.2f} s，标量版本估计 {scalar_each * n:.0f} s "
+          f"(只计PID，不含小车模型)，{len(traces)}组与标量版本逐步结果完全相同"
+          + ("，当前参数的电机指令与PID_Turn相同" if not args.incremental else ""))
+
+    order = np.argsort(metrics['score'], kind='stable')
+    rank = {int(i): r for r, i in enumerate(order)}
+    failed = int(np.count_nonzero(np.isinf(metrics['error'])))
+    print(f"出界、跟丢或没跑完的组合 {failed}/{n}")
+    print(f"{'rank':>5s} {'Kp':>6s} {'Ki':>6s} {'Kd':>6s} {'inertia':>7s} {'error cm':>8s} {'time s':>7s} "
+          f"{'smooth':>7s} {'satur':>6s} {'score':>7s}")
+    for i in list(order[:args.top]) + ([current] if rank[current] >= args.top else []):
+        mark = '  <- 当前' if i == current else ''
+        print(f"{rank[int(i)] + 1:5d} {grid_kp[i]:6.3f} {grid_ki[i]:6.3f} {grid_kd[i]:6.3f} {grid_inertia[i]:7.3f} "
+              f"{metrics['error'][i]:8.2f} {metrics['time'][i]:7.2f} {metrics['smoothness'][i]:7.2f} "
+              f"{metrics['saturated'][i]:6.1%} {metrics['score'][i]:7.2f}{mark}")
+
+    if args.output:
+        table = np.column_stack([grid_kp, grid_ki, grid_kd, grid_inertia, metrics['error'], metrics['time'],
+                                 metrics['smoothness'], metrics['saturated'], metrics['score']])
+        np.savetxt(args.output, table[order], delimiter=',', fmt='%.6g',
+                   header='kp,ki,kd,inertia,error,time,smoothness,saturated,score', comments='')
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""
+PID.IncrementalPID/PID.PositionalPID的数组版本
+
+与标量版本逐步计算完全相同(同样的运算顺序，float64)，
+参数和状态都是数组，一次可以计算成千上万组参数，用于离线扫描参数(pid_sweep.py)。
+单独放在这个模块里，PID.py不导入numpy，控制程序启动时不用多花约100ms。
+"""
+import numpy as np
+
+
+class IncrementalPIDBank:
+    def __init__(self, P, I, D):
+        self.Kp, self.Ki, self.Kd = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (P, I, D)))
+        shape = self.Kp.shape
+
+        self.PIDOutput = np.zeros(shape)
+        self.SystemOutput = np.zeros(shape)
+        self.LastSystemOutput = np.zeros(shape)
+
+        self.Error = np.zeros(shape)
+        self.LastError = np.zeros(shape)
+        self.LastLastError = np.zeros(shape)
+
+    def SetStepSignal(self,StepSignal):
+        self.Error = StepSignal - self.SystemOutput
+        IncrementValue = self.Kp * (self.Error - self.LastError) +\
+        self.Ki * self.Error +\
+        self.Kd * (self.Error - 2 * self.LastError + self.LastLastError)
+
+        self.PIDOutput = self.PIDOutput + IncrementValue
+        self.LastLastError = self.LastError
+        self.LastError = self.Error
+
+    #InertiaTime、SampleTime可以是与参数同形状的数组
+    def SetInertiaTime(self,InertiaTime,SampleTime):
+        self.SystemOutput = (InertiaTime * self.LastSystemOutput + \
+            SampleTime * self.PIDOutput) / (SampleTime + InertiaTime)
+
+        self.LastSystemOutput = self.SystemOutput
+
+class PositionalPIDBank:
+    def __init__(self, P, I, D):
+        self.Kp, self.Ki, self.Kd = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (P, I, D)))
+        shape = self.Kp.shape
+
+        self.SystemOutput = np.zeros(shape)
+        self.LastSystemOutput = np.zeros(shape)
+        self.PidOutput = np.zeros(shape)
+        self.PIDErrADD = np.zeros(shape)
+        self.LastError = np.zeros(shape)
+
+    def SetStepSignal(self,StepSignal):
+        Error = StepSignal - self.SystemOutput
+        self.PidOutput = self.Kp * Error + self.Ki * self.PIDErrADD + self.Kd * (Error - self.LastError)
+        #误差累加限幅与标量版本相同：先限上限2000，再限下限-2500
+        self.PIDErrADD = np.maximum(np.minimum(self.PIDErrADD + Error, 2000), -2500)
+        self.LastError = Error
+
+    #InertiaTime、SampleTime可以是与参数同形状的数组
+    def SetInertiaTime(self, InertiaTime,SampleTime):
+        self.SystemOutput = (InertiaTime * self.LastSystemOutput + \
+            SampleTime * self.PidOutput) / (SampleTime + InertiaTime)
+
+        self.LastSystemOutput = self.SystemOutput
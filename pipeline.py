@@ -0,0 +1,293 @@
+"""
+多进程流水线：采集+逆透视、中线检测、控制/I2C分别在不同进程
+
+进程之间用multiprocessing.shared_memory上的环形缓冲区(SharedFrameRing)传递数据，
+每个槽是固定大小的数组，帧直接复制进共享内存，不经过pickle。
+每个槽带序号，读的一方复制出来后再检查序号，被写入方覆盖的读取作废(计入torn)。
+
+    采集进程   source.capture_array() -> RoiPreprocessor.process() -> roi环
+    检测进程   roi环 -> detect(roi) -> 结果环(帧序号, center_x)
+    控制进程   结果环 -> steer(center_x)  (主进程，持有Car，用runtime.LaneFollowerRuntime按固定频率运行)
+
+子进程里的对象由工厂函数创建(摄像头、检测器不能在进程间传递)，工厂函数需要能被pickle，
+可以用模块级函数或functools.partial，例如 functools.partial(replay_source, fps=30)。
+"""
+import functools
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import image
+
+ROI_SHAPE = (image.ROI_BOTTOM - image.ROI_TOP, image.ROI_RIGHT - image.ROI_LEFT)
+
+
+class SharedFrameRing:
+    """
+    共享内存中的环形帧缓冲区，一个写进程，任意个读进程
+    布局: latest(int64) | 每槽序号(int64) | 每槽时间戳(float64) | 帧数据
+    :param name: None时新建，否则连接到已有的共享内存(子进程用attach)
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        header = 8 * (1 + 2 * slots)
+        frames_offset = (header + 63) // 64 * 64
+        size = frames_offset + slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+
+        buf = self.shm.buf
+        self.latest = np.ndarray((1,), np.int64, buf, 0)
+        self.seqs = np.ndarray((slots,), np.int64, buf, 8)
+        self.timestamps = np.ndarray((slots,), np.float64, buf, 8 + 8 * slots)
+        self.frames = np.ndarray((slots,) + self.shape, self.dtype, buf, frames_offset)
+        if self.owner:
+            self.latest[0] = -1
+            self.seqs[:] = -1
+
+    def spec(self):
+        """传给子进程的参数，子进程用SharedFrameRing.attach(spec)连接"""
+        return self.shape, self.dtype.str, self.slots, self.shm.name
+
+    @classmethod
+    def attach(cls, spec):
+        shape, dtype, slots, name = spec
+        return cls(shape, dtype, slots, name)
+
+    def write(self, frame, timestamp):
+        """
+        写入一帧并发布(只能有一个写进程)
+        :return: 帧序号
+        """
+        seq = int(self.latest[0]) + 1
+        slot = seq % self.slots
+        # 先把槽标记为正在写，复制完再写入序号，读的一方据此判断是否被覆盖
+        self.seqs[slot] = -1
+        np.copyto(self.frames[slot], frame)
+        self.timestamps[slot] = timestamp
+        self.seqs[slot] = seq
+        self.latest[0] = seq
+        return seq
+
+    def read(self, out, after=-1):
+        """
+        把最新一帧复制到out
+        :param after: 只读序号大于after的帧
+        :return: (seq, timestamp)；没有新帧返回(None, None)，复制时被覆盖返回(-1, None)
+        """
+        seq = int(self.latest[0])
+        if seq <= after:
+            return None, None
+        slot = seq % self.slots
+        np.copyto(out, self.frames[slot])
+        timestamp = float(self.timestamps[slot])
+        if self.seqs[slot] != seq:
+            return -1, None
+        return seq, timestamp
+
+    def close(self):
+        # 先释放指向共享内存的数组，否则close()会报BufferError
+        self.latest = self.seqs = self.timestamps = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def camera_source():
+    import Camera
+    return Camera.init_camera()
+
+
+def replay_source(pattern="results/*.jpg", fps=30):
+    import Camera
+    return Camera.ImageFolderSource(pattern, fps=fps)
+
+
+def default_preprocessor(adaptive=False):
+    """
+    :param adaptive: True时用image.AdaptiveThreshold代替固定阈值
+    """
+    import Camera
+    # 结果马上复制进共享内存，中间图像可以复用池里的缓冲区
+    threshold = image.AdaptiveThreshold() if adaptive else 90
+    # 逆透视映射表在启动时计算，不用等到第一帧
+    mapper = image.PerspectiveMapper()
+    mapper.get_maps(Camera.image_width, Camera.image_height)
+    return image.RoiPreprocessor(mapper, threshold=threshold, pool=image.BufferPool())
+
+
+def lcl2_detector(binary_edges=False):
+    import LCL2
+    calculator = LCL2.FastLaneCalculator(ROI_SHAPE[1], ROI_SHAPE[0], binary_edges=binary_edges)
+
+    def detect(roi):
+        result = calculator.calculate_lane_center(roi)
+        return result.center_x if result.detected else None
+    return detect
+
+
+def ctype_detector():
+    from ctype import LaneDetector
+    detector = LaneDetector()
+
+    def detect(roi):
+        result = detector.detect(roi)
+        return None if result is None else result.center_x
+    return detect
+
+
+def _publish(ring, cond, frame, timestamp):
+    ring.write(frame, timestamp)
+    with cond:
+        cond.notify_all()
+
+
+def _wait(ring, cond, after, stop, timeout=0.1):
+    with cond:
+        cond.wait_for(lambda: ring.latest[0] > after or stop.is_set(), timeout)
+
+
+def _capture_main(source_factory, preprocessor_factory, roi_spec, roi_cond, stop, counters):
+    roi_ring = SharedFrameRing.attach(roi_spec)
+    source = source_factory()
+    preprocessor = preprocessor_factory()
+    try:
+        while not stop.is_set():
+            try:
+                frame = source.capture_array()
+            except EOFError:
+                break
+            timestamp = time.monotonic()
+            _publish(roi_ring, roi_cond, preprocessor.process(frame), timestamp)
+            counters[0] += 1
+    finally:
+        stop_source = getattr(source, 'stop', None)
+        if stop_source:
+            stop_source()
+        roi_ring.close()
+
+
+def _detect_main(detector_factory, roi_spec, roi_cond, result_spec, result_cond, stop, counters):
+    roi_ring = SharedFrameRing.attach(roi_spec)
+    result_ring = SharedFrameRing.attach(result_spec)
+    detect = detector_factory()
+    roi = np.empty(roi_ring.shape, roi_ring.dtype)
+    result = np.empty(result_ring.shape, result_ring.dtype)
+    last = -1
+    try:
+        while not stop.is_set():
+            _wait(roi_ring, roi_cond, last, stop)
+            seq, timestamp = roi_ring.read(roi, last)
+            if seq is None:
+                continue
+            if seq < 0:
+                counters[2] += 1
+                continue
+            last = seq
+            center_x = detect(roi)
+            result[0] = seq
+            result[1] = -1 if center_x is None else center_x
+            _publish(result_ring, result_cond, result, timestamp)
+            counters[1] += 1
+    finally:
+        roi_ring.close()
+        result_ring.close()
+
+
+class ProcessPipeline:
+    """
+    :param source_factory: 在采集进程里调用，返回有capture_array()的对象，默认打开摄像头
+    :param detector_factory: 在检测进程里调用，返回 roi -> center_x或None 的函数
+    :param preprocessor_factory: 在采集进程里调用，返回有process(frame)的对象
+    :param slots: 每个环形缓冲区的槽数
+    """
+
+    def __init__(self, source_factory=camera_source, detector_factory=lcl2_detector,
+                 preprocessor_factory=default_preprocessor, roi_shape=ROI_SHAPE, slots=4):
+        self.roi_ring = SharedFrameRing(roi_shape, np.uint8, slots)
+        # 结果: (roi帧序号, center_x)，center_x为-1表示没检测到
+        self.result_ring = SharedFrameRing((2,), np.int64, slots)
+        self.roi_cond = mp.Condition()
+        self.result_cond = mp.Condition()
+        self.stop_event = mp.Event()
+        # 采集帧数、检测帧数、检测进程读到被覆盖的帧数
+        self.counters = mp.Array('q', 3, lock=False)
+
+        self.processes = [
+            mp.Process(target=_capture_main, name="capture", daemon=True,
+                       args=(source_factory, preprocessor_factory, self.roi_ring.spec(), self.roi_cond,
+                             self.stop_event, self.counters)),
+            mp.Process(target=_detect_main, name="detect", daemon=True,
+                       args=(detector_factory, self.roi_ring.spec(), self.roi_cond, self.result_ring.spec(),
+                             self.result_cond, self.stop_event, self.counters)),
+        ]
+        self._result = np.empty(2, np.int64)
+        self._last = -1
+        self.received = 0    # 控制进程取到的结果数
+        self.skipped = 0     # 控制进程没来得及取就被新结果覆盖的结果数
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for cond in (self.roi_cond, self.result_cond):
+            with cond:
+                cond.notify_all()
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.roi_ring.close()
+        self.result_ring.close()
+
+    def read(self, timeout=None):
+        """
+        取最新的检测结果，没有新结果时等待，接口与Camera.FrameGrabber.read相同
+        :return: (center_x, timestamp, frame_seq)，center_x为-1表示没检测到；超时返回(None, None, None)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq, timestamp = self.result_ring.read(self._result, self._last)
+            if seq is not None and seq >= 0:
+                self.skipped += seq - self._last - 1
+                self._last = seq
+                self.received += 1
+                return int(self._result[1]), timestamp, int(self._result[0])
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if (remaining is not None and remaining <= 0) or self.stop_event.is_set():
+                return None, None, None
+            with self.result_cond:
+                self.result_cond.wait_for(lambda: self.result_ring.latest[0] > self._last,
+                                          0.1 if remaining is None else min(remaining, 0.1))
+
+    def stats(self):
+        return {
+            'captured': self.counters[0],
+            'detected': self.counters[1],
+            'torn': self.counters[2],
+            'received': self.received,
+            'skipped': self.skipped,
+        }
+
+
+def detect_result(center_x):
+    """ProcessPipeline.read返回的center_x转换为LaneFollowerRuntime的检测结果"""
+    return None if center_x < 0 else center_x
+
+
+def make_runtime(pipeline, steer, car, rate=30, **kwargs):
+    """
+    在主进程里按固定频率取检测结果并转向，预处理和检测已在子进程完成
+    :return: runtime.LaneFollowerRuntime
+    """
+    from runtime import LaneFollowerRuntime
+    return LaneFollowerRuntime(functools.partial(pipeline.read, timeout=0.5), lambda center_x: center_x,
+                               detect_result, steer, car, rate=rate, cleanup=[pipeline.stop], **kwargs)
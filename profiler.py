@@ -0,0 +1,208 @@
+"""
+运行中按信号开关的采样分析器
+
+小车在赛道上圈速变慢时没法接调试器。SamplingProfiler.install()注册信号:
+    kill -USR1 <pid>    开始采样
+    kill -USR2 <pid>    停止采样并写出结果
+采样在单独的线程里进行: 每隔interval秒用sys._current_frames()取一次被采样线程(默认主线程)的调用栈，
+控制循环和电机不停。信号处理函数只设置标志、启动线程；停止后由单独的写线程写文件，
+采样线程马上退出，写文件的同时就可以开始下一次采样。
+没在采样时只有两个信号处理函数，没有任何额外开销。
+
+每次采样写出两个文件(output_dir下，按开始时间命名):
+    profile-<时间>.folded   折叠栈，每行"模块.函数;模块.函数;... 次数"，根在前，
+                            可以直接给flamegraph.pl或speedscope
+    profile-<时间>.txt      按自身采样数和累计采样数排序的前top个函数
+
+也可以在代码里使用:
+    with SamplingProfiler(output_dir='profiles'):
+        runtime.run()
+"""
+import argparse
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame):
+    """调用栈 -> 根在前的函数名元组"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+
+class SamplingProfiler:
+    """
+    :param interval: 采样间隔(秒)
+    :param output_dir: 结果目录，不存在时创建
+    :param top: 摘要里列出的函数数
+    :param all_threads: 为True时采样所有线程(线程名作为栈的根)，否则只采样创建时所在的线程
+    """
+
+    def __init__(self, interval=0.005, output_dir='profiles', top=20, all_threads=False):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.top = top
+        self.all_threads = all_threads
+        self.target = threading.get_ident()
+
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started = None
+        self.last_paths = None      # 最近一次写出的(.folded, .txt)
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._writer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop(wait=True)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def install(self, start_signal=getattr(signal, 'SIGUSR1', None), stop_signal=getattr(signal, 'SIGUSR2', None)):
+        """注册开始/停止信号(Windows没有SIGUSR1/SIGUSR2，什么都不做)，只能在主线程调用"""
+        if start_signal is None or stop_signal is None:
+            return self
+        signal.signal(start_signal, lambda signum, stack: self.start())
+        signal.signal(stop_signal, lambda signum, stack: self.stop())
+        return self
+
+    def start(self):
+        """开始采样，已经在采样时打印一行提示，返回False"""
+        if self.running:
+            print("采样分析器已经在采样，忽略这次开始")
+            return False
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, wait=False):
+        """
+        停止采样，结果由写线程写出
+        :param wait: 为True时等结果写完，包括之前还没写完的结果(信号处理函数里不等，不阻塞控制循环)
+        :return: 这次调用是否停止了正在进行的采样
+        """
+        running = self.running
+        if running:
+            self._stop.set()
+        if wait:
+            if running:
+                self._thread.join()
+            if self._writer is not None:
+                self._writer.join()
+        return running
+
+    def sample(self):
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        if self.all_threads:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident != own:
+                    self.stacks[(names.get(ident, str(ident)),) + collapse(frame)] += 1
+        else:
+            frame = frames.get(self.target)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+        self.samples += 1
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_time += self.interval
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                # 采样跟不上时不补采
+                next_time = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+        # start()会换新的Counter，写线程拿的是这次采样的结果
+        previous = self._writer
+        self._writer = threading.Thread(target=self._write, args=(previous, self.stacks, self.samples, self.started),
+                                        name='SamplingProfilerWriter', daemon=True)
+        self._writer.start()
+
+    def _write(self, previous, stacks, samples, started):
+        # 按采样的先后顺序写，last_paths总是最近一次的结果
+        if previous is not None:
+            previous.join()
+        self.last_paths = self.write(stacks, samples, started)
+
+    def write(self, stacks=None, samples=None, started=None):
+        """写出折叠栈和摘要(默认是当前的结果)，返回两个文件的路径"""
+        stacks = self.stacks if stacks is None else stacks
+        started = self.started if started is None else started
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = time.strftime('profile-%Y%m%d-%H%M%S', time.localtime(started))
+        base = os.path.join(self.output_dir, f"{name}-{int(started * 1000) % 1000:03d}")
+        folded = base + '.folded'
+        with open(folded, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(';'.join(stack) + f' {count}\n')
+        summary = base + '.txt'
+        with open(summary, 'w') as f:
+            f.write(self.summary(stacks, samples))
+        return folded, summary
+
+    def summary(self, stacks=None, samples=None):
+        """按自身采样数(栈顶)和累计采样数(出现在栈里，递归只算一次)排序的前top个函数"""
+        stacks = self.stacks if stacks is None else stacks
+        samples = self.samples if samples is None else samples
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        n = max(sum(stacks.values()), 1)
+        lines = [f"{samples}次采样，{len(stacks)}种调用栈", ""]
+        for title, counter in (("自身", own), ("累计", total)):
+            lines.append(f"{title:4s} {'采样数':>8s} {'占比':>7s}  函数")
+            for name, count in counter.most_common(self.top):
+                lines.append(f"     {count:8d} {count / n:7.1%}  {name}")
+            lines.append("")
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="summarise a collapsed-stack profile")
+    parser.add_argument('path', help='profile-*.folded')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    profiler = SamplingProfiler(top=args.top)
+    with open(args.path) as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            profiler.stacks[tuple(stack.split(';'))] += int(count)
+    profiler.samples = sum(profiler.stacks.values())
+    print(profiler.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
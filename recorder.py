@@ -0,0 +1,242 @@
+"""
+原始帧录制与回放
+
+录制目录结构:
+    meta.json              帧尺寸、类型、每块帧数、总帧数
+    frames_00000.npy ...   每块chunk_frames帧的原始图像，np.lib.format.open_memmap创建
+    records_00000.npy ...  对应的每帧记录(RECORD_DTYPE)
+
+录制在控制线程里只把图像复制到预先分配的暂存缓冲区，写盘由后台线程完成，
+暂存区满时丢弃该帧并计数，不会阻塞控制循环。回放用内存映射读取，不需要解码JPEG。
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# 每帧记录：采集时间、帧序号、中线x坐标(-1表示没检测到)、发给电机的左右轮速度
+RECORD_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('seq', np.int64),
+    ('center_x', np.int32),
+    ('left_speed', np.int16),
+    ('right_speed', np.int16),
+    ('valid', np.uint8),
+])
+
+
+def chunk_paths(path, index):
+    return (os.path.join(path, 'frames_%05d.npy' % index),
+            os.path.join(path, 'records_%05d.npy' % index))
+
+
+class FrameRecorder:
+    """
+    在实时循环中录制原始帧，record()只做一次内存复制，写盘在后台线程
+    """
+
+    def __init__(self, path, chunk_frames=256, queue_frames=8):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.queue_frames = queue_frames
+        os.makedirs(path, exist_ok=True)
+
+        self.recorded = 0      # 已写入的帧数
+        self.dropped = 0       # 暂存区满被丢弃的帧数
+
+        self._staging = None
+        self._records = np.zeros(queue_frames, dtype=RECORD_DTYPE)
+        self._free = queue.Queue()
+        self._pending = queue.Queue()
+        for slot in range(queue_frames):
+            self._free.put(slot)
+
+        self._frame_shape = None
+        self._frame_dtype = None
+        self._chunk = -1
+        self._frames_map = None
+        self._records_map = None
+        self._thread = threading.Thread(target=self._run, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def record(self, frame, timestamp=None, center_x=None, command=(0, 0), seq=-1):
+        """
+        记录一帧，不阻塞
+        :param frame: 原始图像
+        :param timestamp: 采集时间(time.monotonic())，None时取当前时间
+        :param center_x: 检测到的中线x坐标，None表示没检测到
+        :param command: 发给电机的(左轮速度, 右轮速度)
+        :return: 是否放入了写盘队列
+        """
+        if self._staging is None:
+            self._frame_shape = frame.shape
+            self._frame_dtype = frame.dtype
+            self._staging = np.empty((self.queue_frames,) + frame.shape, dtype=frame.dtype)
+        elif frame.shape != self._frame_shape:
+            self.dropped += 1
+            return False
+
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+
+        np.copyto(self._staging[slot], frame)
+        record = self._records[slot]
+        record['timestamp'] = time.monotonic() if timestamp is None else timestamp
+        record['seq'] = seq
+        record['center_x'] = -1 if center_x is None else center_x
+        record['left_speed'], record['right_speed'] = command
+        record['valid'] = 1
+        self._pending.put(slot)
+        return True
+
+    def close(self):
+        """写完队列中剩余的帧并关闭文件"""
+        self._pending.put(None)
+        self._thread.join()
+
+    def _open_chunk(self, index):
+        frames_path, records_path = chunk_paths(self.path, index)
+        self._frames_map = np.lib.format.open_memmap(
+            frames_path, mode='w+', dtype=self._frame_dtype, shape=(self.chunk_frames,) + self._frame_shape)
+        self._records_map = np.lib.format.open_memmap(
+            records_path, mode='w+', dtype=RECORD_DTYPE, shape=(self.chunk_frames,))
+        self._chunk = index
+
+    def _flush_chunk(self):
+        if self._frames_map is not None:
+            self._frames_map.flush()
+            self._records_map.flush()
+
+    def _write_meta(self):
+        meta = {
+            'frame_shape': list(self._frame_shape) if self._frame_shape else None,
+            'frame_dtype': str(self._frame_dtype) if self._frame_dtype else None,
+            'chunk_frames': self.chunk_frames,
+            'frames': self.recorded,
+            'dropped': self.dropped,
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def _run(self):
+        while True:
+            slot = self._pending.get()
+            if slot is None:
+                break
+
+            index, offset = divmod(self.recorded, self.chunk_frames)
+            if index != self._chunk:
+                self._flush_chunk()
+                self._open_chunk(index)
+                self._write_meta()
+
+            self._frames_map[offset] = self._staging[slot]
+            self._records_map[offset] = self._records[slot]
+            self.recorded += 1
+            self._free.put(slot)
+
+        self._flush_chunk()
+        self._frames_map = self._records_map = None
+        self._write_meta()
+
+
+class Recording:
+    """
+    以内存映射方式读取FrameRecorder录制的目录
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.chunk_frames = self.meta['chunk_frames']
+
+        self.frames = []
+        self.records = []
+        index = 0
+        while True:
+            frames_path, records_path = chunk_paths(path, index)
+            if not os.path.exists(frames_path):
+                break
+            self.frames.append(np.load(frames_path, mmap_mode='r'))
+            self.records.append(np.load(records_path, mmap_mode='r'))
+            index += 1
+
+        # 程序异常退出时meta.json里的帧数可能偏小，以valid标记为准
+        self.length = 0
+        if self.records:
+            self.length = (len(self.records) - 1) * self.chunk_frames + int(np.count_nonzero(self.records[-1]['valid']))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        """
+        :return: (frame, record)，frame是只读的内存映射视图
+        """
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        index, offset = divmod(i, self.chunk_frames)
+        return self.frames[index][offset], self.records[index][offset]
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    def all_records(self):
+        """所有帧的记录拼接成一个数组"""
+        if not self.records:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.concatenate(self.records)[:self.length]
+
+
+class RecordingSource:
+    """
+    把录制的帧当作摄像头回放，接口与Picamera2的capture_array相同，可以传给Camera.FrameGrabber
+    :param realtime: True按录制时的时间间隔回放，False全速回放
+    """
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.recording = path if isinstance(path, Recording) else Recording(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.index = 0
+        self.start_time = None
+        self.start_stamp = None
+        self.record = None
+
+    def capture_array(self):
+        if self.index >= len(self.recording):
+            if not self.loop or not len(self.recording):
+                raise EOFError("回放结束")
+            self.index = 0
+            self.start_time = None
+
+        frame, record = self.recording[self.index]
+        self.index += 1
+        self.record = record
+
+        if self.realtime:
+            now = time.monotonic()
+            if self.start_time is None:
+                self.start_time, self.start_stamp = now, record['timestamp']
+            delay = (record['timestamp'] - self.start_stamp) - (now - self.start_time)
+            if delay > 0:
+                time.sleep(delay)
+
+        # 直接返回内存映射的只读视图，不复制
+        return np.asarray(frame)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,80 @@
+"""
+回放FrameRecorder录制的数据，按实际流程跑 预处理 -> 车道检测，统计速度并与录制时的center_x对比
+
+用法: python replay.py <录制目录> [--detector lcl2|ctype] [--realtime]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import image
+import recorder
+
+
+def make_detector(name):
+    """返回 detect(roi) -> center_x或None"""
+    if name == 'ctype':
+        from ctype import LaneDetector
+        detector = LaneDetector()
+
+        def detect(roi):
+            result = detector.detect(roi)
+            return None if result is None else result.center_x
+    else:
+        import LCL2
+        calculator = LCL2.FastLaneCalculator(image.ROI_RIGHT - image.ROI_LEFT, image.ROI_BOTTOM - image.ROI_TOP)
+
+        def detect(roi):
+            result = calculator.calculate_lane_center(roi)
+            return result.center_x if result.detected else None
+    return detect
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay a recording through the pipeline")
+    parser.add_argument("path", help="FrameRecorder录制目录")
+    parser.add_argument("--detector", choices=["lcl2", "ctype"], default="lcl2")
+    parser.add_argument("--realtime", action="store_true", help="按录制时的节奏回放")
+    args = parser.parse_args()
+
+    source = recorder.RecordingSource(args.path, realtime=args.realtime)
+    preprocessor = image.RoiPreprocessor()
+    detect = make_detector(args.detector)
+
+    preprocess_times = []
+    detect_times = []
+    mismatches = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            frame = source.capture_array()
+        except EOFError:
+            break
+        t0 = time.perf_counter()
+        roi = preprocessor.process(frame)
+        t1 = time.perf_counter()
+        center_x = detect(roi)
+        t2 = time.perf_counter()
+        preprocess_times.append(t1 - t0)
+        detect_times.append(t2 - t1)
+
+        recorded = int(source.record['center_x'])
+        if (center_x if center_x is not None else -1) != recorded:
+            mismatches += 1
+    elapsed = time.perf_counter() - start
+
+    n = len(preprocess_times)
+    if not n:
+        print("录制为空")
+        return 1
+    print(f"帧数 {n}，用时 {elapsed:.2f} s，{n / elapsed:.1f} fps")
+    for name, times in (("预处理", preprocess_times), ("检测", detect_times)):
+        ms = np.array(times) * 1e3
+        print(f"{name}: p50 {np.percentile(ms, 50):.3f} ms  p99 {np.percentile(ms, 99):.3f} ms  max {ms.max():.3f} ms")
+    print(f"与录制的center_x不一致: {mismatches}/{n}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,211 @@
+"""
+固定频率的循迹控制循环
+
+每个周期: 取帧 -> 预处理 -> 中线检测 -> 转向控制，按目标频率运行，
+统计超时和周期抖动。周期超过截止时间时不再用过期的结果转向，改发安全指令(停车或保持)。
+各阶段都通过参数注入，不接摄像头和小车也能运行(见文件末尾的示例)。
+"""
+import time
+
+import numpy as np
+
+import telemetry as tlm
+
+
+class LaneFollowerRuntime:
+    """
+    :param read_frame: 无参数，返回(frame, timestamp, seq)，例如Camera.FrameGrabber.read；frame为None表示没取到
+    :param preprocess: frame -> roi
+    :param detect: roi -> center_x，没检测到车道返回None
+    :param steer: center_x -> None或(offset, pid_output)，发出电机指令，例如 lambda x: PID_Control.PID_Turn(x, 320)
+    :param car: Car对象，用于安全指令和退出时停车
+    :param rate: 目标频率(Hz)
+    :param on_miss: 周期超时时的安全指令，'stop'停车，'hold'保持上一条指令
+    :param on_cycle: 每个周期结束时调用 on_cycle(frame, timestamp, seq, roi, center_x)，返回True时退出循环
+    :param cleanup: 退出时依次调用的函数(摄像头stop等)，在停车之后执行
+    :param window: 统计周期时间用的样本数
+    :param timers: latency.StageTimers，给出时统计各阶段耗时(capture/preprocess/detect/steer/cycle)
+    :param telemetry: telemetry.TelemetryRing，给出时每个周期写一条记录(状态、偏移量、PID输出、电机指令、错误码)
+    :param steer_timestamp: 为True时调用steer(center_x, timestamp)，timestamp是帧的采集时间，
+                            用于按真实间隔计算PID(PID.TimedPID)
+    """
+
+    def __init__(self, read_frame, preprocess, detect, steer, car, rate=30, on_miss='stop',
+                 on_cycle=None, cleanup=(), window=512, timers=None, telemetry=None, steer_timestamp=False):
+        if on_miss not in ('stop', 'hold'):
+            raise ValueError("on_miss must be 'stop' or 'hold'")
+        self.timers = timers if timers is not None and timers.enabled else None
+        if self.timers:
+            read_frame = self.timers.wrap('capture', read_frame)
+            preprocess = self.timers.wrap('preprocess', preprocess)
+            detect = self.timers.wrap('detect', detect)
+            steer = self.timers.wrap('steer', steer)
+        self.read_frame = read_frame
+        self.preprocess = preprocess
+        self.detect = detect
+        self.steer = steer
+        self.steer_timestamp = steer_timestamp
+        self.car = car
+        self.period = 1.0 / rate
+        self.on_miss = on_miss
+        self.on_cycle = on_cycle
+        self.cleanup = list(cleanup)
+        self.telemetry = telemetry
+        self._error_count = getattr(car, 'error_count', None)
+        self._errors_seen = 0
+
+        self.cycles = 0          # 运行的周期数
+        self.overruns = 0        # 处理时间超过一个周期的次数
+        self.misses = 0          # 因超时或没取到帧而发安全指令的次数
+        self.lost = 0            # 没检测到车道的次数
+        self._busy = np.zeros(window)      # 每周期处理耗时
+        self._intervals = np.zeros(window)  # 相邻两周期开始时间的间隔
+        self._running = False
+
+    def safe_command(self):
+        if self.on_miss == 'stop':
+            self.car.Car_Stop()
+
+    def run_cycle(self, deadline):
+        """运行一个周期，deadline之后才得到的结果不再用于转向"""
+        frame, timestamp, seq = self.read_frame()
+        if frame is None:
+            self.misses += 1
+            self.safe_command()
+            if self.telemetry:
+                self.log(time.monotonic(), -1, tlm.STATUS_NO_FRAME, None, deadline)
+            return False
+        if self.timers:
+            self.timers.mark_frame(timestamp)
+
+        roi = self.preprocess(frame)
+        center_x = self.detect(roi)
+
+        steered = None
+        if time.monotonic() > deadline:
+            self.misses += 1
+            self.safe_command()
+            status = tlm.STATUS_LATE
+        elif center_x is None:
+            self.lost += 1
+            self.car.Car_Stop()
+            status = tlm.STATUS_LOST
+        else:
+            steered = self.steer(center_x, timestamp) if self.steer_timestamp else self.steer(center_x)
+            status = tlm.STATUS_OK
+        if self.telemetry:
+            self.log(timestamp, seq, status, steered, deadline)
+
+        if self.on_cycle is not None:
+            return bool(self.on_cycle(frame, timestamp, seq, roi, center_x))
+        return False
+
+    def log(self, timestamp, seq, status, steered, deadline):
+        """写一条遥测记录，steered是steer的返回值(offset, pid_output)或None"""
+        error = 0
+        if self._error_count is not None:
+            errors = self._error_count()
+            if errors != self._errors_seen:
+                error |= tlm.ERROR_I2C
+                self._errors_seen = errors
+        if time.monotonic() > deadline:
+            error |= tlm.ERROR_OVERRUN
+        offset, pid_output = steered if steered is not None else (0.0, 0.0)
+        left_speed, right_speed = self.car.last_command
+        self.telemetry.log(timestamp, seq, offset, pid_output, left_speed, right_speed, status, error)
+
+    def run(self, max_cycles=None):
+        """
+        按目标频率循环运行，直到on_cycle要求退出、stop()被调用、Ctrl+C或达到max_cycles
+        :return: stats()
+        """
+        self._running = True
+        next_start = time.monotonic()
+        last_start = None
+        try:
+            while self._running and (max_cycles is None or self.cycles < max_cycles):
+                start = time.monotonic()
+                deadline = next_start + self.period
+                stop = self.run_cycle(deadline)
+                end = time.monotonic()
+
+                if self.timers:
+                    self.timers.add('cycle', end - start)
+                i = self.cycles % len(self._busy)
+                self._busy[i] = end - start
+                self._intervals[i] = start - last_start if last_start is not None else self.period
+                last_start = start
+                self.cycles += 1
+                if stop:
+                    break
+
+                # 超时后从当前时间重新计时，不追赶落下的周期
+                if end > deadline:
+                    self.overruns += 1
+                    next_start = end
+                else:
+                    next_start = deadline
+                    time.sleep(next_start - end)
+        except KeyboardInterrupt:
+            print("程序中断")
+        finally:
+            self.close()
+        return self.stats()
+
+    def stop(self):
+        self._running = False
+
+    def close(self):
+        """停车并释放资源"""
+        self.car.Car_Stop()
+        if hasattr(self.car, 'close'):
+            self.car.close()
+        for func in self.cleanup:
+            func()
+
+    def stats(self):
+        n = min(self.cycles, len(self._busy))
+        busy = self._busy[:n] * 1e3
+        jitter = np.abs(self._intervals[:n] - self.period) * 1e3
+        return {
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'misses': self.misses,
+            'lost': self.lost,
+            'busy_p50_ms': float(np.percentile(busy, 50)) if n else 0.0,
+            'busy_max_ms': float(busy.max()) if n else 0.0,
+            'jitter_p95_ms': float(np.percentile(jitter, 95)) if n else 0.0,
+            'jitter_max_ms': float(jitter.max()) if n else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # 不接硬件运行：回放results/*.jpg，小车换成FakeSMBus
+    import Camera
+    import image
+    import LCL2
+    from Car_Control import Car, FakeSMBus
+    from latency import StageTimers
+
+    timers = StageTimers()
+    source = Camera.ImageFolderSource(fps=60)
+    timers.patch(source, 'capture_array')
+    grabber = Camera.FrameGrabber(source).start()
+    car = Car(async_writes=True, device=FakeSMBus(delay=0.0006))
+    timers.instrument_car(car)
+    preprocessor = image.RoiPreprocessor()
+    calculator = LCL2.FastLaneCalculator(320, 96)
+
+    def detect(roi):
+        result = calculator.calculate_lane_center(roi)
+        return result.center_x if result.detected else None
+
+    def steer(center_x):
+        turn = int(np.clip((160 - center_x) * 0.5, -30, 30))
+        car.Dir_Car(60 - turn, 60 + turn)
+
+    runtime = LaneFollowerRuntime(lambda: grabber.read(timeout=0.1), preprocessor.process, detect, steer, car,
+                                  rate=30, cleanup=[grabber.stop], timers=timers)
+    print(runtime.run(max_cycles=90))
+    print(car._writer.stats())
+    print(timers.report())
@@ -0,0 +1,361 @@
+"""
+闭环模拟器：不接小车和摄像头，比实时快很多倍地跑完整的循迹控制
+
+    赛道      俯视的闭合车道(两条深色车道线)，预先画成一张大图
+    摄像头    按小车位姿把赛道渲染成320x240的RGB帧，透视关系与image.get_perspective_matrix()一致，
+              所以image.RoiPreprocessor逆透视后得到的正是小车前方的俯视图
+    控制      真实的 image + 检测器 + PID_Control/PID_Ctrl.PID_Turn，小车是接SimBus的Car_Control.Car
+    小车模型  差速驱动运动学模型，直接解码Car.Dir_Car写到总线上的(speed1, speed2)
+
+每一步按控制频率前进1/rate秒的模拟时间，统计车道保持误差、圈速和控制循环耗时，
+可以给出阈值作为回归测试: 超出阈值时返回1。
+
+默认用final.py实际使用的PID_Control，PID_Ctrl是example.py用的控制器。
+
+用法: python simulator.py [--controller PID_Control|PID_Ctrl] [--detector lcl2|ctype|tracker|bands]
+                         [--laps 1] [--max-error 10] [--max-lap-time 60]
+"""
+import argparse
+import collections
+import math
+import time
+
+import cv2
+import numpy as np
+
+import Camera
+import image
+from Car_Control import Car, FakeSMBus
+
+FLOOR = 200   # 地面灰度
+LINE = 30     # 车道线灰度
+
+
+class Track:
+    """
+    闭合赛道(操场跑道形)：两段长straight的直道，两端是半径radius的半圆弯道，单位cm，逆时针行驶
+    :param px_per_cm: 赛道大图的分辨率
+    """
+
+    def __init__(self, straight=300, radius=150, lane_width=40, line_width=2.5, px_per_cm=4, spacing=0.5):
+        self.lane_width = lane_width
+        self.px_per_cm = px_per_cm
+
+        # 每隔spacing厘米取一个中线点
+        s = np.arange(0, 2 * straight + 2 * np.pi * radius, spacing)
+        half = straight / 2
+        corner = np.pi * radius
+        points = np.empty((len(s), 2))
+        for i, d in enumerate(s):
+            if d < straight:
+                points[i] = (-half + d, -radius)
+            elif d < straight + corner:
+                a = -np.pi / 2 + (d - straight) / radius
+                points[i] = (half + radius * np.cos(a), radius * np.sin(a))
+            elif d < 2 * straight + corner:
+                points[i] = (half - (d - straight - corner), radius)
+            else:
+                a = np.pi / 2 + (d - 2 * straight - corner) / radius
+                points[i] = (-half + radius * np.cos(a), radius * np.sin(a))
+        self.center = points
+        step = np.roll(self.center, -1, axis=0) - self.center
+        self.heading = np.arctan2(step[:, 1], step[:, 0])
+        self.arc = np.concatenate([[0], np.cumsum(np.hypot(step[:, 0], step[:, 1]))])
+        self.length = self.arc[-1]
+
+        # 中线左右两侧各lane_width/2画车道线
+        normal = np.column_stack([-np.sin(self.heading), np.cos(self.heading)])
+        margin = lane_width + 40
+        self.origin = self.center.min(axis=0) - margin
+        size = np.ceil((self.center.max(axis=0) + margin - self.origin) * px_per_cm).astype(int)
+        self.map = np.full((size[1], size[0], 3), FLOOR, dtype=np.uint8)
+        for side in (-1, 1):
+            edge = (self.center + side * lane_width / 2 * normal - self.origin) * px_per_cm
+            cv2.polylines(self.map, [np.round(edge * 16).astype(np.int32)], True, (LINE, LINE, LINE),
+                          max(int(round(line_width * px_per_cm)), 1), cv2.LINE_AA, shift=4)
+
+        # 世界坐标(cm) -> 赛道大图像素
+        self.world_to_map = np.array([[px_per_cm, 0, -self.origin[0] * px_per_cm],
+                                      [0, px_per_cm, -self.origin[1] * px_per_cm],
+                                      [0, 0, 1]])
+
+    def start_pose(self):
+        return self.center[0, 0], self.center[0, 1], self.heading[0]
+
+    def locate(self, x, y, hint, search=200):
+        """
+        在hint附近找离(x, y)最近的中线点
+        :return: (下标, 横向误差cm，中线左侧为正)
+        """
+        index = (hint + np.arange(-search, search + 1)) % len(self.center)
+        d = self.center[index] - (x, y)
+        i = int(index[np.argmin(d[:, 0] ** 2 + d[:, 1] ** 2)])
+        h = self.heading[i]
+        dx, dy = x - self.center[i, 0], y - self.center[i, 1]
+        return i, -math.sin(h) * dx + math.cos(h) * dy
+
+
+class DiffDriveModel:
+    """
+    差速驱动运动学模型，电机对指令有一阶滞后
+    :param speed_scale: 每单位速度指令对应的轮速(cm/s)
+    :param wheel_base: 左右轮距(cm)
+    :param tau: 电机时间常数(s)
+    """
+
+    def __init__(self, x, y, heading, speed_scale=0.5, wheel_base=14, tau=0.1):
+        self.x, self.y, self.heading = x, y, heading
+        self.speed_scale = speed_scale
+        self.wheel_base = wheel_base
+        self.tau = tau
+        self.target = (0.0, 0.0)
+        self.left = self.right = 0.0
+
+    def command(self, speed1, speed2):
+        self.target = (speed1 * self.speed_scale, speed2 * self.speed_scale)
+
+    def step(self, dt, substeps=4):
+        h = dt / substeps
+        alpha = h / (self.tau + h)
+        for _ in range(substeps):
+            self.left += alpha * (self.target[0] - self.left)
+            self.right += alpha * (self.target[1] - self.right)
+            v = (self.left + self.right) / 2
+            w = (self.right - self.left) / self.wheel_base
+            self.x += v * math.cos(self.heading) * h
+            self.y += v * math.sin(self.heading) * h
+            self.heading += w * h
+
+    def speed(self):
+        return (self.left + self.right) / 2
+
+
+class SimBus(FakeSMBus):
+    """把Car写到总线上的电机指令转给小车模型(0x01: [L_dir, speed1, R_dir, speed2]，0x02: 停车)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def _transfer(self, reg, data):
+        self.transactions += 1
+        if reg == 0x01:
+            l_dir, speed1, r_dir, speed2 = data
+            self.model.command(speed1 if l_dir else -speed1, speed2 if r_dir else -speed2)
+        elif reg == 0x02:
+            self.model.command(0, 0)
+
+
+class SimCamera:
+    """
+    按小车位姿渲染摄像头画面
+    俯视图(逆透视后的图像)中第160列是小车正前方，最下一行在车前near_cm处，每厘米px_per_cm像素
+    """
+
+    def __init__(self, track, width=Camera.image_width, height=Camera.image_height, px_per_cm=4, near_cm=10):
+        self.track = track
+        self.size = (width, height)
+        self.px_per_cm = px_per_cm
+        self.near_cm = near_cm
+        # 摄像头像素 -> 俯视图像素
+        self.camera_to_birdseye = image.get_perspective_matrix()
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    def render(self, x, y, heading):
+        width, height = self.size
+        c, s = math.cos(heading), math.sin(heading)
+        # 俯视图像素 -> 小车坐标(前方forward, 左侧left) -> 世界坐标
+        forward = np.array([0, -1 / self.px_per_cm, self.near_cm + height / self.px_per_cm])
+        left = np.array([-1 / self.px_per_cm, 0, (width / 2) / self.px_per_cm])
+        birdseye_to_world = np.array([c * forward - s * left, s * forward + c * left, [0, 0, 1]])
+        birdseye_to_world[0, 2] += x
+        birdseye_to_world[1, 2] += y
+        H = self.track.world_to_map @ birdseye_to_world @ self.camera_to_birdseye
+        return cv2.warpPerspective(self.track.map, H, self.size, dst=self.frame,
+                                   flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=(FLOOR, FLOOR, FLOOR))
+
+
+def make_detector(name):
+    """roi -> center_x或None"""
+    if name == 'ctype':
+        from ctype import LaneDetector
+        detector = LaneDetector()
+
+        def detect(roi):
+            result = detector.detect(roi)
+            return None if result is None else result.center_x
+    elif name == 'bands':
+        from bandlane import BandLaneDetector
+        detect = BandLaneDetector().detect
+    elif name == 'tracker':
+        from tracker import LaneTracker
+        tracker = LaneTracker()
+
+        def detect(roi):
+            result = tracker.update(roi)
+            return None if result is None else result[2]
+    else:
+        import LCL2
+        calculator = LCL2.FastLaneCalculator(image.ROI_RIGHT - image.ROI_LEFT, image.ROI_BOTTOM - image.ROI_TOP)
+
+        def detect(roi):
+            result = calculator.calculate_lane_center(roi)
+            return result.center_x if result.detected else None
+    return detect
+
+
+def make_steer(controller, car, gains=None, timed=False):
+    """
+    使用真实的PID_Turn，模块里的car换成接SimBus的Car，PID状态重新初始化
+    :param timed: 为True时用PID.TimedPID，steer(center_x, timestamp, now)传入模拟时间
+    """
+    import PID
+    if controller == 'PID_Ctrl':
+        import PID_Ctrl as module
+        module.sport = PID.PositionalPID(*(gains or (0.6, 0, 1)))
+        module.timed = PID.TimedPID(*(gains or (0.6, 0, 1)), SampleTime=module.timed.SampleTime,
+                                    InertiaTime=module.timed.InertiaTime, OutputLimit=module.timed.OutputLimit,
+                                    MaxLatency=module.timed.MaxLatency)
+
+        def steer(center_x, timestamp=None, now=None):
+            return module.PID_Turn(159 - center_x, timestamp, now)
+    else:
+        import PID_Control as module
+        module.Z_axis_pid = PID.PositionalPID(*(gains or (0.6, 0, 1)))
+        module.timed = PID.TimedPID(*(gains or (0.6, 0, 1)), SampleTime=module.timed.SampleTime,
+                                    InertiaTime=module.timed.InertiaTime, OutputLimit=module.timed.OutputLimit,
+                                    MaxLatency=module.timed.MaxLatency)
+
+        def steer(center_x, timestamp=None, now=None):
+            return module.PID_Turn(center_x, Camera.image_width, timestamp, now)
+    module.car = car
+    if not timed:
+        return lambda center_x, timestamp, now: steer(center_x)
+    return steer
+
+
+def simulate(controller='PID_Control', detector='lcl2', laps=1, rate=30, max_time=None, gains=None,
+             track=None, model_args=None, timed=False, latency=0.0):
+    """
+    :param timed: 使用按时间戳计算的PID(PID.TimedPID)
+    :param latency: 采集到发出指令的延迟(s)，检测用的是这么久之前的画面，按控制周期取整
+    :return: 结果字典
+    """
+    track = Track() if track is None else track
+    model = DiffDriveModel(*track.start_pose(), **(model_args or {}))
+    car = Car(device=SimBus(model))
+    camera = SimCamera(track)
+    preprocessor = image.RoiPreprocessor()
+    detect = make_detector(detector)
+    steer = make_steer(controller, car, gains, timed)
+
+    dt = 1.0 / rate
+    # 最近若干个周期的(位姿, 时间)，检测用最旧的一个
+    delay = int(round(latency * rate))
+    history = collections.deque(maxlen=delay + 1)
+    max_time = laps * 120 if max_time is None else max_time
+    index, _ = track.locate(model.x, model.y, 0, search=len(track.center) // 2)
+    travelled = 0.0
+    lap_times = []
+    errors = []
+    costs = []
+    lost = stalled = 0
+    status = 'ok'
+    sim_time = 0.0
+    wall_start = time.perf_counter()
+
+    while len(lap_times) < laps:
+        history.append(((model.x, model.y, model.heading), sim_time))
+        pose, timestamp = history[0]
+        frame = camera.render(*pose)
+        start = time.perf_counter()
+        center_x = detect(preprocessor.process(frame))
+        if center_x is None:
+            lost += 1
+            car.Car_Stop()
+        else:
+            steer(center_x, timestamp, sim_time)
+        costs.append(time.perf_counter() - start)
+
+        model.step(dt)
+        sim_time += dt
+        new_index, error = track.locate(model.x, model.y, index)
+        ahead = track.arc[new_index] - track.arc[index]
+        if ahead < -track.length / 2:
+            ahead += track.length
+        elif ahead > track.length / 2:
+            ahead -= track.length
+        travelled += ahead
+        index = new_index
+        errors.append(error)
+        if travelled >= track.length * (len(lap_times) + 1):
+            lap_times.append(sim_time - sum(lap_times))
+
+        if abs(error) > track.lane_width / 2:
+            status = 'off track'
+            break
+        stalled = stalled + 1 if abs(model.speed()) < 1 else 0
+        if stalled > rate * 2:
+            status = 'stalled'
+            break
+        if sim_time >= max_time:
+            status = 'timeout'
+            break
+
+    wall = time.perf_counter() - wall_start
+    errors = np.abs(np.array(errors))
+    costs_ms = np.array(costs) * 1e3
+    return {
+        'status': status,
+        'laps': len(lap_times),
+        'lap_times': [round(t, 2) for t in lap_times],
+        'distance_cm': round(travelled, 1),
+        'sim_time': round(sim_time, 2),
+        'wall_time': round(wall, 2),
+        'realtime_factor': round(sim_time / wall, 1),
+        'error_rms_cm': float(np.sqrt(np.mean(errors ** 2))),
+        'error_max_cm': float(errors.max()),
+        'lost_frames': lost,
+        'control_p50_ms': float(np.percentile(costs_ms, 50)),
+        'control_p99_ms': float(np.percentile(costs_ms, 99)),
+        'control_max_ms': float(costs_ms.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="closed-loop lane following simulator")
+    parser.add_argument('--controller', choices=('PID_Control', 'PID_Ctrl'), default='PID_Control')
+    parser.add_argument('--detector', choices=('lcl2', 'ctype', 'tracker', 'bands'), default='lcl2')
+    parser.add_argument('--gains', type=float, nargs=3, metavar=('KP', 'KI', 'KD'))
+    parser.add_argument('--laps', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=30, help='控制频率(Hz)')
+    parser.add_argument('--timed', action='store_true', help='按帧时间戳计算PID(真实间隔、抗积分饱和)')
+    parser.add_argument('--latency', type=float, default=0.0, help='采集到发出指令的延迟(s)')
+    parser.add_argument('--max-time', type=float, help='最长模拟时间(s)，默认每圈120s')
+    parser.add_argument('--max-error', type=float, help='横向误差均方根上限(cm)，超过时返回1')
+    parser.add_argument('--max-lap-time', type=float, help='圈速上限(s)，超过时返回1')
+    parser.add_argument('--max-control-ms', type=float, help='控制循环p99耗时上限(ms)，超过时返回1')
+    args = parser.parse_args()
+
+    result = simulate(args.controller, args.detector, args.laps, args.rate, args.max_time, args.gains,
+                      timed=args.timed, latency=args.latency)
+    for key, value in result.items():
+        print(f"{key:16s} {value}")
+
+    failures = []
+    if result['status'] != 'ok':
+        failures.append(result['status'])
+    if args.max_error is not None and result['error_rms_cm'] > args.max_error:
+        failures.append(f"误差 {result['error_rms_cm']:.1f} > {args.max_error} cm")
+    if args.max_lap_time is not None and any(t > args.max_lap_time for t in result['lap_times']):
+        failures.append(f"圈速 {max(result['lap_times'])} > {args.max_lap_time} s")
+    if args.max_control_ms is not None and result['control_p99_ms'] > args.max_control_ms:
+        failures.append(f"控制耗时p99 {result['control_p99_ms']:.2f} > {args.max_control_ms} ms")
+    for failure in failures:
+        print("FAIL:", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+"""
+每周期的结构化遥测记录
+
+控制循环里print一行就要几毫秒(树莓派的终端)，TelemetryRing把每个周期的记录写进预先分配的环形缓冲区，
+log()只做一次结构化数组的元素赋值(几微秒)，不加锁、不阻塞；后台线程定期把新记录追加到二进制文件。
+缓冲区满(写盘跟不上)时丢弃新记录并计数。path为None时不写盘，缓冲区只保留最近capacity条。
+
+文件格式:
+    b'TLM1' + uint32头长度 + JSON头({"descr": TELEMETRY_DTYPE.descr}) + 连续的原始记录
+
+离线读取:
+    records = read_telemetry('run.tlm')          # 结构化numpy数组
+    python telemetry.py run.tlm -o run.csv       # 转成CSV
+    to_dataframe('run.tlm')                      # pandas.DataFrame(需要安装pandas)
+"""
+import argparse
+import json
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b'TLM1'
+
+# 检测状态
+STATUS_OK = 0          # 检测到车道并转向
+STATUS_LOST = 1        # 没检测到车道，停车
+STATUS_LATE = 2        # 周期超时，发安全指令
+STATUS_NO_FRAME = 3    # 没取到帧，发安全指令
+STATUS_NAMES = {STATUS_OK: 'ok', STATUS_LOST: 'lost', STATUS_LATE: 'late', STATUS_NO_FRAME: 'no_frame'}
+
+# 错误码(按位)
+ERROR_I2C = 1          # 本周期有I2C写入失败
+ERROR_OVERRUN = 2      # 本周期处理时间超过一个周期
+
+TELEMETRY_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('seq', np.int64),
+    ('offset', np.float32),
+    ('pid_output', np.float32),
+    ('left_speed', np.int16),
+    ('right_speed', np.int16),
+    ('status', np.uint8),
+    ('error', np.uint16),
+])
+
+
+class TelemetryRing:
+    """
+    :param path: 输出文件，None表示只保存在内存里
+    :param capacity: 缓冲区记录数
+    :param flush_interval: 写盘间隔(秒)
+    """
+
+    def __init__(self, path=None, capacity=4096, flush_interval=0.2):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.buffer = np.zeros(capacity, dtype=TELEMETRY_DTYPE)
+
+        self.logged = 0        # log()写入缓冲区的记录数
+        self.flushed = 0       # 已写盘的记录数
+        self.dropped = 0       # 缓冲区满被丢弃的记录数
+
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.path is not None:
+            self._file = open(self.path, 'wb')
+            header = json.dumps({'descr': TELEMETRY_DTYPE.descr}).encode()
+            self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+            self._thread = threading.Thread(target=self._run, name='TelemetryRing', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止写盘线程，写完剩余记录并关闭文件"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def log(self, timestamp, seq=-1, offset=0.0, pid_output=0.0, left_speed=0, right_speed=0,
+            status=STATUS_OK, error=0):
+        """
+        写入一条记录，只由控制线程调用
+        :return: 是否写入(缓冲区满时丢弃)
+        """
+        # 单生产者单消费者: 只有这里改logged，只有写盘线程改flushed
+        if self._file is not None and self.logged - self.flushed >= self.capacity:
+            self.dropped += 1
+            return False
+        self.buffer[self.logged % self.capacity] = (timestamp, seq, offset, pid_output, left_speed, right_speed,
+                                                    status, error)
+        self.logged += 1
+        return True
+
+    def records(self):
+        """缓冲区里最近的记录(按时间顺序，复制)"""
+        count = min(self.logged, self.capacity)
+        start = self.logged - count
+        indices = np.arange(start, self.logged) % self.capacity
+        return self.buffer[indices]
+
+    def _flush(self):
+        end = self.logged
+        start = self.flushed
+        if end == start:
+            return
+        first, last = start % self.capacity, end % self.capacity
+        if first < last:
+            self.buffer[first:last].tofile(self._file)
+        else:
+            # 跨过缓冲区末尾，分两段写
+            self.buffer[first:].tofile(self._file)
+            self.buffer[:last].tofile(self._file)
+        self._file.flush()
+        self.flushed = end
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+
+    def stats(self):
+        return {'logged': self.logged, 'flushed': self.flushed, 'dropped': self.dropped}
+
+
+def read_telemetry(path):
+    """读取TelemetryRing写出的文件，返回结构化numpy数组"""
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"不是遥测文件: {path}")
+        length, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length))
+        dtype = np.dtype([tuple(field) for field in header['descr']])
+        data = f.read()
+    # 程序异常退出时最后一条记录可能不完整
+    count = len(data) // dtype.itemsize
+    return np.frombuffer(data, dtype=dtype, count=count)
+
+
+def to_dataframe(path):
+    import pandas as pd
+    frame = pd.DataFrame(read_telemetry(path))
+    frame['status'] = frame['status'].map(STATUS_NAMES)
+    return frame
+
+
+def to_csv(path, output):
+    records = read_telemetry(path)
+    names = records.dtype.names
+    with open(output, 'w') as f:
+        f.write(','.join(names) + '\n')
+        for record in records:
+            values = [STATUS_NAMES.get(int(v), str(v)) if name == 'status' else str(v)
+                      for name, v in zip(names, record.tolist())]
+            f.write(','.join(values) + '\n')
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="convert a telemetry file to CSV")
+    parser.add_argument('path')
+    parser.add_argument('-o', '--output', help='CSV文件，默认在path后加.csv')
+    args = parser.parse_args()
+    output = args.output or args.path + '.csv'
+    print(f"{to_csv(args.path, output)}条记录 -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+"""
+帧间车道跟踪
+
+example.find_lane_center每帧都统计整个ROI的列和，取第一列/最后一列有效列作为边界，
+ROI边上的杂点会把边界(nonzero_indices[0])拉走，中线随之跳变。
+LaneTracker记住上一帧的左右边界，下一帧只在边界附近的窗口里找，
+窗口里找不到、边界贴着窗口边缘(可能跑出了窗口)或车道宽度突变时退回全图搜索。
+"""
+import cv2
+import numpy as np
+
+
+class LaneTracker:
+    """
+    :param window: 在上一帧边界左右各搜索的列数
+    :param min_pixels: 有效列至少的白色像素数，与find_lane_center相同(>6)
+    :param max_width_change: 车道宽度相对上一帧变化超过该值时认为跟丢，退回全图搜索
+    :param max_lost: 连续多少帧全图也没找到后清除跟踪状态(下一次从全图开始)
+    :param scan: 全图搜索函数 roi -> (left_bound, right_bound, lane_center)或None，
+                 默认用full_scan
+    """
+
+    def __init__(self, window=16, min_pixels=6, max_width_change=40, max_lost=3, scan=None):
+        self.window = window
+        self.min_pixels = min_pixels
+        self.max_width_change = max_width_change
+        self.max_lost = max_lost
+        self.scan = self.full_scan if scan is None else scan
+
+        self.left_bound = None
+        self.right_bound = None
+        self.lost_frames = 0
+
+        self.tracked = 0       # 在窗口内找到的帧数
+        self.full_scans = 0    # 全图搜索的帧数
+
+    def reset(self):
+        self.left_bound = self.right_bound = None
+        self.lost_frames = 0
+
+    def update(self, roi):
+        """
+        查找车道中线，返回值与example.find_lane_center相同
+        :param roi: 二值化ROI (0/255)
+        :return: (left_bound, right_bound, lane_center)，没找到返回None
+        """
+        result = None
+        if self.left_bound is not None:
+            result = self.search_windows(roi)
+            if result is not None:
+                self.tracked += 1
+        if result is None:
+            self.full_scans += 1
+            result = self.scan(roi)
+
+        if result is None:
+            self.lost_frames += 1
+            if self.lost_frames >= self.max_lost:
+                self.reset()
+            return None
+
+        self.lost_frames = 0
+        self.left_bound, self.right_bound = result[0], result[1]
+        return result
+
+    def valid_columns(self, roi, start, stop):
+        """
+        start:stop范围内白色像素数大于min_pixels的列(相对start的下标)
+        ROI是0/255二值图，用cv2.reduce求列和再与min_pixels*255比较，
+        比np.count_nonzero(axis=0)快(后者先转成bool数组，窄窗口也要10us左右)
+        """
+        sums = cv2.reduce(roi[:, start:stop], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S)[0]
+        return np.flatnonzero(sums > self.min_pixels * 255)
+
+    def full_scan(self, roi):
+        """与find_lane_center相同的全图搜索"""
+        columns = np.flatnonzero(np.count_nonzero(roi, axis=0) > self.min_pixels)
+        if columns.size == 0:
+            return None
+        left_bound = int(columns[0])
+        right_bound = int(columns[-1])
+        return left_bound, right_bound, (left_bound + right_bound) // 2
+
+    def search_windows(self, roi):
+        """在上一帧边界附近的窗口里找边界，不可信时返回None"""
+        width = roi.shape[1]
+
+        left_start = max(self.left_bound - self.window, 0)
+        left_stop = min(self.left_bound + self.window + 1, width)
+        columns = self.valid_columns(roi, left_start, left_stop)
+        # 第一列有效列贴着窗口左边缘时，真正的边界可能在窗口外
+        if columns.size == 0 or (columns[0] == 0 and left_start > 0):
+            return None
+        left_bound = left_start + int(columns[0])
+
+        right_start = max(self.right_bound - self.window, 0)
+        right_stop = min(self.right_bound + self.window + 1, width)
+        columns = self.valid_columns(roi, right_start, right_stop)
+        if columns.size == 0 or (columns[-1] == right_stop - right_start - 1 and right_stop < width):
+            return None
+        right_bound = right_start + int(columns[-1])
+
+        if right_bound <= left_bound:
+            return None
+        if abs((right_bound - left_bound) - (self.right_bound - self.left_bound)) > self.max_width_change:
+            return None
+        return left_bound, right_bound, (left_bound + right_bound) // 2
+
+    def stats(self):
+        return {'tracked': self.tracked, 'full_scans': self.full_scans}
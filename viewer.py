@@ -0,0 +1,184 @@
+"""
+调试画面显示，与控制循环分离
+
+控制循环调用DebugViewer.submit()，只在到了显示间隔且有空闲缓冲区时复制一次图像，
+绘制(旧/only_Run.visualize的ROI框、车道边界、车道中线、图像中线、偏移量)和imshow都在后台线程完成，
+缓冲区满时直接丢弃该帧。enabled=False时submit什么都不做，也不会创建窗口。
+
+    viewer = DebugViewer(enabled=args.display).start()
+    viewer.submit(frame, roi, (center_x, left_bound, right_bound), offset)
+    if viewer.key() == ord('q'): ...
+    viewer.stop()
+"""
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import image
+
+WINDOW = 'Lane Following'
+ROI_WINDOW = 'binary'
+
+
+def draw_overlay(display, result, offset=None, action=None, roi_top=image.ROI_TOP, roi_bottom=image.ROI_BOTTOM):
+    """
+    在display上绘制ROI区域和检测结果(直接修改display)
+    :param result: (center_x, left_bound, right_bound)，None表示没检测到，边界未知时可以为None
+    :param offset: 中线相对图像中线的偏移
+    :param action: 控制动作说明
+    """
+    width = display.shape[1]
+
+    # ROI区域
+    cv2.rectangle(display, (0, roi_top), (width - 1, roi_bottom - 1), (0, 255, 0), 2)
+
+    if result is not None:
+        center_x, left_bound, right_bound = result
+        # 车道边界(检测器不提供边界时为None)
+        for bound in (left_bound, right_bound):
+            if bound is not None:
+                cv2.line(display, (int(bound), roi_top), (int(bound), roi_bottom), (255, 0, 0), 2)
+        center_x = int(center_x)
+        # 车道中心线
+        cv2.line(display, (center_x, roi_top), (center_x, roi_bottom), (0, 0, 255), 3)
+        # 图像中心线
+        image_center = width // 2
+        cv2.line(display, (image_center, roi_top), (image_center, roi_bottom), (255, 255, 0), 2)
+
+    # putText不支持中文，标签用英文
+    if action is not None:
+        cv2.putText(display, f"action: {action}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    text = "offset: -" if offset is None else f"offset: {int(offset)}"
+    cv2.putText(display, text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return display
+
+
+class DebugViewer:
+    """
+    :param enabled: False时不启动线程、不创建窗口，submit直接返回
+    :param max_fps: 最高显示帧率，间隔内的帧不复制
+    :param slots: 待显示帧的缓冲区数，都被占用时丢弃新帧
+    :param rgb: 输入帧是RGB顺序时显示前转换为BGR
+    """
+
+    def __init__(self, enabled=True, max_fps=10, slots=2, rgb=False,
+                 roi_top=image.ROI_TOP, roi_bottom=image.ROI_BOTTOM):
+        self.enabled = enabled
+        self.period = 1.0 / max_fps if max_fps else 0.0
+        self.slots = slots
+        self.rgb = rgb
+        self.roi_top = roi_top
+        self.roi_bottom = roi_bottom
+
+        self.shown = 0        # 显示的帧数
+        self.dropped = 0      # 缓冲区满被丢弃的帧数
+        self.throttled = 0    # 未到显示间隔跳过的帧数
+
+        self._frames = [None] * slots
+        self._rois = [None] * slots
+        self._info = [None] * slots
+        self._free = queue.Queue()
+        self._pending = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._next_time = 0.0
+        self._key = -1
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self.enabled:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="DebugViewer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._running = False
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, frame, roi=None, result=None, offset=None, action=None):
+        """
+        提交一帧显示，不阻塞
+        :param frame: 原始图像
+        :param roi: 二值化ROI，None时不显示
+        :param result: (center_x, left_bound, right_bound)，None表示没检测到
+        :return: 是否放入了显示队列
+        """
+        if not self._running:
+            return False
+        now = time.monotonic()
+        if now < self._next_time:
+            self.throttled += 1
+            return False
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self._next_time = now + self.period
+
+        # 每个槽单独分配，分辨率变化时只重新分配当前这个槽
+        np.copyto(self._buffer(self._frames, slot, frame), frame)
+        if roi is not None:
+            np.copyto(self._buffer(self._rois, slot, roi), roi)
+        self._info[slot] = (roi is not None, result, offset, action)
+        self._pending.put(slot)
+        return True
+
+    @staticmethod
+    def _buffer(buffers, slot, like):
+        buffer = buffers[slot]
+        if buffer is None or buffer.shape != like.shape or buffer.dtype != like.dtype:
+            buffer = buffers[slot] = np.empty_like(like)
+        return buffer
+
+    def key(self):
+        """返回并清除显示线程最近一次读到的按键，没有按键返回-1"""
+        key, self._key = self._key, -1
+        return key
+
+    def stats(self):
+        return {"shown": self.shown, "dropped": self.dropped, "throttled": self.throttled}
+
+    def _run(self):
+        while self._running:
+            try:
+                slot = self._pending.get(timeout=0.05)
+            except queue.Empty:
+                # 没有新帧时也要处理窗口事件
+                self._poll_key()
+                continue
+            if slot is None:
+                break
+            try:
+                self._show(slot)
+            finally:
+                self._free.put(slot)
+            self._poll_key()
+        if self.shown:
+            cv2.destroyAllWindows()
+
+    def _show(self, slot):
+        has_roi, result, offset, action = self._info[slot]
+        display = self._frames[slot]
+        if self.rgb:
+            display = cv2.cvtColor(display, cv2.COLOR_RGB2BGR)
+        draw_overlay(display, result, offset, action, self.roi_top, self.roi_bottom)
+        cv2.imshow(WINDOW, display)
+        if has_roi:
+            cv2.imshow(ROI_WINDOW, self._rois[slot])
+        self.shown += 1
+
+    def _poll_key(self):
+        if not self.shown:
+            return
+        key = cv2.waitKey(1)
+        if key != -1:
+            self._key = key & 0xFF
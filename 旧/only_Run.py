@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 import time
 import math
+import threading
 import smbus
 from picamera2 import Picamera2
 
@@ -126,6 +127,10 @@ def Car_Spin_Right(speed1, speed2):
 
 class AutoLaneFollower:
     def __init__(self, image_width=320, image_height=240):
+        # 小车初始化(打开I2C、舵机归位)与摄像头启动同时进行
+        car_thread = threading.Thread(target=car_init)
+        car_thread.start()
+        
         # 初始化摄像头
         self.picam2 = Picamera2()
         config = self.picam2.create_preview_configuration(
@@ -147,12 +152,11 @@ class AutoLaneFollower:
         self.max_offset = 100       # 最大偏移量
         self.kp = 1.0               # 比例控制系数
         
-        # 启动摄像头
+        # 启动摄像头，等到第一帧即可，不再固定等待2秒
         self.picam2.start()
-        time.sleep(2)
+        self.picam2.capture_array()
         
-        # 初始化小车
-        car_init()
+        car_thread.join()
         print("自动循迹系统初始化完成")
     
     def preprocess_image(self, frame):
@@ -271,6 +275,9 @@ class AutoLaneFollower:
         print("开始自动循迹...")
         print("按 'q' 退出，按 's' 停止小车")
         
+        last_action = None
+        last_print = 0.0
+        changes = 0
         try:
             while True:
                 # 捕获图像
@@ -300,8 +307,16 @@ class AutoLaneFollower:
                     display_frame = self.visualize(frame, result, control_info)
                     cv2.imshow('Lane Following', cv2.cvtColor(display_frame, cv2.COLOR_RGB2BGR))
                 
-                # 打印控制信息
-                print(f"动作: {action:6s} | 偏移: {int(actual_offset):4d} | 左轮: {int(left_speed):3d} | 右轮: {int(right_speed):3d}")
+                # 打印控制信息: 只在动作变化时打印，而且每秒最多一行
+                # (左右摆动时动作一秒变化很多次，每次print都会拖慢循环)
+                if action != last_action:
+                    last_action = action
+                    changes += 1
+                now = time.monotonic()
+                if changes and now - last_print >= 1.0:
+                    last_print = now
+                    print(f"动作: {action:6s} | 偏移: {int(actual_offset):4d} | 左轮: {int(left_speed):3d} | 右轮: {int(right_speed):3d} | 动作变化 {changes}次")
+                    changes = 0
                 
                 # 检查按键
                 key = cv2.waitKey(1) & 0xFF